@@ -13,4 +13,10 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'rcm_api.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# imported once django is set up
+from rcm_api.push import PushApplication  # noqa: E402
+
+# serves the push channels (see rcm_api.push), everything else goes to django
+application = PushApplication(django_application)
@@ -0,0 +1,262 @@
+import threading
+import time
+import zlib
+from collections import defaultdict
+
+from django.conf import settings
+
+try:
+    import brotli
+except ImportError:  # optional, "br" is only offered when installed
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # optional, "zstd" is only offered when installed
+    zstandard = None
+
+
+def compression_settings():
+    defaults = {
+        # server preference when the client accepts several equally
+        "ENCODINGS": ["zstd", "br", "gzip"],
+        # smaller bodies fit in a packet or two either way
+        "MIN_SIZE": 1024,
+        "GZIP_LEVEL": 6,
+        "BROTLI_QUALITY": 5,
+        "ZSTD_LEVEL": 3,
+        # media and archives are already compressed
+        "CONTENT_TYPES": [
+            "text/",
+            "application/json",
+            "application/xml",
+            "application/javascript",
+            "application/msgpack",
+            "application/vnd.rcm.roster",
+        ],
+    }
+    defaults.update(getattr(settings, "RESPONSE_COMPRESSION", {}))
+    return defaults
+
+
+class GzipCompressor:
+    def __init__(self, conf):
+        # wbits 16 + MAX_WBITS writes the gzip header and trailer
+        self._compressor = zlib.compressobj(conf["GZIP_LEVEL"], zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        # emits what's buffered without ending the stream
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+class BrotliCompressor:
+    def __init__(self, conf):
+        self._compressor = brotli.Compressor(quality=conf["BROTLI_QUALITY"])
+
+    def compress(self, data):
+        return self._compressor.process(data)
+
+    def flush(self):
+        return self._compressor.flush()
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+class ZstdCompressor:
+    def __init__(self, conf):
+        self._compressor = zstandard.ZstdCompressor(
+            level=conf["ZSTD_LEVEL"]
+        ).compressobj()
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self):
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_FINISH)
+
+
+COMPRESSORS = {"gzip": GzipCompressor}
+if brotli is not None:
+    COMPRESSORS["br"] = BrotliCompressor
+if zstandard is not None:
+    COMPRESSORS["zstd"] = ZstdCompressor
+
+
+def parse_accept_encoding(header):
+    """``{coding: q}`` of an Accept-Encoding header."""
+    accepted = {}
+    for item in header.split(","):
+        coding, _, params = item.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[coding] = q
+    return accepted
+
+
+def coded_etag(etag, coding):
+    """
+    Strong tag of one content coding of a representation, ``"abc"`` sent
+    gzipped is ``"abc-gzip"``. Each coding is a different byte sequence, so
+    sharing a strong tag between them would be wrong; weak tags are left
+    alone.
+    """
+    if not etag.startswith('"'):
+        return etag
+    return f'{etag[:-1]}-{coding}"'
+
+
+def uncoded_etag(etag):
+    """The tag of the representation a ``coded_etag`` was made from."""
+    # every coding, a tag may come from a worker with more of them installed
+    for coding in ("gzip", "br", "zstd"):
+        suffix = f'-{coding}"'
+        if etag.endswith(suffix):
+            return etag[: -len(suffix)] + '"'
+    return etag
+
+
+class ResponseCompression:
+    """
+    Picks a content coding for a response and compresses it, keeping
+    per-endpoint totals of bytes in and out and of the CPU time spent.
+    """
+
+    def __init__(self):
+        conf = compression_settings()
+        self.conf = conf
+        self.encodings = [
+            coding for coding in conf["ENCODINGS"] if coding in COMPRESSORS
+        ]
+        self.min_size = conf["MIN_SIZE"]
+        self.content_types = tuple(conf["CONTENT_TYPES"])
+        self._lock = threading.Lock()
+        self.totals = defaultdict(
+            lambda: {
+                "responses": 0,
+                "skipped": 0,
+                "bytes_in": 0,
+                "bytes_out": 0,
+                "cpu_seconds": 0.0,
+                "encodings": defaultdict(int),
+            }
+        )
+
+    def negotiate(self, accept_encoding):
+        accepted = parse_accept_encoding(accept_encoding)
+        wildcard = accepted.get("*", 0.0)
+        best, best_q = None, 0.0
+        for coding in self.encodings:
+            q = accepted.get(coding, wildcard)
+            # ties go to the coding listed first in ENCODINGS
+            if q > best_q:
+                best, best_q = coding, q
+        return best
+
+    def is_compressible(self, content_type):
+        media_type = content_type.split(";")[0].strip().lower()
+        return media_type.startswith(self.content_types)
+
+    def compressor(self, coding):
+        return COMPRESSORS[coding](self.conf)
+
+    def compress(self, coding, content):
+        started_at = time.thread_time()
+        compressor = self.compressor(coding)
+        compressed = compressor.compress(content) + compressor.finish()
+        return compressed, time.thread_time() - started_at
+
+    def compress_stream(self, coding, chunks, endpoint):
+        compressor = self.compressor(coding)
+        bytes_in = bytes_out = 0
+        cpu = 0.0
+        try:
+            for chunk in chunks:
+                started_at = time.thread_time()
+                # flushed chunk by chunk, a slow stream must not sit in the buffer
+                compressed = compressor.compress(chunk) + compressor.flush()
+                cpu += time.thread_time() - started_at
+                bytes_in += len(chunk)
+                bytes_out += len(compressed)
+                if compressed:
+                    yield compressed
+            started_at = time.thread_time()
+            compressed = compressor.finish()
+            cpu += time.thread_time() - started_at
+            bytes_out += len(compressed)
+            yield compressed
+        finally:
+            self.record(endpoint, coding, bytes_in, bytes_out, cpu)
+
+    async def acompress_stream(self, coding, chunks, endpoint):
+        compressor = self.compressor(coding)
+        bytes_in = bytes_out = 0
+        cpu = 0.0
+        try:
+            async for chunk in chunks:
+                started_at = time.thread_time()
+                compressed = compressor.compress(chunk) + compressor.flush()
+                cpu += time.thread_time() - started_at
+                bytes_in += len(chunk)
+                bytes_out += len(compressed)
+                if compressed:
+                    yield compressed
+            started_at = time.thread_time()
+            compressed = compressor.finish()
+            cpu += time.thread_time() - started_at
+            bytes_out += len(compressed)
+            yield compressed
+        finally:
+            self.record(endpoint, coding, bytes_in, bytes_out, cpu)
+
+    def record(self, endpoint, coding, bytes_in, bytes_out, cpu):
+        with self._lock:
+            totals = self.totals[endpoint]
+            totals["responses"] += 1
+            totals["bytes_in"] += bytes_in
+            totals["bytes_out"] += bytes_out
+            totals["cpu_seconds"] += cpu
+            totals["encodings"][coding] += 1
+
+    def record_skip(self, endpoint):
+        with self._lock:
+            self.totals[endpoint]["skipped"] += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "encodings": self.encodings,
+                "endpoints": {
+                    endpoint: {
+                        **totals,
+                        "encodings": dict(totals["encodings"]),
+                        # compressed size over original size
+                        "ratio": (
+                            totals["bytes_out"] / totals["bytes_in"]
+                            if totals["bytes_in"]
+                            else None
+                        ),
+                    }
+                    for endpoint, totals in self.totals.items()
+                },
+            }
+
+
+response_compression = ResponseCompression()
@@ -0,0 +1,8 @@
+"""
+PostgreSQL backend with a per-process connection pool.
+
+Set ``"ENGINE": "rcm_api.db_pool"`` and tune it with a ``"POOL"`` dict in the
+database settings (see ``pool.pool_settings``). Keep ``CONN_MAX_AGE`` at 0:
+django "closes" the connection after every request, which hands it back to
+the pool.
+"""
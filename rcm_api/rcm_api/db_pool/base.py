@@ -0,0 +1,87 @@
+import psycopg2
+from psycopg2 import extensions
+
+from django.db.backends.postgresql import base, creation
+
+from rcm_api.db_pool.pool import (
+    ConnectionPool,
+    PoolTimeout,
+    close_pools,
+    get_pool,
+    pool_settings,
+)
+
+
+def check_connection(connection):
+    if connection.closed:
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1")
+    if not connection.autocommit:
+        connection.rollback()
+    return True
+
+
+def reset_connection(connection):
+    if connection.closed:
+        return False
+    status = connection.info.transaction_status
+    if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+        # the server went away
+        return False
+    if status != extensions.TRANSACTION_STATUS_IDLE:
+        connection.rollback()
+    return True
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+    def _destroy_test_db(self, test_database_name, verbosity):
+        # the pooled connections to the test database would block DROP DATABASE
+        close_pools(test_database_name)
+        super()._destroy_test_db(test_database_name, verbosity)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    creation_class = DatabaseCreation
+    pool = None
+
+    def get_new_connection(self, conn_params):
+        self.pool = self.get_pool(conn_params)
+        try:
+            return self.pool.getconn()
+        except PoolTimeout as exc:
+            # surfaces as django.db.OperationalError through wrap_database_errors
+            raise psycopg2.OperationalError(str(exc)) from exc
+
+    def get_pool(self, conn_params):
+        # keyed on the parameters, the test runner connects with another NAME
+        key = tuple(sorted((name, str(value)) for name, value in conn_params.items()))
+        return get_pool(key, lambda: self.create_pool(conn_params))
+
+    def create_pool(self, conn_params):
+        conf = pool_settings(self.settings_dict)
+        pool = ConnectionPool(
+            # sets up the connection like the stock backend
+            connect=lambda: super(DatabaseWrapper, self).get_new_connection(
+                conn_params
+            ),
+            check=check_connection,
+            reset=reset_connection,
+            min_size=conf["MIN_SIZE"],
+            max_size=conf["MAX_SIZE"],
+            timeout=conf["TIMEOUT"],
+            max_lifetime=conf["MAX_LIFETIME"],
+            max_idle=conf["MAX_IDLE"],
+            check_after=conf["CHECK_AFTER"],
+            label=f"{self.alias}:{conn_params.get('dbname') or conn_params.get('database')}",
+        )
+        pool.fill()
+        return pool
+
+    def _close(self):
+        if self.connection is None:
+            return
+        with self.wrap_database_errors:
+            # Closed inside an atomic block django keeps using the connection
+            # object until the block exits, so it can't go back to the pool.
+            self.pool.putconn(self.connection, discard=self.in_atomic_block)
@@ -0,0 +1,311 @@
+import os
+import threading
+import time
+from collections import deque
+
+from rcm_api.util import LatencyHistogram
+
+
+# Checkouts are usually served from the idle list, so start well below 5ms
+WAIT_TIME_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+)
+
+
+def pool_settings(settings_dict):
+    defaults = {
+        "MIN_SIZE": 2,
+        "MAX_SIZE": 10,
+        # seconds a request waits for a free connection
+        "TIMEOUT": 5,
+        # connections older than this are closed instead of reused
+        "MAX_LIFETIME": 30 * 60,
+        # idle connections above MIN_SIZE are closed after this
+        "MAX_IDLE": 5 * 60,
+        # ping connections idle for longer than this on checkout, 0 pings always
+        "CHECK_AFTER": 5,
+    }
+    defaults.update(settings_dict.get("POOL") or {})
+    return defaults
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class PooledConnection:
+    __slots__ = ("connection", "created_at", "returned_at")
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.created_at = self.returned_at = time.monotonic()
+
+
+class ConnectionPool:
+    """
+    Per-process pool of DB-API connections.
+
+    ``connect`` opens a new connection, ``check`` pings one and ``reset``
+    cleans one up before it goes back on the idle list; both return False
+    when the connection should be thrown away. Idle connections are reused
+    most recently returned first, so the spare ones age out through
+    ``MAX_IDLE``.
+    """
+
+    def __init__(
+        self,
+        connect,
+        check,
+        reset,
+        min_size=2,
+        max_size=10,
+        timeout=5,
+        max_lifetime=30 * 60,
+        max_idle=5 * 60,
+        check_after=5,
+        label="default",
+    ):
+        self.connect = connect
+        self.check = check
+        self.reset = reset
+        self.min_size = min(min_size, max_size)
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.max_idle = max_idle
+        self.check_after = check_after
+        self.label = label
+
+        self._idle = deque()
+        self._checked_out = {}
+        self._cond = threading.Condition()
+        self._pid = os.getpid()
+        # open connections, idle or in use, including ones being opened
+        self.size = 0
+        self.waiting = 0
+        self.opened = 0
+        self.closed = 0
+        self.recycled = 0
+        self.failed_checks = 0
+        self.timeouts = 0
+        self.wait_time = WaitTimeHistogram()
+
+    def getconn(self):
+        started_at = time.perf_counter()
+        deadline = started_at + self.timeout
+        with self._cond:
+            self._check_fork()
+            while True:
+                if self._idle:
+                    entry = self._idle.pop()
+                    break
+                if self.size < self.max_size:
+                    # reserve the slot, the connection is opened outside the lock
+                    self.size += 1
+                    entry = None
+                    break
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    self.timeouts += 1
+                    raise PoolTimeout(
+                        f"No connection available in pool {self.label!r} "
+                        f"after {self.timeout}s ({self.max_size} in use)"
+                    )
+                self.waiting += 1
+                try:
+                    self._cond.wait(remaining)
+                finally:
+                    self.waiting -= 1
+        self.wait_time.observe(time.perf_counter() - started_at)
+
+        if entry is not None and not self._usable(entry):
+            # the slot is kept for the replacement
+            self._close(entry.connection)
+            entry = None
+        if entry is None:
+            entry = self._open()
+
+        with self._cond:
+            self._checked_out[id(entry.connection)] = entry
+        return entry.connection
+
+    def putconn(self, connection, discard=False):
+        with self._cond:
+            entry = self._checked_out.pop(id(connection), None)
+        if entry is None or entry.connection is not connection:
+            # not ours (opened before a fork, or already returned)
+            return
+
+        now = time.monotonic()
+        if not discard and now - entry.created_at >= self.max_lifetime:
+            with self._cond:
+                self.recycled += 1
+            discard = True
+        if not discard and not self._safe_reset(connection):
+            discard = True
+
+        if discard:
+            self._discard(connection)
+        else:
+            entry.returned_at = now
+            with self._cond:
+                if self._pid == os.getpid():
+                    self._idle.append(entry)
+                    self._cond.notify()
+        self._close_idle()
+
+    def fill(self):
+        """Open connections up to ``min_size``."""
+        while True:
+            with self._cond:
+                if self.size >= self.min_size:
+                    return
+                self.size += 1
+            entry = self._open()
+            with self._cond:
+                self._idle.appendleft(entry)
+                self._cond.notify()
+
+    def close_all(self):
+        with self._cond:
+            entries, self._idle = list(self._idle), deque()
+        for entry in entries:
+            self._discard(entry.connection)
+
+    def stats(self):
+        with self._cond:
+            idle, in_use = len(self._idle), len(self._checked_out)
+            stats = {
+                "label": self.label,
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "size": self.size,
+                "idle": idle,
+                "in_use": in_use,
+                "waiting": self.waiting,
+                "opened": self.opened,
+                "closed": self.closed,
+                "recycled": self.recycled,
+                "failed_checks": self.failed_checks,
+                "timeouts": self.timeouts,
+            }
+        stats["wait_time"] = self.wait_time.snapshot()
+        return stats
+
+    def _open(self):
+        try:
+            connection = self.connect()
+        except BaseException:
+            with self._cond:
+                self.size -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self.opened += 1
+        return PooledConnection(connection)
+
+    def _usable(self, entry):
+        now = time.monotonic()
+        if now - entry.created_at >= self.max_lifetime:
+            with self._cond:
+                self.recycled += 1
+            return False
+        if now - entry.returned_at >= self.check_after:
+            try:
+                healthy = self.check(entry.connection)
+            except Exception:
+                healthy = False
+            if not healthy:
+                with self._cond:
+                    self.failed_checks += 1
+                return False
+        return True
+
+    def _safe_reset(self, connection):
+        try:
+            return self.reset(connection)
+        except Exception:
+            return False
+
+    def _close(self, connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+        with self._cond:
+            self.closed += 1
+
+    def _discard(self, connection):
+        self._close(connection)
+        with self._cond:
+            self.size -= 1
+            self._cond.notify()
+
+    def _close_idle(self):
+        # the oldest returned connections sit at the left end
+        expired = []
+        now = time.monotonic()
+        with self._cond:
+            while (
+                self.size - len(expired) > self.min_size
+                and self._idle
+                and now - self._idle[0].returned_at >= self.max_idle
+            ):
+                expired.append(self._idle.popleft())
+        for entry in expired:
+            self._discard(entry.connection)
+
+    def _check_fork(self):
+        # Connections inherited from the parent process belong to it: forget
+        # them without closing, closing would end the parent's sessions too.
+        pid = os.getpid()
+        if pid != self._pid:
+            self._pid = pid
+            self._idle = deque()
+            self._checked_out = {}
+            self.size = 0
+            self.waiting = 0
+
+
+class WaitTimeHistogram(LatencyHistogram):
+    default_buckets = WAIT_TIME_BUCKETS
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(key, factory):
+    """Return the pool stored under ``key``, creating it with ``factory()``."""
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                pool = _pools[key] = factory()
+    return pool
+
+
+def close_pools(dbname):
+    """Close and forget every pool to ``dbname``, e.g. before it is dropped."""
+    with _pools_lock:
+        for key in list(_pools):
+            params = dict(key)
+            if dbname in (params.get("dbname"), params.get("database")):
+                _pools.pop(key).close_all()
+
+
+def pool_stats():
+    return [pool.stats() for pool in list(_pools.values())]
@@ -0,0 +1,131 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+# Set while a replica-safe view runs, read by PrimaryReplicaRouter
+replica_reads = ContextVar("replica_reads", default=False)
+
+
+def replica_aliases():
+    return getattr(settings, "DATABASE_REPLICAS", [])
+
+
+class PrimaryReplicaRouter:
+    """
+    Writes always go to ``default``. Reads go to a random replica from
+    ``DATABASE_REPLICAS``, but only while ``replica_reads`` is set (by
+    ``ReplicaReadMixin`` or ``use_replicas()``), so everything else keeps
+    reading from the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        replicas = replica_aliases()
+        if replicas and replica_reads.get():
+            return random.choice(replicas)
+        return "default"
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # replicas hold the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == "default"
+
+
+@contextmanager
+def use_replicas():
+    token = replica_reads.set(True)
+    try:
+        yield
+    finally:
+        replica_reads.reset(token)
+
+
+@contextmanager
+def use_primary():
+    """Read from the primary inside a replica-safe view."""
+    token = replica_reads.set(False)
+    try:
+        yield
+    finally:
+        replica_reads.reset(token)
+
+
+PIN_COOKIE = "db_pin"
+PIN_COOKIE_SALT = "rcm_api.db_router.pin"
+
+
+def sticky_seconds():
+    return getattr(settings, "REPLICA_STICKY_SECONDS", 10)
+
+
+def pin_key(request):
+    user = getattr(request, "user", None)
+    if user is not None and user.is_authenticated:
+        return f"db:pin:user:{user.pk}"
+    session = getattr(request, "session", None)
+    if session is not None and session.session_key:
+        return f"db:pin:session:{session.session_key}"
+    return None
+
+
+def pin_to_primary(request, response=None):
+    """
+    Send this user's (or session's) reads to the primary for a while.
+
+    The pin is kept in the cache, which only the workers sharing it see, and
+    in a signed cookie on ``response``, which reaches whichever worker serves
+    the client's next request.
+    """
+    key = pin_key(request)
+    if key is not None:
+        cache.set(key, True, sticky_seconds())
+    if response is not None and replica_aliases():
+        response.set_signed_cookie(
+            PIN_COOKIE,
+            "1",
+            salt=PIN_COOKIE_SALT,
+            max_age=sticky_seconds(),
+            secure=request.is_secure(),
+            httponly=True,
+            samesite="Lax",
+        )
+
+
+def is_pinned(request):
+    # the signature carries the time it was set, max_age checks it
+    if request.get_signed_cookie(
+        PIN_COOKIE, default=None, salt=PIN_COOKIE_SALT, max_age=sticky_seconds()
+    ):
+        return True
+    key = pin_key(request)
+    return key is not None and bool(cache.get(key))
+
+
+class ReplicaReadMixin:
+    """
+    For DRF views whose reads may be served by a replica. Requests from a
+    user who wrote recently (see ``ReadYourWritesMiddleware``) stay on the
+    primary so they see their own changes.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        # authentication runs here, on the primary
+        super().initial(request, *args, **kwargs)
+        if replica_aliases() and not is_pinned(request):
+            self._replica_token = replica_reads.set(True)
+
+    def dispatch(self, request, *args, **kwargs):
+        self._replica_token = None
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            if self._replica_token is not None:
+                replica_reads.reset(self._replica_token)
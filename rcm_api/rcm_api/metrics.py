@@ -0,0 +1,265 @@
+import atexit
+import glob
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+from rcm_api.util import LatencyHistogram
+
+
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1)
+QUEUE_BUCKETS = (0, 1, 2, 4, 8, 16, 32, 64)
+
+# name: (type, help, histogram buckets)
+METRICS = {
+    "http_requests_total": (
+        "counter",
+        "Requests served, by URL name, method and status.",
+        None,
+    ),
+    "http_request_duration_seconds": (
+        "histogram",
+        "Time to serve a request, by URL name.",
+        LatencyHistogram.default_buckets,
+    ),
+    "db_query_duration_seconds": (
+        "histogram",
+        "Time of each database query made while serving a request, by alias.",
+        DB_BUCKETS,
+    ),
+    "password_hash_seconds": (
+        "histogram",
+        "Time to hash or check a password, the bulk of a login.",
+        LatencyHistogram.default_buckets,
+    ),
+    "password_hash_wait_seconds": (
+        "histogram",
+        "Time a password hash waited for a hashing thread.",
+        LatencyHistogram.default_buckets,
+    ),
+    "password_hash_queue_depth": (
+        "histogram",
+        "Password hashes already waiting for a hashing thread when one more "
+        "was submitted.",
+        QUEUE_BUCKETS,
+    ),
+    "password_hash_rejected_total": (
+        "counter",
+        "Password hashes refused with a 503 because every hashing slot was taken.",
+        None,
+    ),
+    "singleflight_requests_total": (
+        "counter",
+        "GET requests through single flight, by view and result: miss computed "
+        "it, hit shared another's, timeout and error computed it after waiting.",
+        None,
+    ),
+    "image_processing_seconds": (
+        "histogram",
+        "Time spent resizing user photos, by operation.",
+        LatencyHistogram.default_buckets,
+    ),
+}
+
+
+def metrics_settings():
+    defaults = {
+        "ENABLED": True,
+        # shared by the workers of one deployment, next to the slow query log
+        "DIRECTORY": os.path.join(settings.BASE_DIR, "logs", "metrics"),
+        # seconds between writes of this process' values to DIRECTORY
+        "FLUSH_INTERVAL": 5,
+        # bearer token Prometheus scrapes /api/metrics/ with, see
+        # rcm_api.permissions.ScrapeTokenAuthentication
+        "SCRAPE_TOKEN": None,
+    }
+    defaults.update(getattr(settings, "METRICS", {}))
+    return defaults
+
+
+def label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_labels(labels, **extra):
+    pairs = [*labels, *extra.items()]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{escape(value)}"' for name, value in pairs) + "}"
+
+
+def format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class MetricsRegistry:
+    """
+    Counters and fixed-bucket histograms of this process.
+
+    Recording takes one short lock. Every ``FLUSH_INTERVAL`` seconds, on the
+    next recording, the process writes its values to its own file in
+    ``DIRECTORY``; ``collect`` adds up the files of every worker, so any of
+    them can answer a scrape for the whole deployment.
+
+    Files are named after the worker's parent, the master process, and the
+    worker's pid and start time. The files of exited workers of the same
+    master still count, so the totals never go backwards when a worker is
+    recycled. The files of earlier masters are deleted once their workers
+    are gone.
+    """
+
+    def __init__(self):
+        conf = metrics_settings()
+        self.enabled = conf["ENABLED"]
+        self.directory = conf["DIRECTORY"]
+        self.scrape_token = conf["SCRAPE_TOKEN"]
+        self.flush_interval = conf["FLUSH_INTERVAL"]
+        self.reset()
+        # a forked worker starts from zero, not from its parent's values
+        os.register_at_fork(after_in_child=self.reset)
+        atexit.register(self.flush)
+
+    def reset(self):
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.last_flush = time.monotonic()
+        # a pid is reused once its process exits, the start time tells apart
+        # the files of the two
+        self.file_name = f"metrics-{os.getppid()}-{os.getpid()}-{time.time_ns()}.json"
+
+    def inc(self, name, value=1, **labels):
+        key = (name, label_key(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+        self.maybe_flush()
+
+    def observe(self, name, seconds, **labels):
+        key = (name, label_key(labels))
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self.histograms.get(key)
+                if histogram is None:
+                    histogram = LatencyHistogram(METRICS[name][2])
+                    self.histograms[key] = histogram
+        histogram.observe(seconds)
+        self.maybe_flush()
+
+    @contextmanager
+    def timer(self, name, **labels):
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started_at, **labels)
+
+    def values(self):
+        with self._lock:
+            counters = list(self.counters.items())
+            histograms = list(self.histograms.items())
+        return {
+            "counters": [[name, labels, value] for (name, labels), value in counters],
+            "histograms": [
+                [name, labels, list(histogram.counts), histogram.total]
+                for (name, labels), histogram in histograms
+            ],
+        }
+
+
+    def maybe_flush(self):
+        if time.monotonic() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        if not self.enabled or not self._flush_lock.acquire(blocking=False):
+            return
+        try:
+            self.last_flush = time.monotonic()
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, self.file_name)
+            # written aside and renamed, a reader never sees half a file
+            with open(f"{path}.tmp", "w") as file:
+                json.dump(self.values(), file)
+            os.replace(f"{path}.tmp", path)
+        finally:
+            self._flush_lock.release()
+
+    def collect(self):
+        """Values of every process that wrote to ``DIRECTORY``, added up."""
+        self.flush()
+        counters = {}
+        histograms = {}
+        master = f"metrics-{os.getppid()}-"
+        for path in glob.glob(os.path.join(self.directory, "metrics-*-*-*.json")):
+            if not os.path.basename(path).startswith(master):
+                self.remove_if_exited(path)
+                continue
+            try:
+                with open(path) as file:
+                    values = json.load(file)
+            except (OSError, ValueError):
+                continue
+            for name, labels, value in values["counters"]:
+                key = (name, tuple(map(tuple, labels)))
+                counters[key] = counters.get(key, 0) + value
+            for name, labels, counts, total in values["histograms"]:
+                key = (name, tuple(map(tuple, labels)))
+                merged = histograms.setdefault(key, [[0] * len(counts), 0.0])
+                merged[0] = [a + b for a, b in zip(merged[0], counts)]
+                merged[1] += total
+        return counters, histograms
+
+    def remove_if_exited(self, path):
+        """Delete the file of another master's worker once that worker exited."""
+        pid = int(os.path.basename(path).split("-")[2])
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        except OSError:
+            # PermissionError: it runs, as another user
+            pass
+
+    def render(self):
+        """The collected values in the Prometheus text exposition format."""
+        counters, histograms = self.collect()
+        lines = []
+        for name, (kind, help_text, buckets) in METRICS.items():
+            series = counters if kind == "counter" else histograms
+            keys = sorted(key for key in series if key[0] == name)
+            if not keys:
+                continue
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for key in keys:
+                labels = key[1]
+                if kind == "counter":
+                    lines.append(f"{name}{format_labels(labels)} {series[key]}")
+                    continue
+                counts, total = series[key]
+                cumulative = 0
+                for upper_bound, count in zip([*buckets, float("inf")], counts):
+                    cumulative += count
+                    bucket_labels = format_labels(labels, le=format_value(upper_bound))
+                    lines.append(f"{name}_bucket{bucket_labels} {cumulative}")
+                lines.append(f"{name}_sum{format_labels(labels)} {format_value(total)}")
+                lines.append(f"{name}_count{format_labels(labels)} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
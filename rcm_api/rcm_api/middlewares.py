@@ -1,7 +1,19 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.core.exceptions import MiddlewareNotUsed
 from django.http import JsonResponse
+from django.utils.cache import patch_vary_headers
 
 from django.utils.translation import gettext_lazy as _
 
+from rcm_api.db_router import pin_to_primary
+from rcm_api.compression import coded_etag, response_compression
+from rcm_api.profiling import instrument, request_profiler
+from rcm_api.metrics import metrics
+from rcm_api.query_wrappers import execute_wrapper
+from rcm_api.slow_queries import slow_query_log
+
 
 class CustomErrorMiddleware:
     def __init__(self, get_response):
@@ -24,3 +36,213 @@ class CustomErrorMiddleware:
             }
 
             return JsonResponse(response_data, status=500)
+
+
+class ReadYourWritesMiddleware:
+    """
+    After a successful write, pin the user's reads to the primary database
+    for REPLICA_STICKY_SECONDS so replica lag never hides their own changes.
+    Views with ``pin_on_write = False``, like the batch view, pin themselves.
+    """
+
+    sync_capable = True
+    async_capable = True
+    unsafe_methods = ("POST", "PUT", "PATCH", "DELETE")
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self.get_response(request)
+        if self.pins(request, response):
+            # DRF copies the authenticated user onto the django request
+            pin_to_primary(request, response)
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        if self.pins(request, response):
+            await sync_to_async(pin_to_primary)(request, response)
+        return response
+
+    def pins(self, request, response):
+        if request.method not in self.unsafe_methods or response.status_code >= 400:
+            return False
+        match = request.resolver_match
+        view_class = getattr(match.func, "view_class", None) if match else None
+        return getattr(view_class, "pin_on_write", True)
+
+
+class CompressionMiddleware:
+    """
+    Compresses responses with the best coding the client accepts, see
+    rcm_api.compression. Streaming bodies are compressed chunk by chunk as
+    they go out instead of being buffered.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.compress(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.compress(request, await self.get_response(request))
+
+    def compress(self, request, response):
+        if response.has_header("Content-Encoding") or not (
+            response_compression.is_compressible(response.get("Content-Type", ""))
+        ):
+            return response
+        patch_vary_headers(response, ["Accept-Encoding"])
+        coding = response_compression.negotiate(
+            request.META.get("HTTP_ACCEPT_ENCODING", "")
+        )
+        if coding is None:
+            return response
+
+        match = request.resolver_match
+        endpoint = match.view_name if match else "unresolved"
+        if response.streaming:
+            if getattr(response, "is_async", False):
+                response.streaming_content = response_compression.acompress_stream(
+                    coding, response.streaming_content, endpoint
+                )
+            else:
+                response.streaming_content = response_compression.compress_stream(
+                    coding, response.streaming_content, endpoint
+                )
+            del response["Content-Length"]
+        else:
+            content = response.content
+            if len(content) < response_compression.min_size:
+                response_compression.record_skip(endpoint)
+                return response
+            compressed, cpu = response_compression.compress(coding, content)
+            if len(compressed) >= len(content):
+                response_compression.record_skip(endpoint)
+                return response
+            response_compression.record(
+                endpoint, coding, len(content), len(compressed), cpu
+            )
+            response.content = compressed
+            response["Content-Length"] = str(len(compressed))
+        response["Content-Encoding"] = coding
+        if response.has_header("ETag"):
+            # responses sent uncompressed keep the plain tag
+            response["ETag"] = coded_etag(response["ETag"], coding)
+        return response
+
+
+class ProfilingMiddleware:
+    """
+    Splits each request's time into auth, db, serialize, render and image
+    and sends it as a Server-Timing header, see rcm_api.profiling. Removed
+    from the stack altogether unless REQUEST_PROFILING["ENABLED"] is set.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not request_profiler.enabled:
+            raise MiddlewareNotUsed()
+        instrument()
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return request_profiler.arun(request, self.get_response)
+        return request_profiler.run(request, self.get_response)
+
+
+class MetricsMiddleware:
+    """
+    Counts requests by URL name, method and status and records their
+    latency and the latency of their database queries, see rcm_api.metrics.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not metrics.enabled:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started_at = time.perf_counter()
+        with execute_wrapper(self.time_query):
+            response = self.get_response(request)
+        return self.record(request, response, started_at)
+
+    async def __acall__(self, request):
+        started_at = time.perf_counter()
+        with execute_wrapper(self.time_query):
+            response = await self.get_response(request)
+        return self.record(request, response, started_at)
+
+    def record(self, request, response, started_at):
+        match = request.resolver_match
+        # unresolved paths share one label, scanners can't blow up the series
+        view = match.view_name if match else "unresolved"
+        metrics.observe(
+            "http_request_duration_seconds", time.perf_counter() - started_at, view=view
+        )
+        metrics.inc(
+            "http_requests_total",
+            view=view,
+            method=request.method,
+            status=response.status_code,
+        )
+        return response
+
+    @staticmethod
+    def time_query(execute, sql, params, many, context):
+        alias = context["connection"].alias
+        with metrics.timer("db_query_duration_seconds", alias=alias):
+            return execute(sql, params, many, context)
+
+
+class SlowQueryMiddleware:
+    """
+    Logs the request's queries slower than SLOW_QUERY_LOG["THRESHOLD_MS"]
+    with their plans, see rcm_api.slow_queries.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not slow_query_log.enabled:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with execute_wrapper(slow_query_log.wrapper(request)):
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        with execute_wrapper(slow_query_log.wrapper(request)):
+            return await self.get_response(request)
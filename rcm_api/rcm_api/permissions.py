@@ -0,0 +1,43 @@
+import hmac
+
+from django.contrib.auth.models import AnonymousUser
+
+from rest_framework.authentication import BaseAuthentication
+from rest_framework.permissions import BasePermission
+
+from rcm_api.metrics import metrics
+
+
+class IsSuperuser(BasePermission):
+    """
+    Superusers only. ``IsAdminUser`` checks ``is_staff``, which every staff
+    account has.
+    """
+
+    def has_permission(self, request, view):
+        return bool(request.user and request.user.is_superuser)
+
+
+class ScrapeTokenAuthentication(BaseAuthentication):
+    """
+    Authenticates Prometheus by ``METRICS["SCRAPE_TOKEN"]`` sent as a bearer
+    token, as an anonymous user; ``IsScraper`` lets it through. Other tokens
+    are left to the next authentication class.
+    """
+
+    def authenticate(self, request):
+        scheme, _, token = request.META.get("HTTP_AUTHORIZATION", "").partition(" ")
+        if not metrics.scrape_token or scheme.lower() != "bearer":
+            return None
+        if not hmac.compare_digest(token.encode(), metrics.scrape_token.encode()):
+            return None
+        return AnonymousUser(), None
+
+    def authenticate_header(self, request):
+        # DRF answers 403 instead of 401 when the first class has no header
+        return 'Bearer realm="api"'
+
+
+class IsScraper(BasePermission):
+    def has_permission(self, request, view):
+        return isinstance(request.successful_authenticator, ScrapeTokenAuthentication)
@@ -0,0 +1,181 @@
+import cProfile
+import os
+import random
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+from rcm_api.query_wrappers import execute_wrapper
+
+
+# profile of the request being served, None when profiling is off
+current_profile = ContextVar("current_profile", default=None)
+
+# Server-Timing order
+PHASES = ("auth", "db", "serialize", "render", "image")
+
+
+def profiling_settings():
+    defaults = {
+        "ENABLED": False,
+        # send the breakdown to the client as a Server-Timing header
+        "HEADER": True,
+        # share of requests run under cProfile, dumped when they turn out slow
+        "SAMPLE_RATE": 0.05,
+        "SLOW_MS": 500,
+        "DUMP_DIR": os.path.join(settings.BASE_DIR, "profiles"),
+    }
+    defaults.update(getattr(settings, "REQUEST_PROFILING", {}))
+    return defaults
+
+
+class RequestProfile:
+    __slots__ = ("started_at", "phases", "queries", "active")
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.phases = defaultdict(float)
+        self.queries = 0
+        self.active = set()
+
+    def record_query(self, execute, sql, params, many, context):
+        started_at = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.phases["db"] += time.perf_counter() - started_at
+
+    def server_timing(self, total):
+        metrics = []
+        for phase in PHASES:
+            if phase == "db":
+                duration = self.phases["db"] * 1000
+                metrics.append(f'db;dur={duration:.2f};desc="{self.queries} queries"')
+            elif phase in self.phases:
+                metrics.append(f"{phase};dur={self.phases[phase] * 1000:.2f}")
+        metrics.append(f"total;dur={total * 1000:.2f}")
+        return ", ".join(metrics)
+
+
+@contextmanager
+def profile_phase(name):
+    """Adds the time spent in the block to ``name`` in the request's profile."""
+    profile = current_profile.get()
+    # nested blocks of the same phase are counted once
+    if profile is None or name in profile.active:
+        yield
+        return
+    profile.active.add(name)
+    started_at = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.phases[name] += time.perf_counter() - started_at
+        profile.active.discard(name)
+
+
+def timed_method(function, phase):
+    def wrapper(*args, **kwargs):
+        with profile_phase(phase):
+            return function(*args, **kwargs)
+
+    wrapper.__wrapped__ = function
+    return wrapper
+
+
+_instrumented = False
+_instrument_lock = threading.Lock()
+
+
+def instrument():
+    """
+    Times DRF's authentication, serialization and rendering. Only done when
+    profiling is enabled, so a disabled profiler costs nothing at all.
+    """
+    global _instrumented
+    from rest_framework.response import Response
+    from rest_framework.serializers import ListSerializer, Serializer
+    from rest_framework.views import APIView
+
+    with _instrument_lock:
+        if _instrumented:
+            return
+        _instrumented = True
+        APIView.perform_authentication = timed_method(
+            APIView.perform_authentication, "auth"
+        )
+        for serializer_class in (Serializer, ListSerializer):
+            serializer_class.data = property(
+                timed_method(serializer_class.data.fget, "serialize")
+            )
+        Response.rendered_content = property(
+            timed_method(Response.rendered_content.fget, "render")
+        )
+
+
+class RequestProfiler:
+    def __init__(self):
+        conf = profiling_settings()
+        self.enabled = conf["ENABLED"]
+        self.header = conf["HEADER"]
+        self.sample_rate = conf["SAMPLE_RATE"]
+        self.slow_ms = conf["SLOW_MS"]
+        self.dump_dir = conf["DUMP_DIR"]
+
+    @contextmanager
+    def profiling(self, profile):
+        token = current_profile.set(profile)
+        try:
+            with execute_wrapper(profile.record_query):
+                yield
+        finally:
+            current_profile.reset(token)
+
+    def run(self, request, get_response):
+        profile = RequestProfile()
+        profiler = None
+        if random.random() < self.sample_rate:
+            profiler = cProfile.Profile()
+        with self.profiling(profile):
+            if profiler is not None:
+                profiler.enable()
+            try:
+                response = get_response(request)
+            finally:
+                if profiler is not None:
+                    profiler.disable()
+        return self.finish(request, response, profile, profiler)
+
+    async def arun(self, request, get_response):
+        profile = RequestProfile()
+        # no cProfile sample, it follows the event loop's thread through every
+        # other request it serves meanwhile
+        with self.profiling(profile):
+            response = await get_response(request)
+        return self.finish(request, response, profile, None)
+
+    def finish(self, request, response, profile, profiler):
+        total = time.perf_counter() - profile.started_at
+        if self.header:
+            response["Server-Timing"] = profile.server_timing(total)
+        if profiler is not None and total * 1000 >= self.slow_ms:
+            self.dump(profiler, request, total)
+        return response
+
+    def dump(self, profiler, request, total):
+        match = request.resolver_match
+        view = match.view_name.replace(":", ".") if match else "unresolved"
+        os.makedirs(self.dump_dir, exist_ok=True)
+        # open with `python -m pstats <file>` or snakeviz
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{view}"
+        profiler.dump_stats(
+            os.path.join(self.dump_dir, f"{name}-{total * 1000:.0f}ms.prof")
+        )
+
+
+request_profiler = RequestProfiler()
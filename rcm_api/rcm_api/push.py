@@ -0,0 +1,406 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from urllib.parse import parse_qs
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.module_loading import import_string
+
+
+def push_settings():
+    defaults = {
+        # InProcessHub, or CacheBrokerHub to fan out across worker processes
+        # through the shared cache
+        "HUB": "rcm_api.push.InProcessHub",
+        "QUEUE_SIZE": 100,
+        # seconds between SSE keep-alive comments, and between checks that a
+        # subscriber is still allowed to listen
+        "HEARTBEAT": 15,
+        # roles allowed to subscribe
+        "ROLES": ["SUPERUSER", "OWNER", "MANAGER"],
+        "SSE_PATH": "/push/events/",
+        "WEBSOCKET_PATH": "/push/ws/",
+        # CacheBrokerHub only
+        "POLL_INTERVAL": 0.5,
+        "EVENT_TTL": 60,
+        "KEY_PREFIX": "push",
+    }
+    defaults.update(getattr(settings, "PUSH", {}))
+    return defaults
+
+
+class Message:
+    """An event encoded once, shared by every subscriber."""
+
+    __slots__ = ("text", "sse")
+
+    def __init__(self, event):
+        self.text = json.dumps(event, separators=(",", ":"))
+        self.sse = f"data: {self.text}\n\n".encode()
+
+
+# sent instead of the events a subscriber was too slow to take
+RESYNC = Message({"event": "resync"})
+# sent last, to a subscriber whose token or user no longer lets it listen
+UNAUTHORIZED = Message({"event": "unauthorized"})
+
+
+class Subscription:
+    __slots__ = ("hub", "loop", "queue")
+
+    def __init__(self, hub, loop, queue_size):
+        self.hub = hub
+        self.loop = loop
+        self.queue = asyncio.Queue(queue_size)
+
+    def deliver(self, message):
+        # runs on the subscriber's event loop
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # the client missed events, it should resync from the change feed
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC)
+
+    def close(self):
+        self.hub.unsubscribe(self)
+
+
+class InProcessHub:
+    """
+    Fans events out to the subscribers of this process. ``publish`` may be
+    called from any thread; delivery is one callback per event loop, not one
+    per subscriber.
+    """
+
+    def __init__(self, conf):
+        self.queue_size = conf["QUEUE_SIZE"]
+        self._subscribers = {}
+        self._lock = threading.Lock()
+        self.published = 0
+
+    def subscribe(self):
+        loop = asyncio.get_running_loop()
+        subscription = Subscription(self, loop, self.queue_size)
+        with self._lock:
+            self._subscribers.setdefault(loop, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscribers.get(subscription.loop)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscribers[subscription.loop]
+
+    def publish(self, event):
+        self.dispatch(Message(event))
+
+    def dispatch(self, message):
+        with self._lock:
+            self.published += 1
+            groups = [(loop, list(subs)) for loop, subs in self._subscribers.items()]
+        for loop, subscriptions in groups:
+            try:
+                loop.call_soon_threadsafe(self._deliver, subscriptions, message)
+            except RuntimeError:
+                # loop closed under its subscribers
+                with self._lock:
+                    self._subscribers.pop(loop, None)
+
+    @staticmethod
+    def _deliver(subscriptions, message):
+        for subscription in subscriptions:
+            subscription.deliver(message)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "subscribers": sum(len(subs) for subs in self._subscribers.values()),
+                "published": self.published,
+            }
+
+
+class CacheBrokerHub(InProcessHub):
+    """
+    Stand-in for a message broker: events are numbered and stored in the
+    shared cache, and each process polls the counter and fans new events out
+    to its own subscribers. With a shared cache (redis) every worker sees
+    every event; with the default locmem cache it behaves like InProcessHub.
+    """
+
+    def __init__(self, conf):
+        super().__init__(conf)
+        self.poll_interval = conf["POLL_INTERVAL"]
+        self.event_ttl = conf["EVENT_TTL"]
+        self.key_prefix = conf["KEY_PREFIX"]
+        self.sequence_key = f"{self.key_prefix}:sequence"
+        self._listener_pid = None
+        self._last_seen = None
+
+    def event_key(self, sequence):
+        return f"{self.key_prefix}:event:{sequence}"
+
+    def subscribe(self):
+        self.start_listener()
+        return super().subscribe()
+
+    def publish(self, event):
+        cache.add(self.sequence_key, 0, None)
+        sequence = cache.incr(self.sequence_key)
+        cache.set(self.event_key(sequence), event, self.event_ttl)
+
+    def start_listener(self):
+        with self._lock:
+            if self._listener_pid == os.getpid():
+                return
+            self._listener_pid = os.getpid()
+            # only events published from now on
+            self._last_seen = cache.get(self.sequence_key, 0)
+        threading.Thread(target=self.listen, name="push-listener", daemon=True).start()
+
+    def listen(self):
+        while True:
+            time.sleep(self.poll_interval)
+            try:
+                self.poll()
+            except Exception:
+                # a cache hiccup must not kill the listener
+                continue
+
+    def poll(self):
+        sequence = cache.get(self.sequence_key, 0)
+        if sequence <= self._last_seen:
+            return
+        keys = [self.event_key(number) for number in range(self._last_seen + 1, sequence + 1)]
+        events = cache.get_many(keys)
+        self._last_seen = sequence
+        for key in keys:
+            if key in events:
+                self.dispatch(Message(events[key]))
+
+
+push_hub = import_string(push_settings()["HUB"])(push_settings())
+
+
+def scope_token(scope):
+    for name, value in scope.get("headers", []):
+        if name == b"authorization":
+            parts = value.split()
+            if len(parts) == 2 and parts[0].lower() == b"bearer":
+                return parts[1]
+    # EventSource and browser WebSockets can't send headers
+    token = parse_qs(scope.get("query_string", b"").decode()).get("token")
+    return token[0].encode() if token else None
+
+
+async def authenticate_scope(scope):
+    # imported here, user.models imports this module
+    from rest_framework.exceptions import AuthenticationFailed
+    from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+
+    from user.authentication import CachedJWTAuthentication
+
+    raw_token = scope_token(scope)
+    if raw_token is None:
+        return None
+    try:
+        return await CachedJWTAuthentication().aauthenticate_token(raw_token)
+    except (AuthenticationFailed, InvalidToken, TokenError):
+        return None
+
+
+async def still_authorized(user, token, roles):
+    """
+    Whether a subscriber authorized as ``user`` with ``token`` may go on
+    listening: the token is neither expired nor revoked, and the user's
+    snapshot, reloaded once its ``auth_version`` moves, is still active, not
+    deleted and in one of ``roles``.
+    """
+    from rest_framework_simplejwt.settings import api_settings
+
+    from user.revocation import token_revocations
+    from user.snapshots import user_snapshots
+
+    if token["exp"] <= time.time():
+        return False
+    jti = token.get(api_settings.JTI_CLAIM)
+    if jti and await token_revocations.ais_revoked(jti):
+        return False
+    snapshot = await user_snapshots.aget(user.pk, user.auth_version)
+    return (
+        snapshot is not None
+        and snapshot["is_active"]
+        and not snapshot["is_deleted"]
+        and snapshot["role"] in roles
+    )
+
+
+async def pump(subscription, send_message, heartbeat, authorized):
+    """
+    Sends the events until the subscriber is no longer ``authorized()``,
+    checked every ``heartbeat`` seconds however busy the queue is.
+    """
+    loop = asyncio.get_running_loop()
+    next_check = loop.time() + heartbeat
+    while True:
+        try:
+            message = await asyncio.wait_for(
+                subscription.queue.get(), max(0, next_check - loop.time())
+            )
+        except asyncio.TimeoutError:
+            message = None
+        if loop.time() >= next_check:
+            # an event taken from the queue is not sent once access is lost
+            if not await authorized():
+                await send_message(UNAUTHORIZED)
+                return
+            next_check = loop.time() + heartbeat
+        await send_message(message)
+
+
+async def wait_for_disconnect(receive, disconnect_type):
+    while (await receive())["type"] != disconnect_type:
+        pass
+
+
+async def run_subscription(
+    send_message, receive, disconnect_type, heartbeat, authorized
+):
+    """
+    Streams events until the client disconnects or loses its authorization,
+    returns True in the second case.
+    """
+    subscription = push_hub.subscribe()
+    pumping = asyncio.ensure_future(
+        pump(subscription, send_message, heartbeat, authorized)
+    )
+    tasks = [
+        pumping,
+        asyncio.ensure_future(wait_for_disconnect(receive, disconnect_type)),
+    ]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        subscription.close()
+        for task in tasks:
+            task.cancel()
+    for task in done:
+        # a failed send means the client is gone, nothing left to tell it
+        task.exception()
+    return pumping in done and pumping.exception() is None
+
+
+class PushApplication:
+    """
+    ASGI entry point: serves the push channels and hands everything else to
+    django.
+
+    ``SSE_PATH`` streams events as Server-Sent Events, ``WEBSOCKET_PATH`` as
+    WebSocket text frames. Both take the access token from the Authorization
+    header or a ``token`` query parameter, are open to ``ROLES`` only, and
+    are closed after an ``unauthorized`` event once a heartbeat finds the
+    token revoked or the user no longer allowed.
+    """
+
+    def __init__(self, django_application):
+        conf = push_settings()
+        self.django_application = django_application
+        self.sse_path = conf["SSE_PATH"]
+        self.websocket_path = conf["WEBSOCKET_PATH"]
+        self.heartbeat = conf["HEARTBEAT"]
+        self.roles = conf["ROLES"]
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"] == self.sse_path:
+            return await self.server_sent_events(scope, receive, send)
+        if scope["type"] == "websocket":
+            return await self.websocket(scope, receive, send)
+        return await self.django_application(scope, receive, send)
+
+    async def server_sent_events(self, scope, receive, send):
+        authenticated = await authenticate_scope(scope)
+        if authenticated is None:
+            return await self.refuse(
+                send,
+                401,
+                b'{"detail":"Authentication credentials were not provided or are invalid."}',
+            )
+        user, token = authenticated
+        if user.role not in self.roles:
+            return await self.refuse(
+                send,
+                403,
+                b'{"detail":"You do not have permission to perform this action."}',
+            )
+
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [
+                    (b"content-type", b"text/event-stream"),
+                    (b"cache-control", b"no-cache"),
+                    # stop nginx from buffering the stream
+                    (b"x-accel-buffering", b"no"),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": b": connected\n\n", "more_body": True})
+
+        async def send_message(message):
+            body = message.sse if message is not None else b": ping\n\n"
+            await send({"type": "http.response.body", "body": body, "more_body": True})
+
+        async def authorized():
+            return await still_authorized(user, token, self.roles)
+
+        if await run_subscription(
+            send_message, receive, "http.disconnect", self.heartbeat, authorized
+        ):
+            await send({"type": "http.response.body", "body": b""})
+
+    async def refuse(self, send, status, body):
+        await send(
+            {
+                "type": "http.response.start",
+                "status": status,
+                "headers": [(b"content-type", b"application/json")],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
+
+    async def websocket(self, scope, receive, send):
+        if (await receive())["type"] != "websocket.connect":
+            return
+        authenticated = None
+        if scope["path"] == self.websocket_path:
+            authenticated = await authenticate_scope(scope)
+        if authenticated is None:
+            # before the handshake completes this rejects it with a 403
+            await send({"type": "websocket.close", "code": 4401})
+            return
+        user, token = authenticated
+        if user.role not in self.roles:
+            await send({"type": "websocket.close", "code": 4403})
+            return
+        await send({"type": "websocket.accept"})
+
+        async def send_message(message):
+            # the websocket protocol keeps idle connections alive by itself,
+            # the heartbeat only checks the authorization
+            if message is not None:
+                await send({"type": "websocket.send", "text": message.text})
+
+        async def authorized():
+            return await still_authorized(user, token, self.roles)
+
+        if await run_subscription(
+            send_message, receive, "websocket.disconnect", self.heartbeat, authorized
+        ):
+            await send({"type": "websocket.close", "code": 4401})
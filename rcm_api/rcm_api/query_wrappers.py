@@ -0,0 +1,57 @@
+import functools
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+# wrappers of the request being served, outermost first
+request_wrappers = ContextVar("request_wrappers", default=())
+
+
+def run_request_wrappers(execute, sql, params, many, context):
+    for wrapper in reversed(request_wrappers.get()):
+        execute = functools.partial(wrapper, execute)
+    return execute(sql, params, many, context)
+
+
+def install(connection):
+    if run_request_wrappers not in connection.execute_wrappers:
+        # first, ``connection.execute_wrapper`` pops the last one on exit
+        connection.execute_wrappers.insert(0, run_request_wrappers)
+
+
+@receiver(connection_created)
+def install_on_connect(sender, connection, **kwargs):
+    install(connection)
+
+
+@contextmanager
+def execute_wrapper(wrapper):
+    """
+    ``connection.execute_wrapper`` for every database, following the context
+    instead of the thread. An async view's queries run in a ``sync_to_async``
+    thread whose connections never see the wrappers of the event loop's, but
+    that thread gets a copy of the context.
+
+    ``wrapper`` takes the connection from ``context["connection"]``.
+    """
+    for connection in connections.all():
+        install(connection)
+    token = request_wrappers.set((*request_wrappers.get(), wrapper))
+    try:
+        yield
+    finally:
+        request_wrappers.reset(token)
+
+
+@contextmanager
+def without_request_wrappers():
+    """Runs the block as if no request's wrappers were installed."""
+    token = request_wrappers.set(())
+    try:
+        yield
+    finally:
+        request_wrappers.reset(token)
@@ -105,13 +105,26 @@ REST_FRAMEWORK = {
         "rest_framework.authentication.BasicAuthentication",
         "rest_framework_simplejwt.authentication.JWTAuthentication",
     ),
+    # the first one is used when the client accepts anything
+    "DEFAULT_RENDERER_CLASSES": (
+        "rcm_api.renderers.ORJSONRenderer",
+        "rcm_api.renderers.MessagePackRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ),
+    # sliding window rates for user.throttling, "<burst>/<period>"
+    "DEFAULT_THROTTLE_RATES": {
+        "login_identifier": "5/min",
+        "login_ip": "60/min",
+        "write_user": "30/min",
+        "write_ip": "120/min",
+    },
 }
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=43500),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1),
     "ROTATE_REFRESH_TOKENS": False,
     "BLACKLIST_AFTER_ROTATION": False,
-    "UPDATE_LAST_LOGIN": False,
+    "UPDATE_LAST_LOGIN": False,  # batched by user.activity instead
     "ALGORITHM": "HS256",
     "SIGNING_KEY": settings.SECRET_KEY,
     "VERIFYING_KEY": "",
@@ -140,15 +153,68 @@ SIMPLE_JWT = {
     "SLIDING_TOKEN_REFRESH_SERIALIZER": "rest_framework_simplejwt.serializers.TokenRefreshSlidingSerializer",
 }
 
+# batched last_login / last_seen writes, see user.activity
+USER_ACTIVITY = {
+    "FLUSH_INTERVAL": 5,  # seconds between batched writes
+    "MAX_BUFFER": 5000,  # users buffered before an early flush
+    "BATCH_SIZE": 1000,  # rows per UPDATE statement
+}
+
+# revoked access tokens, see user.revocation
+TOKEN_REVOCATION = {
+    "REFRESH_INTERVAL": 5,  # seconds between checks for new revocations
+    "REFRESH_OVERLAP": 60,  # seconds re-read on each refresh
+    "BLOOM_CAPACITY": 100000,
+    "BLOOM_ERROR_RATE": 0.001,
+    "KEY_PREFIX": "token:revoked",
+}
+
+# cached user snapshots used by user.authentication.CachedJWTAuthentication
+USER_SNAPSHOT_CACHE = {
+    "LOCAL_MAX_SIZE": 10000,  # entries kept in each worker's LRU
+    "LOCAL_TTL": 5,  # seconds a worker trusts its own copy
+    "SHARED_TTL": 60 * 60,  # seconds a snapshot lives in the shared cache
+    "KEY_PREFIX": "user:snapshot",
+}
+
+# negative lookups remembered by user.identity
+USER_IDENTITY_CACHE = {
+    "MISS_TTL": 60,
+    "LOCAL_MAX_SIZE": 10000,
+    "KEY_PREFIX": "user:identity-miss",
+}
+
+# bounded thread pool for password hashing, see user.hashing
+PASSWORD_HASH_EXECUTOR = {
+    "MAX_WORKERS": 4,  # hashes running at once
+    "QUEUE_LIMIT": 32,  # hashes allowed to wait for a worker
+    "SLOT_TIMEOUT": 0.05,  # seconds to wait for a slot before answering 503
+}
+
+# cached group names and permissions, see user.effective_permissions
+USER_PERMISSION_CACHE = {
+    "LOCAL_MAX_SIZE": 10000,
+    "LOCAL_TTL": 5,
+    "SHARED_TTL": 60 * 60,
+    "KEY_PREFIX": "user:perms",
+}
+
 
 MIDDLEWARE = [
+    # first, so its total covers every other middleware
+    "rcm_api.middlewares.ProfilingMiddleware",
+    "rcm_api.middlewares.MetricsMiddleware",
+    "rcm_api.middlewares.SlowQueryMiddleware",
     "django.middleware.security.SecurityMiddleware",
+    # outermost after security, sees the bodies every other middleware left
+    "rcm_api.middlewares.CompressionMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.locale.LocaleMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "rcm_api.middlewares.ReadYourWritesMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     # "rcm_api.middlewares.CustomErrorMiddleware",#added by me
@@ -187,13 +253,74 @@ WSGI_APPLICATION = "rcm_api.wsgi.application"
 
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.postgresql_psycopg2",
+        # postgresql_psycopg2 with a per-process connection pool
+        "ENGINE": "rcm_api.db_pool",
         "NAME": env("DB_NAME"),
         "USER": env("DB_USER"),
         "PASSWORD": env("DB_PASSWORD"),
         "HOST": env("DB_HOST"),
         "PORT": env("DB_PORT"),
+        # connections go back to the pool at the end of each request
+        "CONN_MAX_AGE": 0,
+        "POOL": {
+            "MIN_SIZE": env.int("DB_POOL_MIN_SIZE", default=2),
+            "MAX_SIZE": env.int("DB_POOL_MAX_SIZE", default=10),
+            "TIMEOUT": env.float("DB_POOL_TIMEOUT", default=5),
+            "MAX_LIFETIME": env.int("DB_POOL_MAX_LIFETIME", default=30 * 60),
+            "MAX_IDLE": env.int("DB_POOL_MAX_IDLE", default=5 * 60),
+            "CHECK_AFTER": env.float("DB_POOL_CHECK_AFTER", default=5),
+        },
+    }
+}
+
+# Read replicas, e.g. DB_REPLICA_HOSTS=10.0.0.2,10.0.0.3. Only views using
+# rcm_api.db_router.ReplicaReadMixin read from them. They need a shared
+# CACHE_URL, see user.checks.
+for index, host in enumerate(env.list("DB_REPLICA_HOSTS", default=[]), start=1):
+    DATABASES[f"replica{index}"] = {
+        **DATABASES["default"],
+        "HOST": host,
+        "TEST": {"MIRROR": "default"},
     }
+
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != "default"]
+DATABASE_ROUTERS = ["rcm_api.db_router.PrimaryReplicaRouter"]
+# seconds a user's reads stay on the primary after they write
+REPLICA_STICKY_SECONDS = 10
+
+# Server-Timing breakdown and sampled cProfile dumps of slow requests,
+# see rcm_api.profiling
+REQUEST_PROFILING = {
+    "ENABLED": env.bool("REQUEST_PROFILING", default=False),
+    "SAMPLE_RATE": env.float("REQUEST_PROFILING_SAMPLE_RATE", default=0.05),
+    "SLOW_MS": env.int("REQUEST_PROFILING_SLOW_MS", default=500),
+}
+
+# Prometheus metrics at /api/metrics/, see rcm_api.metrics. The workers of one
+# deployment add up their values through files in METRICS_DIR.
+METRICS = {
+    "ENABLED": env.bool("METRICS_ENABLED", default=True),
+}
+if env("METRICS_DIR", default=None):
+    METRICS["DIRECTORY"] = env("METRICS_DIR")
+# lets Prometheus scrape with this bearer token instead of a superuser's JWT
+if env("METRICS_SCRAPE_TOKEN", default=None):
+    METRICS["SCRAPE_TOKEN"] = env("METRICS_SCRAPE_TOKEN")
+
+# Queries slower than the threshold are logged with their plan, read the log
+# with `manage.py slow_queries`
+SLOW_QUERY_LOG = {
+    "ENABLED": env.bool("SLOW_QUERY_LOG", default=True),
+    "THRESHOLD_MS": env.int("SLOW_QUERY_THRESHOLD_MS", default=200),
+}
+if env("SLOW_QUERY_LOG_PATH", default=None):
+    SLOW_QUERY_LOG["PATH"] = env("SLOW_QUERY_LOG_PATH")
+
+# Cache
+# set CACHE_URL (e.g. redis://127.0.0.1:6379/1) so the workers share one cache
+
+CACHES = {
+    "default": env.cache("CACHE_URL", default="locmemcache://"),
 }
 
 # Password validation
@@ -250,6 +377,7 @@ STATIC_ROOT = os.path.join(BASE_DIR, "static")
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 AUTH_USER_MODEL = "user.User"
+AUTHENTICATION_BACKENDS = ["user.backends.IdentifierBackend"]
 
 CORS_ORIGIN_WHITELIST = [
     "http://localhost:2023",
@@ -0,0 +1,120 @@
+import threading
+
+from django.http import HttpResponse
+from django.utils.translation import get_language
+
+from rcm_api.metrics import metrics
+
+
+# headers describing one request rather than the resource, a follower must
+# not get the leader's
+PER_REQUEST_HEADERS = {
+    "server-timing",
+    "set-cookie",
+    "date",
+    "x-request-id",
+    "www-authenticate",
+}
+
+
+class _Call:
+    __slots__ = ("done", "result", "failed")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.failed = False
+
+
+class SingleFlight:
+    """
+    Runs one computation per key at a time within the process; callers
+    arriving while it runs wait for it and share its result.
+
+    A caller that waits longer than its timeout, or whose leader failed,
+    runs the computation itself. Each call is counted in the
+    ``singleflight_requests_total`` metric by label and result: ``miss`` for
+    a leader, ``hit`` for a shared result, ``timeout`` and ``error`` for a
+    caller that computed after waiting.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn, timeout=5, label=""):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if leader:
+            metrics.inc("singleflight_requests_total", view=label, result="miss")
+            try:
+                call.result = fn()
+                return call.result
+            except BaseException:
+                call.failed = True
+                raise
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+
+        if not call.done.wait(timeout):
+            metrics.inc("singleflight_requests_total", view=label, result="timeout")
+            return fn()
+        if call.failed:
+            # errors may depend on the caller, get our own
+            metrics.inc("singleflight_requests_total", view=label, result="error")
+            return fn()
+        metrics.inc("singleflight_requests_total", view=label, result="hit")
+        return call.result
+
+
+single_flight = SingleFlight()
+
+
+class SingleFlightMixin:
+    """
+    For DRF GET views many clients poll with the same parameters: identical
+    concurrent requests, by path, query, language, role and media type, are
+    computed and rendered once and every caller gets a copy of the bytes.
+    """
+
+    single_flight_timeout = 5
+
+    def get_single_flight_key(self, request):
+        return (
+            request.get_host(),
+            request.path,
+            "&".join(sorted(request.META.get("QUERY_STRING", "").split("&"))),
+            get_language() or "",
+            getattr(request.user, "role", ""),
+            request.accepted_media_type,
+        )
+
+    def get(self, request, *args, **kwargs):
+        status_code, content, headers = single_flight.do(
+            self.get_single_flight_key(request),
+            lambda: self.render_get(request, *args, **kwargs),
+            timeout=self.single_flight_timeout,
+            label=type(self).__name__,
+        )
+        response = HttpResponse(content, status=status_code)
+        for header, value in headers:
+            response[header] = value
+        return response
+
+    def render_get(self, request, *args, **kwargs):
+        response = super().get(request, *args, **kwargs)
+        response = self.finalize_response(request, response, *args, **kwargs)
+        response.render()
+        headers = [
+            (header, value)
+            for header, value in response.items()
+            if header.lower() not in PER_REQUEST_HEADERS
+        ]
+        # cookies are kept apart from the headers, and are never shared
+        return response.status_code, response.content, headers
@@ -0,0 +1,236 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DatabaseError, transaction
+
+from rcm_api.util import LocalLRUCache
+
+
+# set while a plan is captured, so the EXPLAIN isn't timed and explained too
+explaining = ContextVar("explaining", default=False)
+
+PLACEHOLDER_LISTS = re.compile(r"\(\s*%s(?:\s*,\s*%s)*\s*\)")
+LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+WHITESPACE = re.compile(r"\s+")
+# the start of the condition or assignment a placeholder belongs to
+CLAUSE_START = re.compile(r"\b(?:SELECT|WHERE|SET|ON|HAVING|AND|OR|WHEN)\b", re.I)
+PLACEHOLDERS = re.compile(r"%\((\w+)\)s|%s")
+INSERT_COLUMNS = re.compile(r"^\s*INSERT\s+INTO\s+\S+\s*\(([^)]*)\)\s*VALUES", re.I)
+
+
+def slow_query_settings():
+    defaults = {
+        "ENABLED": True,
+        "THRESHOLD_MS": 200,
+        "EXPLAIN": True,
+        # a fingerprint's plan is captured again after this many seconds
+        "EXPLAIN_TTL": 60 * 60,
+        "PATH": os.path.join(settings.BASE_DIR, "logs", "slow_queries.jsonl"),
+        # the log is moved to PATH + ".1" when it grows past this
+        "MAX_BYTES": 10 * 1024 * 1024,
+        "MAX_PARAM_LENGTH": 200,
+        # parameters compared to or stored in these columns are logged as
+        # their type and length only
+        "REDACTED_COLUMNS": [
+            "password",
+            "identification",
+            "passport",
+            "bank_account_number",
+        ],
+    }
+    defaults.update(getattr(settings, "SLOW_QUERY_LOG", {}))
+    return defaults
+
+
+def normalize(sql):
+    """The query with its literals and IN lists folded, for grouping."""
+    sql = PLACEHOLDER_LISTS.sub("(?)", sql)
+    sql = LITERALS.sub("?", sql.replace("%s", "?"))
+    return WHITESPACE.sub(" ", sql).strip()
+
+
+def fingerprint(sql):
+    return hashlib.blake2b(normalize(sql).encode(), digest_size=8).hexdigest()
+
+
+class SlowQueryLog:
+    """
+    Appends queries slower than ``THRESHOLD_MS`` to a JSON lines file shared
+    by the workers, with the view that ran them and their parameters.
+
+    The first time a process sees a fingerprint (and again after
+    ``EXPLAIN_TTL``) it also captures the query's plan, without ANALYZE so
+    nothing runs twice. See the ``slow_queries`` command to read the log.
+    """
+
+    def __init__(self):
+        conf = slow_query_settings()
+        self.enabled = conf["ENABLED"]
+        self.threshold = conf["THRESHOLD_MS"] / 1000
+        self.explain = conf["EXPLAIN"]
+        self.path = conf["PATH"]
+        self.max_bytes = conf["MAX_BYTES"]
+        self.max_param_length = conf["MAX_PARAM_LENGTH"]
+        self.redacted_columns = re.compile(
+            r"\b(?:%s)\b" % "|".join(map(re.escape, conf["REDACTED_COLUMNS"])), re.I
+        )
+        self.explained = LocalLRUCache(max_size=1000, ttl=conf["EXPLAIN_TTL"])
+        self._lock = threading.Lock()
+
+    def wrapper(self, request):
+        """
+        An ``execute_wrapper`` logging the slow queries of ``request``, on
+        whichever connection ran them.
+        """
+
+        def log_slow_query(execute, sql, params, many, context):
+            if explaining.get():
+                return execute(sql, params, many, context)
+            started_at = time.perf_counter()
+            result = execute(sql, params, many, context)
+            duration = time.perf_counter() - started_at
+            if duration >= self.threshold:
+                connection = context["connection"]
+                self.record(connection, request, sql, params, many, duration)
+            return result
+
+        return log_slow_query
+
+    def record(self, connection, request, sql, params, many, duration):
+        key = fingerprint(sql)
+        secrets = set() if many else self.sensitive_params(sql, params)
+        plan = None
+        if self.explain and not many and self.explained.get(key) is None:
+            self.explained.set(key, True)
+            plan = self.capture_plan(connection, sql, params)
+            if plan is not None:
+                # the plan shows the parameters inlined
+                for secret in secrets:
+                    plan = plan.replace(str(secret), "?")
+        match = request.resolver_match
+        entry = {
+            "time": time.time(),
+            "fingerprint": key,
+            "duration_ms": round(duration * 1000, 3),
+            "database": connection.alias,
+            "view": match.view_name if match else request.path,
+            "sql": sql,
+            "normalized": normalize(sql),
+            "params": None if many else self.format_params(params, secrets),
+            "plan": plan,
+        }
+        self.write(entry)
+
+    def sensitive_params(self, sql, params):
+        """
+        Values of ``params`` bound to one of ``REDACTED_COLUMNS``: the column
+        list of an INSERT, or a column named in the condition or assignment
+        the placeholder ends (``"passport" = %s``, ``"identification" LIKE
+        %s``). A value bound elsewhere too, like a search term matched against
+        several columns, is redacted everywhere.
+        """
+        if not params:
+            return set()
+        insert = INSERT_COLUMNS.match(sql)
+        if insert and not isinstance(params, dict):
+            columns = insert.group(1).split(",")
+            bound = [
+                (param, columns[index % len(columns)])
+                for index, param in enumerate(params)
+            ]
+        else:
+            bound = []
+            positional = iter(() if isinstance(params, dict) else params)
+            previous = 0
+            for match in PLACEHOLDERS.finditer(sql):
+                if match.group(1):
+                    param = params.get(match.group(1))
+                else:
+                    param = next(positional, None)
+                text = CLAUSE_START.split(sql[previous : match.start()])[-1]
+                bound.append((param, text))
+                previous = match.end()
+        return {
+            param
+            for param, text in bound
+            if isinstance(param, (str, bytes)) and self.redacted_columns.search(text)
+        }
+
+    def format_params(self, params, secrets=()):
+        if params is None:
+            return None
+        if isinstance(params, dict):
+            params = params.values()
+        return [
+            f"<redacted {type(param).__name__}, length {len(param)}>"
+            if isinstance(param, (str, bytes)) and param in secrets
+            else repr(param)[: self.max_param_length]
+            for param in params
+        ]
+
+    def capture_plan(self, connection, sql, params):
+        options = {}
+        if connection.vendor == "postgresql":
+            options["analyze"] = False
+        try:
+            prefix = connection.ops.explain_query_prefix(**options)
+        except (ValueError, NotImplementedError, DatabaseError):
+            return None
+        token = explaining.set(True)
+        try:
+            # inside a transaction this is a savepoint, a failing EXPLAIN
+            # can't break the request's transaction
+            with transaction.atomic(using=connection.alias):
+                with connection.cursor() as cursor:
+                    cursor.execute(f"{prefix} {sql}", params)
+                    rows = cursor.fetchall()
+        except DatabaseError:
+            return None
+        finally:
+            explaining.reset(token)
+        return "\n".join(" ".join(str(column) for column in row) for row in rows)
+
+    def write(self, entry):
+        line = json.dumps(entry, default=str) + "\n"
+        with self._lock:
+            try:
+                if os.path.getsize(self.path) > self.max_bytes:
+                    os.replace(self.path, f"{self.path}.1")
+            except OSError:
+                pass
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            # one write to a file opened for appending, lines don't interleave
+            with open(self.path, "a") as file:
+                file.write(line)
+
+    def read(self, since=None):
+        entries = []
+        for path in (f"{self.path}.1", self.path):
+            try:
+                with open(path) as file:
+                    for line in file:
+                        try:
+                            entry = json.loads(line)
+                        except ValueError:
+                            continue
+                        if since is None or entry["time"] >= since:
+                            entries.append(entry)
+            except OSError:
+                continue
+        return entries
+
+    def clear(self):
+        for path in (self.path, f"{self.path}.1"):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+slow_query_log = SlowQueryLog()
@@ -0,0 +1,109 @@
+import zlib
+
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase
+
+from rcm_api.compression import ResponseCompression, coded_etag, uncoded_etag
+from rcm_api.middlewares import CompressionMiddleware
+
+
+BODY = b'{"name":"Sam"}' * 200
+
+
+def gunzip(data):
+    return zlib.decompress(data, 31)
+
+
+class NegotiationTests(SimpleTestCase):
+    def setUp(self):
+        self.compression = ResponseCompression()
+        self.compression.encodings = ["br", "gzip"]
+
+    def test_best_accepted_coding(self):
+        cases = [
+            ("gzip, br", "br"),
+            ("GZIP", "gzip"),
+            ("br;q=0.5, gzip", "gzip"),
+            ("br;q=0, *", "gzip"),
+            ("*;q=0", None),
+            ("identity", None),
+            ("", None),
+        ]
+        for header, coding in cases:
+            with self.subTest(header=header):
+                self.assertEqual(self.compression.negotiate(header), coding)
+
+
+class CodedETagTests(SimpleTestCase):
+    def test_strong_tags_name_the_coding(self):
+        self.assertEqual(coded_etag('"abc"', "gzip"), '"abc-gzip"')
+        self.assertEqual(uncoded_etag('"abc-gzip"'), '"abc"')
+        self.assertEqual(uncoded_etag('"abc"'), '"abc"')
+
+    def test_weak_tags_are_left_alone(self):
+        self.assertEqual(coded_etag('W/"abc"', "gzip"), 'W/"abc"')
+
+
+class CompressionMiddlewareTests(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def respond(self, response, accept_encoding="gzip"):
+        middleware = CompressionMiddleware(lambda request: response)
+        return middleware(self.factory.get("/", HTTP_ACCEPT_ENCODING=accept_encoding))
+
+    def test_compressed_with_its_own_etag(self):
+        response = HttpResponse(BODY, content_type="application/json")
+        response["ETag"] = '"abc"'
+        response = self.respond(response)
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(response["ETag"], '"abc-gzip"')
+        self.assertEqual(response["Vary"], "Accept-Encoding")
+        self.assertEqual(int(response["Content-Length"]), len(response.content))
+        self.assertEqual(gunzip(response.content), BODY)
+
+    def test_small_responses_are_sent_as_they_are(self):
+        response = HttpResponse(b'{"a":1}', content_type="application/json")
+        response["ETag"] = '"abc"'
+        response = self.respond(response)
+        self.assertFalse(response.has_header("Content-Encoding"))
+        self.assertEqual(response["ETag"], '"abc"')
+        self.assertEqual(response["Vary"], "Accept-Encoding")
+        self.assertEqual(response.content, b'{"a":1}')
+
+    def test_other_content_types_are_left_alone(self):
+        response = self.respond(HttpResponse(BODY, content_type="image/png"))
+        self.assertFalse(response.has_header("Content-Encoding"))
+        self.assertFalse(response.has_header("Vary"))
+
+    def test_streams_are_compressed_chunk_by_chunk(self):
+        chunks = [b'{"n":%d}' % number for number in range(3)]
+        response = self.respond(
+            StreamingHttpResponse(iter(chunks), content_type="application/json")
+        )
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertFalse(response.has_header("Content-Length"))
+
+        decompressor = zlib.decompressobj(31)
+        streamed = iter(response.streaming_content)
+        for chunk in chunks:
+            # each chunk can be decoded as soon as it arrives
+            self.assertEqual(decompressor.decompress(next(streamed)), chunk)
+        decompressor.decompress(b"".join(streamed))
+        self.assertTrue(decompressor.eof)
+
+    async def test_async_streams_are_compressed(self):
+        async def chunks():
+            for number in range(3):
+                yield b'{"n":%d}' % number
+
+        async def view(request):
+            return StreamingHttpResponse(chunks(), content_type="application/json")
+
+        middleware = CompressionMiddleware(view)
+        response = await middleware(
+            self.factory.get("/", HTTP_ACCEPT_ENCODING="gzip")
+        )
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        body = b"".join([chunk async for chunk in response.streaming_content])
+        self.assertEqual(gunzip(body), b'{"n":0}{"n":1}{"n":2}')
@@ -0,0 +1,88 @@
+from unittest import skipUnless
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from rcm_api.db_router import PIN_COOKIE
+from user.activity import activity_tracker
+from user.models import User
+from user.tests.helpers import create_user
+from user.tokens import VersionedRefreshToken
+
+
+@skipUnless(
+    settings.DATABASE_REPLICAS,
+    "needs a replica mirroring default, e.g. DB_REPLICA_HOSTS=localhost",
+)
+@override_settings(ROOT_URLCONF="user.tests.urls")
+class ReadYourWritesTests(TransactionTestCase):
+    # committed rows, the mirror reads through a connection of its own
+    databases = {"default", *settings.DATABASE_REPLICAS}
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(activity_tracker.flush)
+        self.manager = create_user("manager@example.com", 1, role=User.Role.MANAGER)
+        self.waiters = [
+            create_user(f"waiter{number}@example.com", number) for number in (2, 3)
+        ]
+        token = VersionedRefreshToken.for_user(self.manager).access_token
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+
+    def read(self, url_name, **query):
+        """The response and the aliases that read user rows."""
+        contexts = {
+            alias: CaptureQueriesContext(connections[alias])
+            for alias in ["default", *settings.DATABASE_REPLICAS]
+        }
+        for context in contexts.values():
+            context.__enter__()
+        try:
+            response = self.client.get(reverse(url_name), query)
+        finally:
+            for context in contexts.values():
+                context.__exit__(None, None, None)
+        table = User._meta.db_table
+        aliases = {
+            alias
+            for alias, context in contexts.items()
+            if any(
+                query["sql"].startswith("SELECT") and table in query["sql"]
+                for query in context.captured_queries
+            )
+        }
+        return response, aliases
+
+    def test_reads_go_to_a_replica_until_the_user_writes(self):
+        response, aliases = self.read("user:user-deleted-list")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(aliases)
+        self.assertNotIn("default", aliases)
+
+        response = self.client.patch(
+            reverse("user:me"), {"name": "Renamed"}, format="json"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+        # another worker, with its own cache, still honours the pin cookie
+        cache.clear()
+        response, aliases = self.read("user:user-deleted-list")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(aliases, {"default"})
+
+    def test_cached_responses_are_filled_from_the_primary(self):
+        for url_name, query in [
+            ("user:user-list", {}),
+            ("user:user-retrieve", {"user_id": self.waiters[0].pk}),
+        ]:
+            response, aliases = self.read(url_name, **query)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(aliases, {"default"})
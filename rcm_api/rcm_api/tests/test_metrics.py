@@ -0,0 +1,85 @@
+import os
+import tempfile
+from unittest import mock
+
+from django.test import TestCase
+
+from rest_framework.test import APIRequestFactory
+
+from rcm_api.metrics import MetricsRegistry, metrics
+from rcm_api.views import MetricsView
+from user.activity import activity_tracker
+from user.models import User
+from user.tests.helpers import create_user
+from user.tokens import VersionedRefreshToken
+
+
+class MetricsViewTests(TestCase):
+    def setUp(self):
+        self.view = MetricsView.as_view()
+        self.factory = APIRequestFactory()
+        # written in the test's transaction, not at exit
+        self.addCleanup(activity_tracker.flush)
+
+    def get(self, authorization):
+        request = self.factory.get("/api/metrics/", HTTP_AUTHORIZATION=authorization)
+        return self.view(request)
+
+    def bearer(self, user):
+        return f"Bearer {VersionedRefreshToken.for_user(user).access_token}"
+
+    def test_staff_need_to_be_superusers(self):
+        manager = create_user("manager@example.com", 1, role=User.Role.MANAGER)
+        self.assertTrue(manager.is_staff)
+        self.assertEqual(self.get(self.bearer(manager)).status_code, 403)
+
+        superuser = create_user("root@example.com", 2, is_superuser=True)
+        self.assertEqual(self.get(self.bearer(superuser)).status_code, 200)
+
+    def test_scrape_token(self):
+        with mock.patch.object(metrics, "scrape_token", "scrape-s3cret"):
+            self.assertEqual(self.get("Bearer scrape-s3cret").status_code, 200)
+            self.assertEqual(self.get("Bearer wrong").status_code, 401)
+        # unset, the token is just an invalid JWT
+        self.assertEqual(self.get("Bearer scrape-s3cret").status_code, 401)
+
+
+class MetricsFileTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.registry = self.make_registry()
+
+    def make_registry(self):
+        registry = MetricsRegistry()
+        registry.directory = self.directory
+        # no flush at exit into the removed directory
+        self.addCleanup(setattr, registry, "enabled", False)
+        return registry
+
+    def write(self, name, requests):
+        registry = self.make_registry()
+        registry.file_name = name
+        registry.inc("http_requests_total", requests, view="x")
+        registry.flush()
+
+    def total(self):
+        counters, _ = self.registry.collect()
+        return sum(
+            value
+            for (name, _), value in counters.items()
+            if name == "http_requests_total"
+        )
+
+    def test_exited_workers_of_this_master_still_count(self):
+        # a pid that can't be running
+        self.write(f"metrics-{os.getppid()}-999999999-1.json", 5)
+        self.registry.inc("http_requests_total", 2, view="x")
+        self.assertEqual(self.total(), 7)
+
+    def test_files_of_an_earlier_master_are_removed(self):
+        stale = "metrics-1-999999999-1.json"
+        self.write(stale, 5)
+        self.assertEqual(self.total(), 0)
+        self.assertNotIn(stale, os.listdir(self.directory))
@@ -0,0 +1,102 @@
+from unittest import mock
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.core.handlers.asgi import ASGIHandler
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from rcm_api.middlewares import (
+    CompressionMiddleware,
+    MetricsMiddleware,
+    ProfilingMiddleware,
+    ReadYourWritesMiddleware,
+    SlowQueryMiddleware,
+)
+from rcm_api.metrics import metrics
+from rcm_api.profiling import request_profiler
+from rcm_api.slow_queries import slow_query_log
+
+
+async def created(request):
+    return HttpResponse(b"{}", status=201, content_type="application/json")
+
+
+async def large(request):
+    return HttpResponse(b'{"a":1}' * 1000, content_type="application/json")
+
+
+def select_one():
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+    finally:
+        # the worker thread's own connection
+        connection.close()
+
+
+async def selecting(request):
+    # the query runs in another thread, as an async view's do
+    await sync_to_async(select_one, thread_sensitive=False)()
+    return HttpResponse(b"1")
+
+
+class AsyncMiddlewareTests(SimpleTestCase):
+    databases = {"default"}
+
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    async def test_read_your_writes(self):
+        middleware = ReadYourWritesMiddleware(created)
+        self.assertTrue(iscoroutinefunction(middleware))
+        request = self.factory.post("/")
+        with mock.patch("rcm_api.middlewares.pin_to_primary") as pin_to_primary:
+            response = await middleware(request)
+        pin_to_primary.assert_called_once_with(request, response)
+
+    async def test_compression(self):
+        middleware = CompressionMiddleware(large)
+        self.assertTrue(iscoroutinefunction(middleware))
+        response = await middleware(
+            self.factory.get("/", HTTP_ACCEPT_ENCODING="gzip")
+        )
+        self.assertEqual(response["Content-Encoding"], "gzip")
+
+    async def test_profiling_sees_the_queries(self):
+        with mock.patch.object(request_profiler, "enabled", True):
+            middleware = ProfilingMiddleware(selecting)
+        self.assertTrue(iscoroutinefunction(middleware))
+        response = await middleware(self.factory.get("/"))
+        self.assertIn('desc="1 queries"', response["Server-Timing"])
+
+    async def test_metrics_time_the_queries(self):
+        with mock.patch.object(metrics, "enabled", True):
+            middleware = MetricsMiddleware(selecting)
+        self.assertTrue(iscoroutinefunction(middleware))
+        with mock.patch.object(metrics, "observe") as observe, mock.patch.object(
+            metrics, "inc"
+        ):
+            await middleware(self.factory.get("/"))
+        self.assertEqual(
+            [call.args[0] for call in observe.call_args_list],
+            ["db_query_duration_seconds", "http_request_duration_seconds"],
+        )
+
+    async def test_slow_queries_are_logged(self):
+        middleware = SlowQueryMiddleware(selecting)
+        self.assertTrue(iscoroutinefunction(middleware))
+        with mock.patch.object(slow_query_log, "threshold", 0), mock.patch.object(
+            slow_query_log, "record"
+        ) as record:
+            await middleware(self.factory.get("/"))
+        record.assert_called_once()
+        self.assertEqual(record.call_args.args[2], "SELECT 1")
+
+    @override_settings(DEBUG=True)
+    def test_no_middleware_is_adapted_under_asgi(self):
+        # adaptations are only logged with DEBUG on
+        with mock.patch.object(request_profiler, "enabled", True), mock.patch.object(
+            metrics, "enabled", True
+        ), self.assertNoLogs("django.request", "DEBUG"):
+            ASGIHandler()
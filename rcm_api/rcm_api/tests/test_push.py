@@ -0,0 +1,88 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.test import TestCase
+
+from rcm_api.push import UNAUTHORIZED, PushApplication, push_hub
+from user.activity import activity_tracker
+from user.models import User
+from user.revocation import token_revocations
+from user.tests.helpers import create_user
+from user.tokens import VersionedRefreshToken
+
+
+class ServerSentEventsTests(TestCase):
+    def setUp(self):
+        self.manager = create_user("manager@example.com", 1, role=User.Role.MANAGER)
+        self.app = PushApplication(None)
+        self.app.heartbeat = 0.01
+        # written in the test's transaction, not at exit
+        self.addCleanup(activity_tracker.flush)
+
+    def open(self, user):
+        """Starts a stream for ``user``, returns its task, token and messages."""
+        token = VersionedRefreshToken.for_user(user).access_token
+        scope = {
+            "type": "http",
+            "path": self.app.sse_path,
+            "headers": [(b"authorization", f"Bearer {token}".encode())],
+            "query_string": b"",
+        }
+        sent = []
+
+        async def receive():
+            # the client never leaves
+            await asyncio.Event().wait()
+
+        async def send(message):
+            sent.append(message)
+
+        return asyncio.ensure_future(self.app(scope, receive, send)), token, sent
+
+    async def test_other_roles_are_refused(self):
+        waiter = await sync_to_async(create_user)("waiter@example.com", 2)
+        task, _, sent = self.open(waiter)
+        await asyncio.wait_for(task, 1)
+        self.assertEqual(sent[0]["status"], 403)
+
+    async def assert_closed(self, task, sent):
+        await asyncio.wait_for(task, 1)
+        self.assertEqual(sent[0]["status"], 200)
+        self.assertEqual(sent[-2]["body"], UNAUTHORIZED.sse)
+        self.assertEqual(sent[-1], {"type": "http.response.body", "body": b""})
+
+    async def test_revoked_token_closes_the_stream(self):
+        task, token, sent = self.open(self.manager)
+        await asyncio.sleep(0.05)
+        self.assertFalse(task.done())
+        await sync_to_async(token_revocations.revoke_token)(token)
+        await self.assert_closed(task, sent)
+
+    async def test_demoted_user_closes_the_stream(self):
+        task, _, sent = self.open(self.manager)
+        await asyncio.sleep(0.05)
+        self.assertFalse(task.done())
+
+        def demote():
+            with self.captureOnCommitCallbacks(execute=True):
+                self.manager.role = User.Role.WAITER
+                self.manager.save()
+
+        await sync_to_async(demote)()
+        await self.assert_closed(task, sent)
+
+    async def test_busy_stream_is_still_checked(self):
+        self.app.heartbeat = 0.05
+        task, token, sent = self.open(self.manager)
+        await asyncio.sleep(0.01)
+        await sync_to_async(token_revocations.revoke_token)(token)
+        # events keep coming faster than the heartbeat until the stream ends
+        for _ in range(200):
+            if task.done():
+                break
+            push_hub.publish({"event": "user.updated"})
+            await asyncio.sleep(0.005)
+        self.assertTrue(task.done())
+        await self.assert_closed(task, sent)
+        pings = [message for message in sent if message.get("body") == b": ping\n\n"]
+        self.assertEqual(pings, [])
@@ -0,0 +1,59 @@
+import uuid
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+import msgpack
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from rcm_api.renderers import ORJSONRenderer
+from user.activity import activity_tracker
+from user.models import User
+from user.tests.helpers import create_user
+from user.tokens import VersionedRefreshToken
+
+
+class ORJSONRendererTests(SimpleTestCase):
+    def assert_same_as_drf(self, data):
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_matches_drf(self):
+        self.assert_same_as_drf(
+            {
+                "id": uuid.UUID("4b7e0f42-1c1d-4a8e-9d59-3c8f6e0a1b2c"),
+                "utc": datetime(2024, 5, 1, 12, 30, 15, 123456, tzinfo=dt_timezone.utc),
+                "offset": datetime(
+                    2024, 5, 1, 12, 30, tzinfo=dt_timezone(timedelta(hours=3))
+                ),
+                "naive": datetime(2024, 5, 1, 12, 30),
+                "detail": _("Logged out successfully"),
+                "amount": Decimal("12.50"),
+                "name": "سام",
+                "nested": [{"n": 1, "none": None, "ok": True}],
+            }
+        )
+
+    def test_indent_is_honoured(self):
+        rendered = ORJSONRenderer().render({"a": 1}, "application/json; indent=4")
+        self.assertEqual(rendered, b'{\n  "a": 1\n}')
+
+
+@override_settings(ROOT_URLCONF="user.tests.urls")
+class RendererNegotiationTests(TestCase):
+    def setUp(self):
+        user = create_user("manager@example.com", 1, role=User.Role.MANAGER)
+        self.client = APIClient()
+        token = VersionedRefreshToken.for_user(user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        self.addCleanup(activity_tracker.flush)
+
+    def test_msgpack_is_sent_when_asked_for(self):
+        json_response = self.client.get("/api/users/me/")
+        self.assertEqual(json_response["Content-Type"], "application/json")
+
+        response = self.client.get("/api/users/me/", HTTP_ACCEPT="application/msgpack")
+        self.assertEqual(response["Content-Type"], "application/msgpack")
+        self.assertEqual(msgpack.unpackb(response.content), json_response.json())
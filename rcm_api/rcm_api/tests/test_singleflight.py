@@ -0,0 +1,101 @@
+import threading
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory
+from rest_framework.views import APIView
+
+from rcm_api.singleflight import SingleFlight, SingleFlightMixin
+
+
+class WatchedEvent(threading.Event):
+    """Tells when a follower starts waiting on the leader."""
+
+    def __init__(self):
+        super().__init__()
+        self.waiting = threading.Event()
+
+    def wait(self, timeout=None):
+        self.waiting.set()
+        return super().wait(timeout)
+
+
+class SingleFlightTests(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch("rcm_api.singleflight.metrics")
+        self.metrics = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def results(self):
+        return [call.kwargs["result"] for call in self.metrics.inc.call_args_list]
+
+    def test_followers_share_the_result_and_are_counted(self):
+        flight = SingleFlight()
+        started, release = threading.Event(), threading.Event()
+
+        def compute():
+            started.set()
+            release.wait(5)
+            return "computed"
+
+        results = []
+        leader = threading.Thread(
+            target=lambda: results.append(flight.do("key", compute, label="view"))
+        )
+        leader.start()
+        started.wait(5)
+        done = flight._calls["key"].done = WatchedEvent()
+        follower = threading.Thread(
+            target=lambda: results.append(
+                flight.do("key", lambda: "own", label="view")
+            )
+        )
+        follower.start()
+        done.waiting.wait(5)
+        release.set()
+        leader.join()
+        follower.join()
+
+        self.assertEqual(results, ["computed", "computed"])
+        self.assertEqual(sorted(self.results()), ["hit", "miss"])
+
+    def test_timeout_computes_its_own(self):
+        flight = SingleFlight()
+        release = threading.Event()
+        leader = threading.Thread(
+            target=flight.do, args=("key", lambda: release.wait(5))
+        )
+        leader.start()
+        while self.metrics.inc.call_count < 1:
+            pass
+        self.assertEqual(flight.do("key", lambda: "own", timeout=0.01), "own")
+        release.set()
+        leader.join()
+        self.assertEqual(self.results(), ["miss", "timeout"])
+
+
+class ResourceView(APIView):
+    authentication_classes = []
+    permission_classes = []
+
+    def get(self, request):
+        response = Response({"ok": True}, headers={"Server-Timing": "db;dur=3"})
+        response["Cache-Control"] = "private, max-age=0"
+        response.set_cookie("session", "leader")
+        return response
+
+
+class SharedView(SingleFlightMixin, ResourceView):
+    pass
+
+
+class SharedResponseTests(SimpleTestCase):
+    def test_per_request_headers_are_not_shared(self):
+        request = APIRequestFactory().get("/resource/")
+        response = SharedView.as_view()(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Cache-Control"], "private, max-age=0")
+        self.assertNotIn("Server-Timing", response)
+        self.assertNotIn("session", response.cookies)
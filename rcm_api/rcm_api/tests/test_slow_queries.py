@@ -0,0 +1,43 @@
+from django.test import SimpleTestCase
+
+from rcm_api.slow_queries import SlowQueryLog
+
+
+class RedactionTests(SimpleTestCase):
+    def setUp(self):
+        self.log = SlowQueryLog()
+
+    def logged_params(self, sql, params):
+        return self.log.format_params(params, self.log.sensitive_params(sql, params))
+
+    def test_condition_on_a_sensitive_column(self):
+        sql = (
+            'SELECT "user_user"."password", "user_user"."email" FROM "user_user" '
+            'WHERE "user_user"."passport" = %s AND "user_user"."email" = %s'
+        )
+        self.assertEqual(
+            self.logged_params(sql, ["A1234567", "sam@example.com"]),
+            ["<redacted str, length 8>", "'sam@example.com'"],
+        )
+
+    def test_update_and_insert(self):
+        update = 'UPDATE "user_user" SET "name" = %s, "password" = %s WHERE "id" = %s'
+        self.assertEqual(
+            self.logged_params(update, ["Sam", "pbkdf2$hash", 7]),
+            ["'Sam'", "<redacted str, length 11>", "7"],
+        )
+        insert = 'INSERT INTO "user_user" ("email", "identification") VALUES (%s, %s)'
+        self.assertEqual(
+            self.logged_params(insert, ["sam@example.com", "29001011234567"]),
+            ["'sam@example.com'", "<redacted str, length 14>"],
+        )
+
+    def test_search_term_is_redacted_in_every_column(self):
+        sql = (
+            'SELECT 1 FROM "user_user" WHERE (UPPER("name"::text) LIKE UPPER(%s) '
+            'OR UPPER("identification"::text) LIKE UPPER(%s))'
+        )
+        self.assertEqual(
+            self.logged_params(sql, ["%2900%", "%2900%"]),
+            ["<redacted str, length 6>", "<redacted str, length 6>"],
+        )
@@ -4,6 +4,14 @@ from django.conf.urls.static import static
 from django.conf import settings
 from django.conf.urls.i18n import i18n_patterns
 
+from rcm_api.views import (
+    CompressionStatsView,
+    DatabasePoolStatsView,
+    MetricsView,
+    PasswordHashStatsView,
+)
+from user.views import UserBatchView
+
 urlpatterns = [
     path("i18n/", include("django.conf.urls.i18n")),
 ]
@@ -14,6 +22,17 @@ urlpatterns += i18n_patterns(
     # path("auth/", include("djoser.urls.jwt")),
     # path("auth/", include("djoser.urls.authtoken")),
     path("api/users/", include("user.urls")),
+    path("api/batch/", UserBatchView.as_view(), name="batch"),
+    path("api/db_pool/", DatabasePoolStatsView.as_view(), name="db-pool-stats"),
+    path(
+        "api/compression/", CompressionStatsView.as_view(), name="compression-stats"
+    ),
+    path(
+        "api/password_hashing/",
+        PasswordHashStatsView.as_view(),
+        name="password-hash-stats",
+    ),
+    path("api/metrics/", MetricsView.as_view(), name="metrics"),
     # path("api/permissions/", include("apps.permissions_api.urls")),
     # path("api/category/", include("apps.category.urls")),
     # path("api/event/", include("apps.event.urls")),
@@ -1,4 +1,8 @@
 import string, random
+import bisect
+import threading
+import time
+from collections import OrderedDict
 from django.db.models.signals import pre_save
 from django.dispatch import receiver
 from django.utils.text import slugify
@@ -25,3 +29,85 @@ def unique_slug_generator(instance, new_slug=None):
 
         return unique_slug_generator(instance, new_slug=new_slug)
     return slug
+
+
+class LocalLRUCache:
+    """Small thread-safe per-process LRU cache with a per-entry TTL."""
+
+    def __init__(self, max_size=1000, ttl=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            expires_at, value = item
+            if expires_at is not None and expires_at < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram, values in seconds."""
+
+    default_buckets = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+    def __init__(self, buckets=None):
+        self.buckets = tuple(buckets or self.default_buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total += seconds
+            if seconds > self.max:
+                self.max = seconds
+
+    def snapshot(self):
+        with self._lock:
+            counts = list(self.counts)
+            count, total, maximum = self.count, self.total, self.max
+        cumulative = 0
+        buckets = []
+        for upper_bound, bucket_count in zip([*self.buckets, float("inf")], counts):
+            cumulative += bucket_count
+            buckets.append((upper_bound, cumulative))
+        return {
+            "count": count,
+            "sum": total,
+            "max": maximum,
+            "avg": total / count if count else 0.0,
+            "buckets": buckets,
+        }
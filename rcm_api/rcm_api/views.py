@@ -0,0 +1,54 @@
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from user.authentication import CachedJWTAuthentication
+from user.hashing import password_hasher
+
+from rcm_api.db_pool.pool import pool_stats
+from rcm_api.compression import response_compression
+from rcm_api.metrics import metrics
+from rcm_api.permissions import IsScraper, IsSuperuser, ScrapeTokenAuthentication
+from rcm_api.renderers import PrometheusTextRenderer
+
+
+class DatabasePoolStatsView(APIView):
+    """Connection pool metrics of the worker process serving the request."""
+
+    authentication_classes = [CachedJWTAuthentication]
+    permission_classes = [IsSuperuser]
+
+    def get(self, request, *args, **kwargs):
+        return Response({"pools": pool_stats()})
+
+
+class CompressionStatsView(APIView):
+    """Compression ratio and CPU time per endpoint, in this worker process."""
+
+    authentication_classes = [CachedJWTAuthentication]
+    permission_classes = [IsSuperuser]
+
+    def get(self, request, *args, **kwargs):
+        return Response(response_compression.stats())
+
+
+class PasswordHashStatsView(APIView):
+    """Password hashing slots, queue and rejections of this worker process."""
+
+    authentication_classes = [CachedJWTAuthentication]
+    permission_classes = [IsSuperuser]
+
+    def get(self, request, *args, **kwargs):
+        return Response(password_hasher.stats())
+
+
+class MetricsView(APIView):
+    """Metrics of every worker process, in the Prometheus text format."""
+
+    authentication_classes = [ScrapeTokenAuthentication, CachedJWTAuthentication]
+    permission_classes = [IsSuperuser | IsScraper]
+    renderer_classes = [PrometheusTextRenderer]
+
+    def get(self, request, *args, **kwargs):
+        return Response(
+            metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8"
+        )
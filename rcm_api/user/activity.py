@@ -0,0 +1,154 @@
+import atexit
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections, connections, router
+from django.utils import timezone
+
+from user.models import User
+
+logger = logging.getLogger(__name__)
+
+
+def activity_settings():
+    defaults = {
+        "FLUSH_INTERVAL": 5,
+        "MAX_BUFFER": 5000,
+        "BATCH_SIZE": 1000,
+    }
+    defaults.update(getattr(settings, "USER_ACTIVITY", {}))
+    return defaults
+
+
+def write_activity(rows, batch_size=1000):
+    """
+    Apply ``(user_id, last_login, last_seen)`` rows, never moving a timestamp
+    backwards. On PostgreSQL each batch is one ``UPDATE ... FROM (VALUES ...)``.
+    """
+    using = router.db_for_write(User)
+    connection = connections[using]
+    table = connection.ops.quote_name(User._meta.db_table)
+
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start : start + batch_size]
+        if connection.vendor == "postgresql":
+            values = ", ".join(
+                ["(%s::uuid, %s::timestamptz, %s::timestamptz)"] * len(batch)
+            )
+            sql = (
+                f"UPDATE {table} AS u "
+                "SET last_login = GREATEST(u.last_login, v.last_login), "
+                "last_seen = GREATEST(u.last_seen, v.last_seen) "
+                f"FROM (VALUES {values}) AS v(id, last_login, last_seen) "
+                "WHERE u.id = v.id"
+            )
+            params = [value for row in batch for value in row]
+            with connection.cursor() as cursor:
+                cursor.execute(sql, params)
+        else:
+            # other backends (sqlite in development): one update per user
+            for user_id, last_login, last_seen in batch:
+                users = User.objects.using(using).filter(pk=user_id)
+                users.update(last_seen=last_seen)
+                if last_login is not None:
+                    users.update(last_login=last_login)
+
+
+class ActivityTracker:
+    """
+    Buffers logins and last-seen times per process and writes them in one
+    batched statement every ``FLUSH_INTERVAL`` seconds (or once the buffer
+    holds ``MAX_BUFFER`` users). Repeated activity of the same user between
+    flushes collapses into a single row.
+
+    Only the flusher thread writes, a request filling the buffer wakes it up
+    instead, async views included. Rows of a failed write go back to the
+    buffer for the next flush.
+    """
+
+    def __init__(self):
+        conf = activity_settings()
+        self.flush_interval = conf["FLUSH_INTERVAL"]
+        self.max_buffer = conf["MAX_BUFFER"]
+        self.batch_size = conf["BATCH_SIZE"]
+        self._lock = threading.Lock()
+        self._buffer = {}
+        self._full = threading.Event()
+        self._pid = None
+
+    def record_login(self, user_id, at=None):
+        self._record(str(user_id), at or timezone.now(), login=True)
+
+    def record_seen(self, user_id, at=None):
+        self._record(str(user_id), at or timezone.now(), login=False)
+
+    def _record(self, user_id, at, login):
+        self._start_flusher()
+        with self._lock:
+            self._merge(user_id, at if login else None, at)
+            full = len(self._buffer) >= self.max_buffer
+        if full:
+            self._full.set()
+
+    def _merge(self, user_id, last_login, last_seen):
+        # the newest of each timestamp wins, the lock is held
+        buffered_login, buffered_seen = self._buffer.get(user_id, (None, None))
+        if buffered_login is not None and (
+            last_login is None or buffered_login > last_login
+        ):
+            last_login = buffered_login
+        if buffered_seen is not None and buffered_seen > last_seen:
+            last_seen = buffered_seen
+        self._buffer[user_id] = (last_login, last_seen)
+
+    def flush(self):
+        with self._lock:
+            buffer, self._buffer = self._buffer, {}
+        if not buffer:
+            return 0
+        rows = [
+            (user_id, last_login, last_seen)
+            for user_id, (last_login, last_seen) in buffer.items()
+        ]
+        try:
+            write_activity(rows, self.batch_size)
+        except Exception:
+            with self._lock:
+                for row in rows:
+                    self._merge(*row)
+            raise
+        return len(rows)
+
+    def _start_flusher(self):
+        # one flusher thread per process, restarted after a fork
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._lock:
+            if self._pid == pid:
+                return
+            self._pid = pid
+            threading.Thread(
+                target=self._run, name="user-activity-flush", daemon=True
+            ).start()
+            atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            self._full.wait(self.flush_interval)
+            self._full.clear()
+            close_old_connections()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Failed to flush user activity")
+                # the buffer is still full, don't retry right away
+                time.sleep(self.flush_interval)
+            finally:
+                close_old_connections()
+
+
+activity_tracker = ActivityTracker()
@@ -21,9 +21,9 @@ class UserAdmin(BaseUserAdmin):
                 )
             },
         ),
-        (_("Important Dates"), {"fields": ("last_login",)}),
+        (_("Important Dates"), {"fields": ("last_login", "last_seen")}),
     )
-    readonly_fields = ["last_login"]
+    readonly_fields = ["last_login", "last_seen"]
     add_fieldsets = (
         (
             None,
@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class UserConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'user'
+
+    def ready(self):
+        from user import checks  # noqa: F401, registers the system checks
+        from user.enumerations import enumerations
+
+        # served as pre-rendered bytes from the first request on
+        enumerations.build_all()
@@ -0,0 +1,263 @@
+import uuid
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse
+from django.utils.translation import gettext_lazy as _
+from django.views import View
+
+from rest_framework import status
+from rest_framework.exceptions import (
+    APIException,
+    AuthenticationFailed,
+    NotAuthenticated,
+    NotFound,
+    PermissionDenied,
+    Throttled,
+    ValidationError,
+)
+from rest_framework.filters import OrderingFilter, SearchFilter
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from user.models import User
+from user.serializers import UserSerializer
+from user.filters import UserFilter
+from user.authentication import CachedJWTAuthentication
+from user.effective_permissions import effective_permissions
+from user.etags import matching_etag, save_if_match, user_etag
+from user.identity import classify_identifier, identity_resolver
+from user.hashing import averify_password
+from user.throttling import LoginRateThrottle
+from user.activity import activity_tracker
+from user.views import check_can_login, login_response_data
+
+from rcm_api.pagination import StandardResultsSetPagination
+
+
+class AsyncAPIView(View):
+    """
+    Small async counterpart of DRF's ``APIView`` for the ASGI deployment.
+
+    Authentication runs on the event loop through the snapshot and revocation
+    caches. Serializers are sync code that may touch the ORM, so views run
+    them explicitly with ``sync_to_async``.
+    """
+
+    authentication_class = CachedJWTAuthentication
+    login_required = True
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+        # token authenticated like the DRF views, no CSRF cookie involved
+        view.csrf_exempt = True
+        return view
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            result = await self.authentication_class().aauthenticate(request)
+            if result is None:
+                request.user, request.auth = AnonymousUser(), None
+                if self.login_required:
+                    raise NotAuthenticated()
+            else:
+                request.user, request.auth = result
+            return await super().dispatch(request, *args, **kwargs)
+        except APIException as exc:
+            return self.error_response(exc)
+
+    def render(self, data, status_code=status.HTTP_200_OK):
+        return HttpResponse(
+            JSONRenderer().render(data),
+            status=status_code,
+            content_type="application/json",
+        )
+
+    def error_response(self, exc):
+        if isinstance(exc.detail, (list, dict)):
+            data = exc.detail
+        else:
+            data = {"detail": exc.detail}
+        response = self.render(data, exc.status_code)
+        if isinstance(exc, (NotAuthenticated, AuthenticationFailed)):
+            response["WWW-Authenticate"] = self.authentication_class().authenticate_header(
+                self.request
+            )
+        if isinstance(exc, Throttled) and exc.wait is not None:
+            response["Retry-After"] = "%d" % exc.wait
+        return response
+
+    def drf_request(self):
+        return Request(self.request, parsers=[JSONParser()])
+
+    def serialize(self, instance, many=False):
+        return UserSerializer(
+            instance, many=many, context={"request": self.drf_request()}
+        ).data
+
+
+def get_user_uuid(value):
+    try:
+        return uuid.UUID(str(value))
+    except ValueError:
+        raise NotFound()
+
+
+class AsyncUserListView(AsyncAPIView):
+    # used by the same DRF filter backends as UserListView
+    search_fields = ["name", "name_ar", "mobile_number", "email", "identification"]
+    ordering_fields = ["name_ar"]
+    pagination = StandardResultsSetPagination
+
+    async def get(self, request, *args, **kwargs):
+        allowed_roles = ["SUPERUSER", "OWNER", "MANAGER"]
+        if request.user.role not in allowed_roles:
+            raise PermissionDenied(_("You don't have permission to view users."))
+
+        users = self.filter_queryset(
+            User.objects.filter(is_deleted=False, is_superuser=False)
+        )
+        page_size = self.get_page_size()
+        try:
+            page_number = int(request.GET.get("page", 1))
+        except ValueError:
+            raise NotFound(_("Invalid page."))
+
+        count = await users.acount()
+        last_page = max(1, -(-count // page_size))
+        if not 1 <= page_number <= last_page:
+            raise NotFound(_("Invalid page."))
+        offset = (page_number - 1) * page_size
+        page = [user async for user in users[offset : offset + page_size]]
+
+        # serialization may load groups and permissions, keep it off the loop
+        results = await sync_to_async(self.serialize)(page, many=True)
+        return self.render(
+            {
+                "count": count,
+                "next": self.page_link(page_number + 1, last_page),
+                "previous": self.page_link(page_number - 1, last_page),
+                "results": results,
+            }
+        )
+
+    def filter_queryset(self, queryset):
+        # building the filtered queryset doesn't hit the database
+        drf_request = self.drf_request()
+        filterset = UserFilter(drf_request.query_params, queryset=queryset)
+        # a 400 like DjangoFilterBackend's, not the filter silently dropped
+        if not filterset.is_valid():
+            raise ValidationError(filterset.errors)
+        queryset = filterset.qs
+        for backend in (SearchFilter, OrderingFilter):
+            queryset = backend().filter_queryset(drf_request, queryset, self)
+        return queryset
+
+    def get_page_size(self):
+        page_size = self.pagination.page_size
+        try:
+            requested = int(self.request.GET[self.pagination.page_size_query_param])
+        except (KeyError, ValueError):
+            return page_size
+        if requested > 0:
+            return min(requested, self.pagination.max_page_size)
+        return page_size
+
+    def page_link(self, page_number, last_page):
+        if not 1 <= page_number <= last_page:
+            return None
+        url = self.request.build_absolute_uri()
+        if page_number == 1:
+            return remove_query_param(url, "page")
+        return replace_query_param(url, "page", page_number)
+
+
+class AsyncUserRetrieveView(AsyncAPIView):
+    async def get(self, request, *args, **kwargs):
+        user_id = get_user_uuid(request.GET.get("user_id"))
+        try:
+            user = await User.objects.filter(is_deleted=False).aget(id=user_id)
+        except User.DoesNotExist:
+            raise NotFound()
+        return self.render(await sync_to_async(self.serialize)(user))
+
+
+class AsyncManagerUserView(AsyncAPIView):
+    async def get(self, request, *args, **kwargs):
+        user = await self.get_user()
+        # the tag of ManagerUserView, from the row already loaded
+        etag = user_etag(user.pk, user.updated_at)
+        matched = matching_etag(request.headers.get("If-None-Match", ""), etag)
+        if matched:
+            response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+            response["ETag"] = matched
+            return response
+        response = self.render(await sync_to_async(self.serialize)(user))
+        response["ETag"] = etag
+        return response
+
+    async def put(self, request, *args, **kwargs):
+        return await self.update(partial=False)
+
+    async def patch(self, request, *args, **kwargs):
+        return await self.update(partial=True)
+
+    async def get_user(self):
+        try:
+            return await User.objects.aget(id=self.request.user.id)
+        except User.DoesNotExist:
+            raise NotFound()
+
+    async def update(self, partial):
+        allowed_roles = ["OWNER", "SUPERUSER", "MANAGER"]
+        if self.request.user.role not in allowed_roles:
+            return self.render(
+                {"detail": _("You are not authorized to change the role.")},
+                status.HTTP_403_FORBIDDEN,
+            )
+        instance = await self.get_user()
+        await sync_to_async(self.save_user)(instance, partial)
+        return self.render({"detail": _("Your data Updated successfully")})
+
+    def save_user(self, instance, partial):
+        drf_request = self.drf_request()
+        serializer = UserSerializer(
+            instance,
+            data=drf_request.data,
+            partial=partial,
+            context={"request": drf_request},
+        )
+        serializer.is_valid(raise_exception=True)
+        # 412 when If-Match doesn't match the current row
+        save_if_match(drf_request, serializer)
+
+
+class AsyncLoginView(AsyncAPIView):
+    login_required = False
+
+    async def post(self, request, *args, **kwargs):
+        drf_request = self.drf_request()
+        # the cache calls of the throttle block, run them off the loop
+        throttle = LoginRateThrottle()
+        if not await sync_to_async(throttle.allow_request)(drf_request, self):
+            raise Throttled(throttle.wait())
+
+        identifier = drf_request.data.get("identifier")
+        password = drf_request.data.get("password")
+
+        identity = classify_identifier(identifier)
+        user = await identity_resolver.aresolve(identity) if identity else None
+
+        check_can_login(user)
+        # PBKDF2 runs on the password hash executor
+        if not await averify_password(user, password):
+            raise AuthenticationFailed(
+                _("Email or phone number or password is invalid")
+            )
+
+        activity_tracker.record_login(user.pk)
+        permissions = await effective_permissions.aget(user.pk)
+        return self.render(login_response_data(user, identity, permissions))
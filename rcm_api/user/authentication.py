@@ -0,0 +1,128 @@
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from user.snapshots import user_snapshots
+from user.effective_permissions import effective_permissions
+from user.revocation import token_revocations
+from user.activity import activity_tracker
+
+
+class SnapshotUser:
+    """
+    Light stand-in for ``User`` built from a cached snapshot. Views that need
+    the full row should load it with ``request.user.id``.
+    """
+
+    is_authenticated = True
+    is_anonymous = False
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+        self.id = snapshot["id"]
+        self.pk = snapshot["id"]
+        self.email = snapshot["email"]
+        self.name = snapshot["name"]
+        self.role = snapshot["role"]
+        self.is_active = snapshot["is_active"]
+        self.is_staff = snapshot["is_staff"]
+        self.is_superuser = snapshot["is_superuser"]
+        self.is_deleted = snapshot["is_deleted"]
+        self.auth_version = snapshot["auth_version"]
+
+    def __str__(self):
+        return self.email
+
+    def __eq__(self, other):
+        return getattr(other, "pk", None) == self.pk
+
+    def __hash__(self):
+        return hash(self.pk)
+
+    def get_username(self):
+        return self.email
+
+    @property
+    def group_names(self):
+        return effective_permissions.get(self.pk)["groups"]
+
+    def get_all_permissions(self, obj=None):
+        if not self.is_active or obj is not None:
+            return set()
+        return set(effective_permissions.get(self.pk)["permissions"])
+
+    def has_perm(self, perm, obj=None):
+        if not self.is_active or obj is not None:
+            return False
+        if self.is_superuser:
+            return True
+        return perm in effective_permissions.get(self.pk)["permissions"]
+
+    def has_perms(self, perm_list, obj=None):
+        return all(self.has_perm(perm, obj) for perm in perm_list)
+
+    def has_module_perms(self, app_label):
+        if not self.is_active:
+            return False
+        if self.is_superuser:
+            return True
+        prefix = f"{app_label}."
+        return any(perm.startswith(prefix) for perm in self.get_all_permissions())
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that resolves the user from the snapshot cache instead
+    of loading the ``User`` row on every request.
+    """
+
+    def get_validated_token(self, raw_token):
+        validated_token = super().get_validated_token(raw_token)
+        jti = validated_token.get(api_settings.JTI_CLAIM)
+        if jti and token_revocations.is_revoked(jti):
+            raise InvalidToken(_("Token has been revoked"))
+        return validated_token
+
+    def get_user(self, validated_token):
+        user_id = self.get_user_id(validated_token)
+        snapshot = user_snapshots.get(user_id, validated_token.get("ver", 0))
+        return self.snapshot_user(user_id, snapshot)
+
+    async def aauthenticate(self, request):
+        """Async counterpart of ``authenticate`` for the async views."""
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        return await self.aauthenticate_token(raw_token)
+
+    async def aauthenticate_token(self, raw_token):
+        validated_token = super().get_validated_token(raw_token)
+        jti = validated_token.get(api_settings.JTI_CLAIM)
+        if jti and await token_revocations.ais_revoked(jti):
+            raise InvalidToken(_("Token has been revoked"))
+
+        user_id = self.get_user_id(validated_token)
+        snapshot = await user_snapshots.aget(user_id, validated_token.get("ver", 0))
+        return self.snapshot_user(user_id, snapshot), validated_token
+
+    def get_user_id(self, validated_token):
+        try:
+            return validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+    def snapshot_user(self, user_id, snapshot):
+        if snapshot is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+        if not snapshot["is_active"]:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        if snapshot["is_deleted"]:
+            raise AuthenticationFailed(_("This user is deleted"), code="user_deleted")
+
+        activity_tracker.record_seen(user_id)
+        return SnapshotUser(snapshot)
@@ -0,0 +1,44 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+from user.identity import resolve_identity
+from user.hashing import hash_password, verify_password
+
+
+class IdentifierBackend(ModelBackend):
+    """
+    Authenticates with an email or a mobile number.
+
+    Accepts ``identifier``, ``mobile_number`` or the usual ``username`` /
+    ``email`` keyword so the admin login, djoser and our own serializers can
+    all go through it.
+    """
+
+    def authenticate(
+        self, request, username=None, password=None, identifier=None, **kwargs
+    ):
+        UserModel = get_user_model()
+        identifier = (
+            identifier
+            or kwargs.get("mobile_number")
+            or username
+            or kwargs.get(UserModel.USERNAME_FIELD)
+        )
+        if identifier is None or password is None:
+            return None
+
+        user = resolve_identity(identifier)
+        if user is None:
+            # Run the password hasher once to reduce the timing difference
+            # between an existing and a nonexistent user (same as ModelBackend)
+            hash_password(password)
+            return None
+
+        if verify_password(user, password) and self.user_can_authenticate(user):
+            return user
+        return None
+
+    def user_can_authenticate(self, user):
+        return super().user_can_authenticate(user) and not getattr(
+            user, "is_deleted", False
+        )
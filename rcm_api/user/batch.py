@@ -0,0 +1,265 @@
+import asyncio
+import base64
+import json
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.handlers.exception import response_for_exception
+from django.core.handlers.wsgi import WSGIRequest
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import close_old_connections
+from django.http import HttpResponse
+from django.urls import Resolver404, resolve
+from django.utils import translation
+from django.utils.module_loading import import_string
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework import serializers, status
+from rest_framework.views import APIView
+
+from rcm_api.db_router import pin_to_primary
+from rcm_api.query_wrappers import without_request_wrappers
+
+
+# methods that only read, run side by side when a batch asks for it
+READ_METHODS = ("GET", "HEAD")
+# headers of a sub-response worth returning to the client
+RESPONSE_HEADERS = (
+    "ETag",
+    "Cache-Control",
+    "Retry-After",
+    "Content-Language",
+    "Server-Timing",
+)
+# headers of the batch request that don't apply to its sub-requests
+DROPPED_HEADERS = (
+    "HTTP_ACCEPT",
+    "HTTP_IF_MATCH",
+    "HTTP_IF_NONE_MATCH",
+    "HTTP_CONTENT_TYPE",
+    "HTTP_CONTENT_LENGTH",
+    "HTTP_CONTENT_ENCODING",
+)
+# middleware of MIDDLEWARE a sub-request goes through too: it is profiled,
+# counted, has its slow queries logged and pins its writes like any request
+SUB_REQUEST_MIDDLEWARE = (
+    "rcm_api.middlewares.ProfilingMiddleware",
+    "rcm_api.middlewares.MetricsMiddleware",
+    "rcm_api.middlewares.SlowQueryMiddleware",
+    "rcm_api.middlewares.ReadYourWritesMiddleware",
+)
+
+
+def batch_settings():
+    defaults = {
+        "MAX_REQUESTS": 20,
+        "MAX_WORKERS": 5,
+    }
+    defaults.update(getattr(settings, "USER_BATCH", {}))
+    return defaults
+
+
+class SubRequestSerializer(serializers.Serializer):
+    id = serializers.CharField(required=False)
+    method = serializers.ChoiceField(
+        choices=["GET", "HEAD", "POST", "PUT", "PATCH", "DELETE"], default="GET"
+    )
+    # as the client would request it, language prefix included
+    path = serializers.CharField()
+    query = serializers.DictField(required=False, default=dict)
+    headers = serializers.DictField(
+        child=serializers.CharField(), required=False, default=dict
+    )
+    body = serializers.JSONField(required=False, default=None)
+
+    def validate(self, attrs):
+        try:
+            match = resolve(attrs["path"])
+        except Resolver404:
+            match = None
+        if match is None or match.namespace != "user":
+            raise serializers.ValidationError(
+                {"path": [_("Only the user API can be called in a batch.")]}
+            )
+        if asyncio.iscoroutinefunction(match.func):
+            raise serializers.ValidationError(
+                {"path": [_("Async views can't be called in a batch.")]}
+            )
+        attrs["match"] = match
+        return attrs
+
+
+class BatchSerializer(serializers.Serializer):
+    requests = SubRequestSerializer(many=True, allow_empty=False)
+    # run consecutive reads side by side, writes always run alone and in order
+    concurrent = serializers.BooleanField(default=False)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # read per batch, not when the module is imported
+        self.fields["requests"].max_length = batch_settings()["MAX_REQUESTS"]
+
+
+def build_request(request, sub_request):
+    """A request for the sub-request's view, carrying the batch's identity."""
+    body = b""
+    if sub_request["body"] is not None:
+        body = json.dumps(sub_request["body"]).encode()
+    environ = {
+        name: value
+        for name, value in request.META.items()
+        if (name.startswith("HTTP_") and name not in DROPPED_HEADERS)
+        or name in ("REMOTE_ADDR", "SERVER_NAME", "SERVER_PORT", "wsgi.url_scheme")
+    }
+    for name, value in sub_request["headers"].items():
+        environ["HTTP_" + name.upper().replace("-", "_")] = value
+    environ.update(
+        {
+            "REQUEST_METHOD": sub_request["method"],
+            "SCRIPT_NAME": request.META.get("SCRIPT_NAME", ""),
+            "PATH_INFO": sub_request["path"],
+            "QUERY_STRING": urlencode(sub_request["query"], doseq=True),
+            "HTTP_ACCEPT": "application/json",
+            "CONTENT_TYPE": "application/json",
+            "CONTENT_LENGTH": str(len(body)),
+            "wsgi.input": BytesIO(body),
+        }
+    )
+    sub = WSGIRequest(environ)
+    sub.resolver_match = sub_request["match"]
+    # authenticated once, by the batch view
+    sub._force_auth_user = request.user
+    sub._force_auth_token = request.auth
+    return sub
+
+
+def encode_response(sub_request, response):
+    if hasattr(response, "render"):
+        response.render()
+    result = {"status": response.status_code}
+    if "id" in sub_request:
+        result["id"] = sub_request["id"]
+    result["headers"] = {
+        header: response[header]
+        for header in RESPONSE_HEADERS
+        if response.has_header(header)
+    }
+    content = response.content
+    if not content:
+        body = b"null"
+    elif response.get("Content-Type", "").startswith("application/json"):
+        # already JSON, spliced in as is instead of decoded and encoded again
+        body = content
+    else:
+        result["encoding"] = "base64"
+        body = json.dumps(base64.b64encode(content).decode()).encode()
+    head = json.dumps(result, separators=(",", ":")).encode()
+    return head[:-1] + b',"body":' + body + b"}"
+
+
+def call_view(sub):
+    match = sub.resolver_match
+    try:
+        return match.func(sub, *match.args, **match.kwargs)
+    except Exception as exc:
+        # the error response the view would have got on its own, the rest of
+        # the batch still runs
+        return response_for_exception(sub, exc)
+
+
+def sub_request_handler():
+    """``call_view`` wrapped in the SUB_REQUEST_MIDDLEWARE that are in use."""
+    handler = call_view
+    for path in reversed(settings.MIDDLEWARE):
+        if path not in SUB_REQUEST_MIDDLEWARE:
+            continue
+        try:
+            handler = import_string(path)(handler)
+        except MiddlewareNotUsed:
+            pass
+    return handler
+
+
+def run_sub_request(request, sub_request, handler, language, in_thread=False):
+    try:
+        # the batch's query wrappers are set aside, a sub-request's queries
+        # are timed and logged once, under its own view
+        with translation.override(language), without_request_wrappers():
+            sub = build_request(request, sub_request)
+            response = handler(sub)
+            return response.status_code, encode_response(sub_request, response)
+    finally:
+        if in_thread:
+            # connections opened by a worker thread are its own to give back
+            close_old_connections()
+
+
+class BatchView(APIView):
+    """
+    Runs several requests to the user API in one round trip.
+
+    The batch is authenticated once and its user is handed to every
+    sub-request, which then goes to its view through SUB_REQUEST_MIDDLEWARE
+    only, with no second token check. Each entry of ``responses`` has the
+    status, a few headers and the body of the sub-request at the same
+    position.
+    """
+
+    # a batch pins the client to the primary only when one of its writes
+    # succeeded, not for being a POST, see ReadYourWritesMiddleware
+    pin_on_write = False
+
+    def post(self, request, *args, **kwargs):
+        serializer = BatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        sub_requests = serializer.validated_data["requests"]
+        concurrent = serializer.validated_data["concurrent"]
+        language = translation.get_language()
+        handler = sub_request_handler()
+
+        # consecutive reads form one group when the batch is concurrent
+        groups = []
+        for sub_request in sub_requests:
+            if (
+                concurrent
+                and groups
+                and sub_request["method"] in READ_METHODS
+                and groups[-1][-1]["method"] in READ_METHODS
+            ):
+                groups[-1].append(sub_request)
+            else:
+                groups.append([sub_request])
+
+        responses = []
+        wrote = False
+        workers = min(batch_settings()["MAX_WORKERS"], max(map(len, groups)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for group in groups:
+                if len(group) == 1:
+                    status_code, body = run_sub_request(
+                        request, group[0], handler, language
+                    )
+                    responses.append(body)
+                    if group[0]["method"] not in READ_METHODS and status_code < 400:
+                        wrote = True
+                    continue
+                responses += [
+                    body
+                    for _, body in executor.map(
+                        lambda sub_request: run_sub_request(
+                            request, sub_request, handler, language, in_thread=True
+                        ),
+                        group,
+                    )
+                ]
+
+        response = HttpResponse(
+            b'{"responses":[' + b",".join(responses) + b"]}",
+            status=status.HTTP_200_OK,
+            content_type="application/json",
+        )
+        if wrote:
+            pin_to_primary(request, response)
+        return response
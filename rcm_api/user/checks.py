@@ -0,0 +1,45 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, Warning, register
+
+
+# backends whose entries live in one process
+PROCESS_LOCAL_CACHES = (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+)
+
+
+def cache_is_process_local():
+    backend = settings.CACHES.get("default", {}).get("BACKEND", "")
+    return backend in PROCESS_LOCAL_CACHES
+
+
+@register(Tags.caches)
+def check_cache_shared_with_replicas(app_configs, **kwargs):
+    # the response cache generations, read-your-writes pins and revocations
+    # must be seen by every worker once reads can lag behind writes
+    if getattr(settings, "DATABASE_REPLICAS", []) and cache_is_process_local():
+        return [
+            Error(
+                "Read replicas are configured but the default cache is local "
+                "to each process.",
+                hint="Set CACHE_URL to a shared cache, e.g. redis://host:6379/1.",
+                id="user.E001",
+            )
+        ]
+    return []
+
+
+@register(Tags.caches, deploy=True)
+def check_cache_shared_between_workers(app_configs, **kwargs):
+    if cache_is_process_local():
+        return [
+            Warning(
+                "The default cache is local to each process, so with several "
+                "workers cached responses, revoked tokens and throttles are "
+                "not shared between them.",
+                hint="Set CACHE_URL to a shared cache, e.g. redis://host:6379/1.",
+                id="user.W001",
+            )
+        ]
+    return []
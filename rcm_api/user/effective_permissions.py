@@ -0,0 +1,146 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
+from django.core.cache import cache
+from django.db import router, transaction
+
+from rcm_api.util import LocalLRUCache
+
+
+def permission_cache_settings():
+    defaults = {
+        "LOCAL_MAX_SIZE": 10000,
+        "LOCAL_TTL": 5,
+        "SHARED_TTL": 60 * 60,
+        "KEY_PREFIX": "user:perms",
+    }
+    defaults.update(getattr(settings, "USER_PERMISSION_CACHE", {}))
+    return defaults
+
+
+class EffectivePermissionStore:
+    """
+    Cache of each user's group names and permissions as frozensets:
+
+    - ``groups``: names of the groups the user belongs to
+    - ``user_permissions``: codenames granted to the user directly
+    - ``permissions``: every ``app_label.codename`` the user holds, directly
+      or through a group (what ``has_perm`` checks against)
+
+    Entries are dropped by the ``m2m_changed`` receivers in ``user.models``.
+    Sets read inside a transaction are not cached: they may hold changes the
+    transaction rolls back, which no receiver would ever drop.
+    """
+
+    def __init__(self):
+        conf = permission_cache_settings()
+        self.key_prefix = conf["KEY_PREFIX"]
+        self.shared_ttl = conf["SHARED_TTL"]
+        self.local = LocalLRUCache(
+            max_size=conf["LOCAL_MAX_SIZE"], ttl=conf["LOCAL_TTL"]
+        )
+
+    def cache_key(self, user_id):
+        return f"{self.key_prefix}:{user_id}"
+
+    def in_transaction(self):
+        using = router.db_for_read(Group)
+        return transaction.get_connection(using).in_atomic_block
+
+    def get(self, user_id):
+        user_id = str(user_id)
+        entry = self.local.get(user_id)
+        if entry is not None:
+            return entry
+
+        entry = cache.get(self.cache_key(user_id))
+        if entry is None:
+            if self.in_transaction():
+                return self.load(user_id)
+            entry = self.load(user_id)
+            cache.set(self.cache_key(user_id), entry, self.shared_ttl)
+
+        self.local.set(user_id, entry)
+        return entry
+
+    async def aget(self, user_id):
+        user_id = str(user_id)
+        entry = self.local.get(user_id)
+        if entry is not None:
+            return entry
+
+        entry = await cache.aget(self.cache_key(user_id))
+        if entry is None:
+            if self.in_transaction():
+                return await self.aload(user_id)
+            entry = await self.aload(user_id)
+            await cache.aset(self.cache_key(user_id), entry, self.shared_ttl)
+
+        self.local.set(user_id, entry)
+        return entry
+
+    def load(self, user_id):
+        groups = Group.objects.filter(user__pk=user_id).values_list("name", flat=True)
+        direct = Permission.objects.filter(user__pk=user_id).values_list(
+            "content_type__app_label", "codename"
+        )
+        inherited = Permission.objects.filter(group__user__pk=user_id).values_list(
+            "content_type__app_label", "codename"
+        )
+        direct = list(direct)
+        return {
+            "groups": frozenset(groups),
+            "user_permissions": frozenset(codename for _, codename in direct),
+            "permissions": frozenset(
+                f"{app_label}.{codename}"
+                for app_label, codename in [*direct, *inherited]
+            ),
+        }
+
+    async def aload(self, user_id):
+        groups = Group.objects.filter(user__pk=user_id).values_list("name", flat=True)
+        direct = Permission.objects.filter(user__pk=user_id).values_list(
+            "content_type__app_label", "codename"
+        )
+        inherited = Permission.objects.filter(group__user__pk=user_id).values_list(
+            "content_type__app_label", "codename"
+        )
+        groups = [name async for name in groups]
+        direct = [row async for row in direct]
+        inherited = [row async for row in inherited]
+        return {
+            "groups": frozenset(groups),
+            "user_permissions": frozenset(codename for _, codename in direct),
+            "permissions": frozenset(
+                f"{app_label}.{codename}"
+                for app_label, codename in [*direct, *inherited]
+            ),
+        }
+
+    def invalidate(self, user_id, using=None):
+        self.invalidate_users([user_id], using)
+
+    def invalidate_users(self, user_ids, using=None):
+        # after commit, or a request could cache the old sets again before the
+        # change is visible; a rolled back change drops nothing
+        user_ids = [str(user_id) for user_id in user_ids]
+
+        def drop():
+            cache.delete_many([self.cache_key(user_id) for user_id in user_ids])
+            for user_id in user_ids:
+                self.local.delete(user_id)
+
+        transaction.on_commit(drop, using=using)
+
+    def invalidate_groups(self, group_ids, using=None):
+        # the members are looked up now, a deleted group has none by commit
+        user_ids = (
+            get_user_model()
+            .objects.using(using)
+            .filter(groups__pk__in=group_ids)
+            .values_list("pk", flat=True)
+            .distinct()
+        )
+        self.invalidate_users(user_ids, using)
+
+effective_permissions = EffectivePermissionStore()
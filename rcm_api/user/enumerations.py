@@ -0,0 +1,99 @@
+import hashlib
+import threading
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils import translation
+from django.utils.cache import patch_cache_control, patch_vary_headers
+
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.views import APIView
+
+from user.models import User
+from user.etags import matching_etag
+
+
+# Enumerations are only a deploy away from changing, revalidated through the ETag after
+MAX_AGE = 60 * 60 * 24
+
+
+def enumeration_choices():
+    return {
+        # the superuser role is never assigned through the API
+        "roles": [
+            (value, label)
+            for value, label in User.Role.choices
+            if value != User.Role.SUPERUSER
+        ],
+        "genders": User.GENDER_CHOICES,
+    }
+
+
+class RenderedEnumeration:
+    __slots__ = ("content", "etag")
+
+    def __init__(self, data):
+        self.content = JSONRenderer().render(data)
+        digest = hashlib.blake2b(self.content, digest_size=12)
+        self.etag = f'"{digest.hexdigest()}"'
+
+
+class EnumerationCache:
+    """
+    The model's choice enumerations rendered once per language, each
+    enumeration alone and all of them together (under ``None``).
+    """
+
+    def __init__(self):
+        self._languages = {}
+        self._lock = threading.Lock()
+
+    def build(self, language):
+        with translation.override(language):
+            data = {
+                name: [{"value": value, "display": str(label)} for value, label in choices]
+                for name, choices in enumeration_choices().items()
+            }
+        rendered = {name: RenderedEnumeration(items) for name, items in data.items()}
+        rendered[None] = RenderedEnumeration(data)
+        return rendered
+
+    def build_all(self):
+        for language, _ in settings.LANGUAGES:
+            self.get(None, language)
+
+    def get(self, name, language):
+        rendered = self._languages.get(language)
+        if rendered is None:
+            with self._lock:
+                rendered = self._languages.get(language)
+                if rendered is None:
+                    rendered = self._languages[language] = self.build(language)
+        return rendered[name]
+
+
+enumerations = EnumerationCache()
+
+
+class EnumerationView(APIView):
+    """
+    Serves one enumeration (``enumeration = "roles"``...) or, by default, all
+    of them, as bytes rendered when the app started.
+    """
+
+    enumeration = None
+
+    def get(self, request, *args, **kwargs):
+        rendered = enumerations.get(self.enumeration, translation.get_language())
+        matched = matching_etag(request.headers.get("If-None-Match", ""), rendered.etag)
+        if matched:
+            response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+            response["ETag"] = matched
+        else:
+            response = HttpResponse(rendered.content, content_type="application/json")
+            response["ETag"] = rendered.etag
+        # the tokens these views require keep the responses out of shared caches
+        patch_cache_control(response, private=True, max_age=MAX_AGE)
+        patch_vary_headers(response, ["Accept-Language"])
+        return response
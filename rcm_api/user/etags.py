@@ -0,0 +1,160 @@
+import hashlib
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Count, Max
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.response import Response
+
+from rcm_api.compression import uncoded_etag
+from rcm_api.db_router import use_primary
+
+from user.models import User
+from user.response_cache import CachedResponseMixin, response_cache
+
+
+class PreconditionFailed(APIException):
+    status_code = status.HTTP_412_PRECONDITION_FAILED
+    default_detail = _("The user was changed by someone else, reload it and retry.")
+    default_code = "precondition_failed"
+
+
+def make_etag(*parts):
+    digest = hashlib.blake2b(
+        "|".join(str(part) for part in parts).encode(), digest_size=12
+    )
+    return f'"{digest.hexdigest()}"'
+
+
+def user_etag(user_id, updated_at):
+    # updated_at also moves when the user's groups or permissions change
+    return make_etag(user_id, updated_at.isoformat())
+
+
+def list_etag(queryset):
+    aggregate = queryset.order_by().aggregate(
+        last_update=Max("updated_at"), count=Count("pk")
+    )
+    last_update = aggregate["last_update"]
+    return make_etag(last_update.isoformat() if last_update else "", aggregate["count"])
+
+
+def parse_etags(header):
+    """``(tag, weak)`` pairs of an If-Match or If-None-Match header."""
+    etags = []
+    for etag in header.split(","):
+        etag = etag.strip()
+        if etag:
+            etags.append((etag.removeprefix("W/"), etag.startswith("W/")))
+    return etags
+
+
+def matching_etag(header, etag, weak=True):
+    """
+    The tag of ``header`` that matches ``etag``, None when none does.
+
+    If-None-Match uses weak comparison, If-Match strong comparison, under
+    which a weak tag never matches. The tags the compression middleware sends
+    for each coding match the tag they were made from.
+    """
+    for candidate, is_weak in parse_etags(header):
+        if candidate == "*":
+            return etag
+        if uncoded_etag(candidate) == etag and (weak or not is_weak):
+            return ("W/" if is_weak else "") + candidate
+    return None
+
+
+def etag_matches(header, etag, weak=True):
+    return matching_etag(header, etag, weak) is not None
+
+
+class ETagMixin:
+    """
+    Adds an ``ETag`` to successful GET responses and answers a matching
+    ``If-None-Match`` with 304 before anything is serialized.
+
+    Views return the tag from ``compute_etag`` (None when there is nothing
+    to tag). Views that also cache their responses keep the tag next to the
+    response, under the same generation.
+    """
+
+    def compute_etag(self):
+        raise NotImplementedError
+
+    def get_etag(self):
+        if not isinstance(self, CachedResponseMixin):
+            return self.compute_etag()
+        key = response_cache.cache_key(
+            self, self.request, self.get_response_cache_scope()
+        )
+        key = f"{key}:etag"
+        etag = response_cache.get(key)
+        if etag is None:
+            # stored under the generation like the body, so read from the
+            # primary too
+            with use_primary():
+                etag = self.compute_etag()
+            if etag is not None:
+                response_cache.set(key, etag)
+        return etag
+
+    def get(self, request, *args, **kwargs):
+        etag = self.get_etag()
+        matched = etag and matching_etag(request.headers.get("If-None-Match", ""), etag)
+        if matched:
+            # the tag the client holds, which may be that of a compressed copy
+            return Response(
+                status=status.HTTP_304_NOT_MODIFIED, headers={"ETag": matched}
+            )
+
+        response = super().get(request, *args, **kwargs)
+        if etag is not None and response.status_code == status.HTTP_200_OK:
+            response["ETag"] = etag
+        return response
+
+
+class ListETagMixin(ETagMixin):
+    """ETag of a list view: its filtered rows' latest updated_at and count."""
+
+    def compute_etag(self):
+        return list_etag(self.filter_queryset(self.get_queryset()))
+
+
+def single_user_etag(queryset, user_id):
+    try:
+        pk, updated_at = queryset.values_list("pk", "updated_at").get(pk=user_id)
+    except (User.DoesNotExist, ValidationError, ValueError):
+        return None
+    return user_etag(pk, updated_at)
+
+
+def save_if_match(request, serializer):
+    """
+    Save ``serializer`` unless the request's ``If-Match`` is stale.
+
+    Without the header the save is unconditional. With it, the row's
+    updated_at is compared and moved in one UPDATE, so of two writers holding
+    the same ETag exactly one gets through and the other gets a 412.
+    """
+    header = request.headers.get("If-Match")
+    if not header:
+        serializer.save()
+        return
+
+    instance = serializer.instance
+    if not etag_matches(
+        header, user_etag(instance.pk, instance.updated_at), weak=False
+    ):
+        raise PreconditionFailed()
+    with transaction.atomic():
+        claimed = User.objects.filter(
+            pk=instance.pk, updated_at=instance.updated_at
+        ).update(updated_at=timezone.now())
+        if not claimed:
+            raise PreconditionFailed()
+        serializer.save()
@@ -0,0 +1,193 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import (
+    check_password,
+    get_hasher,
+    identify_hasher,
+    make_password,
+)
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from rcm_api.util import LatencyHistogram
+from rcm_api.metrics import metrics
+
+
+class HashingBusy(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = _("The server is busy, please try again shortly.")
+    default_code = "hashing_busy"
+
+
+def hash_executor_settings():
+    defaults = {
+        "MAX_WORKERS": 4,
+        "QUEUE_LIMIT": 32,
+        "SLOT_TIMEOUT": 0.05,
+    }
+    defaults.update(getattr(settings, "PASSWORD_HASH_EXECUTOR", {}))
+    return defaults
+
+
+class PasswordHashExecutor:
+    """
+    Runs password hashing on a small dedicated thread pool.
+
+    At most ``MAX_WORKERS`` hashes run at once and ``QUEUE_LIMIT`` more may
+    wait. A caller that can't get one of those slots within ``SLOT_TIMEOUT``
+    seconds gets ``HashingBusy`` (503) instead of piling up behind a login
+    storm. PBKDF2 releases the GIL inside hashlib, so threads are enough.
+    """
+
+    def __init__(self, max_workers, queue_limit, slot_timeout):
+        self.max_workers = max_workers
+        self.queue_limit = queue_limit
+        self.slot_timeout = slot_timeout
+        self._slots = threading.BoundedSemaphore(max_workers + queue_limit)
+        self._lock = threading.Lock()
+        self._executor = None
+        self.in_flight = 0
+        self.running = 0
+        self.completed = 0
+        self.rejected = 0
+        self.wait_time = LatencyHistogram()
+        self.hash_time = LatencyHistogram()
+
+    @property
+    def executor(self):
+        # created lazily so forked workers don't inherit a pool without threads
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers,
+                        thread_name_prefix="password-hash",
+                    )
+        return self._executor
+
+    def submit(self, fn, *args):
+        if not self._slots.acquire(timeout=self.slot_timeout):
+            self._reject()
+        return self._submit(fn, *args)
+
+    async def asubmit(self, fn, *args):
+        # poll for a slot instead of blocking the event loop on the semaphore
+        deadline = time.monotonic() + self.slot_timeout
+        while not self._slots.acquire(blocking=False):
+            if time.monotonic() >= deadline:
+                self._reject()
+            await asyncio.sleep(0.005)
+        return await asyncio.wrap_future(self._submit(fn, *args))
+
+    def run(self, fn, *args):
+        return self.submit(fn, *args).result()
+
+    def _reject(self):
+        with self._lock:
+            self.rejected += 1
+        metrics.inc("password_hash_rejected_total")
+        raise HashingBusy()
+
+    def _submit(self, fn, *args):
+        with self._lock:
+            queue_depth = self.in_flight - self.running
+            self.in_flight += 1
+        metrics.observe("password_hash_queue_depth", queue_depth)
+        try:
+            future = self.executor.submit(self._call, time.perf_counter(), fn, *args)
+        except BaseException:
+            self._release()
+            raise
+        future.add_done_callback(self._release)
+        return future
+
+    def _call(self, queued_at, fn, *args):
+        started_at = time.perf_counter()
+        self.wait_time.observe(started_at - queued_at)
+        metrics.observe("password_hash_wait_seconds", started_at - queued_at)
+        with self._lock:
+            self.running += 1
+        try:
+            return fn(*args)
+        finally:
+            elapsed = time.perf_counter() - started_at
+            self.hash_time.observe(elapsed)
+            metrics.observe("password_hash_seconds", elapsed)
+            with self._lock:
+                self.running -= 1
+                self.completed += 1
+
+    def _release(self, future=None):
+        with self._lock:
+            self.in_flight -= 1
+        self._slots.release()
+
+    def stats(self):
+        with self._lock:
+            in_flight, running = self.in_flight, self.running
+            completed, rejected = self.completed, self.rejected
+        return {
+            "max_workers": self.max_workers,
+            "queue_limit": self.queue_limit,
+            "in_flight": in_flight,
+            "running": running,
+            "queue_depth": in_flight - running,
+            "completed": completed,
+            "rejected": rejected,
+            "wait_time": self.wait_time.snapshot(),
+            "hash_time": self.hash_time.snapshot(),
+        }
+
+
+conf = hash_executor_settings()
+password_hasher = PasswordHashExecutor(
+    max_workers=conf["MAX_WORKERS"],
+    queue_limit=conf["QUEUE_LIMIT"],
+    slot_timeout=conf["SLOT_TIMEOUT"],
+)
+
+
+def hash_password(raw_password):
+    if raw_password is None:
+        # unusable password, nothing to hash
+        return make_password(None)
+    return password_hasher.run(make_password, raw_password)
+
+
+def set_password(user, raw_password):
+    """Same as ``user.set_password`` but hashed on the executor."""
+    user.password = hash_password(raw_password)
+    user._password = raw_password
+
+
+def needs_rehash(encoded):
+    try:
+        hasher = identify_hasher(encoded)
+    except ValueError:
+        return False
+    preferred = get_hasher("default")
+    return hasher.algorithm != preferred.algorithm or preferred.must_update(encoded)
+
+
+def verify_password(user, raw_password):
+    """Same as ``user.check_password`` but hashed on the executor."""
+    if raw_password is None:
+        return False
+    valid = password_hasher.run(check_password, raw_password, user.password)
+    if valid and needs_rehash(user.password):
+        set_password(user, raw_password)
+        user.save(update_fields=["password"])
+    return valid
+
+
+async def averify_password(user, raw_password):
+    # outdated hashes are upgraded by the next sync login
+    if raw_password is None:
+        return False
+    return await password_hasher.asubmit(check_password, raw_password, user.password)
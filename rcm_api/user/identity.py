@@ -0,0 +1,129 @@
+import re
+from collections import namedtuple
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.functions import Lower
+
+from rcm_api.util import LocalLRUCache
+
+
+EMAIL = "email"
+MOBILE = "mobile"
+
+Identity = namedtuple("Identity", ["kind", "value"])
+
+mobile_separators = re.compile(r"[\s\-().]")
+mobile_regex = re.compile(r"^[0-9]{10,11}$")
+
+
+def identity_cache_settings():
+    defaults = {
+        "MISS_TTL": 60,
+        "LOCAL_MAX_SIZE": 10000,
+        "KEY_PREFIX": "user:identity-miss",
+    }
+    defaults.update(getattr(settings, "USER_IDENTITY_CACHE", {}))
+    return defaults
+
+
+def classify_identifier(identifier):
+    """
+    Decide once whether the login identifier is an email or a mobile number
+    and return it normalized, or ``None`` when it can't be either.
+    """
+    if not isinstance(identifier, str):
+        return None
+    identifier = identifier.strip()
+    if "@" in identifier:
+        # lower() rather than casefold() to match the database lower(email) index
+        return Identity(EMAIL, identifier.lower())
+    mobile_number = mobile_separators.sub("", identifier)
+    if mobile_regex.match(mobile_number):
+        return Identity(MOBILE, mobile_number)
+    return None
+
+
+class IdentityResolver:
+    """
+    Finds the user for an identity with a single indexed lookup: emails go
+    through the ``lower(email)`` index and mobile numbers through the unique
+    ``mobile_number`` index. Unknown identities are remembered for a short
+    while so repeated guesses don't reach the database.
+    """
+
+    def __init__(self):
+        conf = identity_cache_settings()
+        self.key_prefix = conf["KEY_PREFIX"]
+        self.miss_ttl = conf["MISS_TTL"]
+        self.local_misses = LocalLRUCache(
+            max_size=conf["LOCAL_MAX_SIZE"], ttl=conf["MISS_TTL"]
+        )
+
+    def miss_key(self, identity):
+        return f"{self.key_prefix}:{identity.kind}:{identity.value}"
+
+    def resolve(self, identity):
+        key = self.miss_key(identity)
+        if self.local_misses.get(key) or cache.get(key):
+            return None
+
+        user = self.lookup(identity).first()
+        if user is None:
+            self.local_misses.set(key, True)
+            cache.set(key, True, self.miss_ttl)
+        return user
+
+    async def aresolve(self, identity):
+        key = self.miss_key(identity)
+        if self.local_misses.get(key) or await cache.aget(key):
+            return None
+
+        user = await self.lookup(identity).afirst()
+        if user is None:
+            self.local_misses.set(key, True)
+            await cache.aset(key, True, self.miss_ttl)
+        return user
+
+    def lookup(self, identity):
+        users = get_user_model().objects.all()
+        if identity.kind == EMAIL:
+            # emails are unique as typed, so two may differ only in case; the
+            # oldest account wins. The few matching rows are sorted after the
+            # lower(email) index found them.
+            return (
+                users.alias(email_lower=Lower("email"))
+                .filter(email_lower=identity.value)
+                .order_by("created_at", "pk")
+            )
+        return users.filter(mobile_number=identity.value).order_by("pk")
+
+    def forget(self, user, using=None):
+        # Drop remembered misses once a user with this email or number exists.
+        # After commit, a login before then would remember the miss again.
+        keys = [
+            self.miss_key(identity)
+            for identity in (
+                Identity(EMAIL, (user.email or "").lower()),
+                Identity(MOBILE, user.mobile_number or ""),
+            )
+        ]
+
+        def drop():
+            for key in keys:
+                self.local_misses.delete(key)
+                cache.delete(key)
+
+        transaction.on_commit(drop, using=using)
+
+
+identity_resolver = IdentityResolver()
+
+
+def resolve_identity(identifier):
+    identity = classify_identifier(identifier)
+    if identity is None:
+        return None
+    return identity_resolver.resolve(identity)
@@ -0,0 +1,139 @@
+import asyncio
+import json
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient, override_settings
+from django.urls import reverse
+from django.utils import translation
+
+from user.models import User
+from user.tokens import VersionedRefreshToken
+
+
+# (sync view, async view, method, query string)
+VIEW_PAIRS = {
+    "user-list": ("user:user-list", "user:async-user-list", "get", ""),
+    "user-retrieve": ("user:user-retrieve", "user:async-user-retrieve", "get", "user_id={user_id}"),
+    "me": ("user:me", "user:async-me", "get", ""),
+    "login": ("user:login", "user:async-login", "post", ""),
+}
+
+
+def percentile(values, percent):
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, round(percent / 100 * len(values)) - 1))
+    return values[index]
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare requests/sec and p50/p99 latency of the sync and async user "
+        "views under concurrent load, in process through the ASGI handler."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--email", help="User to run the requests as.")
+        parser.add_argument(
+            "--password", help="Password of that user, needed for the login views."
+        )
+        parser.add_argument("--requests", type=int, default=500)
+        parser.add_argument("--concurrency", type=int, default=50)
+        parser.add_argument(
+            "--views", nargs="+", choices=list(VIEW_PAIRS), default=list(VIEW_PAIRS)
+        )
+        parser.add_argument("--json", action="store_true", help="Print JSON results.")
+
+    def handle(self, *args, **options):
+        users = User.objects.filter(is_active=True, is_deleted=False)
+        if options["email"]:
+            user = users.filter(email=options["email"]).first()
+        else:
+            user = users.filter(role__in=["SUPERUSER", "OWNER", "MANAGER"]).first()
+        if user is None:
+            raise CommandError("No active SUPERUSER, OWNER or MANAGER user to run as.")
+
+        views = options["views"]
+        if "login" in views and not options["password"]:
+            views = [view for view in views if view != "login"]
+            self.stderr.write("Skipping login, pass --password to include it.")
+
+        token = str(VersionedRefreshToken.for_user(user).access_token)
+        rest_framework = dict(settings.REST_FRAMEWORK)
+        # the throttles would turn a login benchmark into a 429 benchmark
+        rest_framework["DEFAULT_THROTTLE_RATES"] = {
+            scope: "1000000/s"
+            for scope in settings.REST_FRAMEWORK.get("DEFAULT_THROTTLE_RATES", {})
+        }
+        with override_settings(
+            ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"],
+            REST_FRAMEWORK=rest_framework,
+        ), translation.override("en"):
+            results = asyncio.run(
+                self.run_all(views, user, token, options)
+            )
+
+        if options["json"]:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        self.stdout.write(
+            f"{'view':<16}{'mode':<7}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}"
+        )
+        for result in results:
+            self.stdout.write(
+                f"{result['view']:<16}{result['mode']:<7}{result['requests_per_second']:>10.1f}"
+                f"{result['p50_ms']:>10.2f}{result['p99_ms']:>10.2f}{result['errors']:>8}"
+            )
+
+    async def run_all(self, views, user, token, options):
+        results = []
+        for view in views:
+            sync_name, async_name, method, query = VIEW_PAIRS[view]
+            query = query.format(user_id=user.id)
+            body = None
+            if method == "post":
+                body = {"identifier": user.email, "password": options["password"]}
+            for mode, name in (("sync", sync_name), ("async", async_name)):
+                path = reverse(name) + (f"?{query}" if query else "")
+                result = await self.load(
+                    path, method, body, token, options["requests"], options["concurrency"]
+                )
+                results.append({"view": view, "mode": mode, **result})
+        return results
+
+    async def load(self, path, method, body, token, total, concurrency):
+        client = AsyncClient()
+        semaphore = asyncio.Semaphore(concurrency)
+        latencies = []
+        errors = 0
+
+        async def one():
+            nonlocal errors
+            async with semaphore:
+                started_at = time.perf_counter()
+                if method == "post":
+                    response = await client.post(path, body, content_type="application/json")
+                else:
+                    response = await client.get(path, authorization=f"Bearer {token}")
+                latencies.append(time.perf_counter() - started_at)
+                if response.status_code >= 400:
+                    errors += 1
+
+        # warm up caches and connections first
+        await asyncio.gather(*[one() for _ in range(min(concurrency, total))])
+        latencies.clear()
+        errors = 0
+
+        started_at = time.perf_counter()
+        await asyncio.gather(*[one() for _ in range(total)])
+        elapsed = time.perf_counter() - started_at
+        return {
+            "requests": total,
+            "concurrency": concurrency,
+            "requests_per_second": total / elapsed,
+            "p50_ms": statistics.median(latencies) * 1000,
+            "p99_ms": percentile(latencies, 99) * 1000,
+            "errors": errors,
+        }
@@ -0,0 +1,142 @@
+import asyncio
+import json
+import statistics
+import threading
+import time
+import tracemalloc
+
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+
+from rcm_api.push import PushApplication, push_hub, push_settings
+from user.management.commands.bench_async_views import percentile
+from user.models import User
+from user.tokens import VersionedRefreshToken
+
+
+class Command(BaseCommand):
+    help = (
+        "Open many idle push subscribers in process and measure their memory "
+        "and the latency of fanning events out to all of them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--email", help="User to subscribe as.")
+        parser.add_argument("--subscribers", type=int, default=5000)
+        parser.add_argument("--events", type=int, default=20)
+        parser.add_argument(
+            "--websocket", action="store_true", help="Subscribe over WebSocket, not SSE."
+        )
+        parser.add_argument("--json", action="store_true", help="Print JSON results.")
+
+    def handle(self, *args, **options):
+        users = User.objects.filter(is_active=True, is_deleted=False)
+        if options["email"]:
+            user = users.filter(email=options["email"]).first()
+        else:
+            user = users.filter(role__in=["SUPERUSER", "OWNER", "MANAGER"]).first()
+        if user is None:
+            raise CommandError("No active SUPERUSER, OWNER or MANAGER user to run as.")
+
+        token = str(VersionedRefreshToken.for_user(user).access_token)
+        # keep heartbeats out of the measurement
+        push = {**push_settings(), "HEARTBEAT": 3600}
+        with override_settings(PUSH=push):
+            application = PushApplication(get_asgi_application())
+            result = asyncio.run(self.run(application, token, options))
+
+        if options["json"]:
+            self.stdout.write(json.dumps(result, indent=2))
+            return
+        for name, value in result.items():
+            if isinstance(value, float):
+                value = f"{value:.2f}"
+            self.stdout.write(f"{name:<28}{value:>12}")
+
+    async def run(self, application, token, options):
+        count = options["subscribers"]
+        websocket = options["websocket"]
+        path = push_settings()["WEBSOCKET_PATH" if websocket else "SSE_PATH"]
+        scope = {
+            "type": "websocket" if websocket else "http",
+            "method": "GET",
+            "path": path,
+            "query_string": f"token={token}".encode(),
+            "headers": [],
+        }
+        connected = 0
+        all_connected = asyncio.Event()
+        arrivals = []
+        events_received = 0
+        all_received = asyncio.Event()
+        expected = count * options["events"]
+        disconnect = asyncio.Event()
+
+        async def subscriber():
+            nonlocal connected, events_received
+            sent_connect = False
+
+            async def receive():
+                nonlocal sent_connect
+                if websocket and not sent_connect:
+                    sent_connect = True
+                    return {"type": "websocket.connect"}
+                await disconnect.wait()
+                return {"type": "websocket.disconnect" if websocket else "http.disconnect"}
+
+            async def send(message):
+                nonlocal connected, events_received
+                if message["type"] in ("websocket.accept", "http.response.start"):
+                    if message.get("status", 200) != 200:
+                        raise CommandError(f"Subscribing failed with {message['status']}.")
+                    connected += 1
+                    if connected == count:
+                        all_connected.set()
+                elif message.get("text") or message.get("body", b"").startswith(b"data:"):
+                    arrivals.append(time.perf_counter())
+                    events_received += 1
+                    if events_received == expected:
+                        all_received.set()
+
+            await application(dict(scope), receive, send)
+
+        tracemalloc.start()
+        baseline = tracemalloc.get_traced_memory()[0]
+        started_at = time.perf_counter()
+        tasks = [asyncio.ensure_future(subscriber()) for _ in range(count)]
+        await asyncio.wait_for(all_connected.wait(), 300)
+        connect_seconds = time.perf_counter() - started_at
+        # let every subscriber reach its queue
+        while push_hub.stats()["subscribers"] < count:
+            await asyncio.sleep(0.01)
+        memory = tracemalloc.get_traced_memory()[0] - baseline
+        tracemalloc.stop()
+
+        latencies = []
+        for number in range(options["events"]):
+            arrivals.clear()
+            target = events_received + count
+            published_at = time.perf_counter()
+            # published from another thread, as a request thread would
+            threading.Thread(
+                target=push_hub.publish,
+                args=({"event": "updated", "id": str(number)},),
+            ).start()
+            while events_received < target:
+                await asyncio.sleep(0.001)
+            latencies.append(max(arrivals) - published_at)
+
+        await asyncio.wait_for(all_received.wait(), 60)
+        disconnect.set()
+        await asyncio.gather(*tasks)
+        return {
+            "subscribers": count,
+            "transport": "websocket" if websocket else "sse",
+            "connect_seconds": connect_seconds,
+            "bytes_per_subscriber": round(memory / count),
+            "events": options["events"],
+            "fan_out_p50_ms": statistics.median(latencies) * 1000,
+            "fan_out_p99_ms": percentile(latencies, 99) * 1000,
+            "subscribers_left": push_hub.stats()["subscribers"],
+        }
@@ -0,0 +1,85 @@
+import json
+import statistics
+import time
+from itertools import cycle, islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory, override_settings
+from django.utils import translation
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from rcm_api.renderers import MessagePackRenderer, ORJSONRenderer
+from user.models import User
+from user.serializers import UserSerializer
+from user.management.commands.bench_async_views import percentile
+
+
+RENDERERS = {
+    "drf-json": JSONRenderer,
+    "orjson": ORJSONRenderer,
+    "msgpack": MessagePackRenderer,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Time rendering one page of UserSerializer output with DRF's JSON "
+        "renderer and the project's renderers. Users are repeated when the "
+        "database has fewer than the page size."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--rounds", type=int, default=50)
+        parser.add_argument("--json", action="store_true", help="Print JSON results.")
+
+    def handle(self, *args, **options):
+        users = list(
+            User.objects.filter(is_deleted=False, is_superuser=False)
+            .prefetch_related("groups", "user_permissions")
+            .order_by("id")[: options["users"]]
+        )
+        if not users:
+            raise CommandError("No users to render.")
+
+        with override_settings(ALLOWED_HOSTS=["testserver"]), translation.override("en"):
+            request = Request(RequestFactory().get("/api/users/user_list/"))
+            rows = UserSerializer(users, many=True, context={"request": request}).data
+        # the shape StandardResultsSetPagination returns
+        page = {
+            "count": options["users"],
+            "next": None,
+            "previous": None,
+            "results": list(islice(cycle(rows), options["users"])),
+        }
+
+        results = []
+        for name, renderer_class in RENDERERS.items():
+            renderer = renderer_class()
+            content = renderer.render(page, renderer.media_type)
+            timings = []
+            for _ in range(options["rounds"]):
+                started_at = time.perf_counter()
+                renderer.render(page, renderer.media_type)
+                timings.append(time.perf_counter() - started_at)
+            results.append(
+                {
+                    "renderer": name,
+                    "users": options["users"],
+                    "bytes": len(content),
+                    "p50_ms": statistics.median(timings) * 1000,
+                    "p99_ms": percentile(timings, 99) * 1000,
+                }
+            )
+
+        if options["json"]:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        self.stdout.write(f"{'renderer':<12}{'bytes':>10}{'p50 ms':>10}{'p99 ms':>10}")
+        for result in results:
+            self.stdout.write(
+                f"{result['renderer']:<12}{result['bytes']:>10}"
+                f"{result['p50_ms']:>10.2f}{result['p99_ms']:>10.2f}"
+            )
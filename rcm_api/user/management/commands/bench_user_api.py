@@ -0,0 +1,244 @@
+import io
+import json
+import platform
+import statistics
+import tempfile
+import time
+from datetime import datetime, timezone
+from urllib.parse import urlencode
+
+import django
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import translation
+
+from PIL import Image
+from rest_framework.test import APIClient
+
+from user.models import User
+from user.seeding import DEFAULT_PASSWORD, FAMILY_NAMES, MALE_NAMES, SEED_DOMAIN
+from user.tokens import VersionedRefreshToken
+from user.management.commands.bench_async_views import percentile
+
+
+# bumped when a field of the results changes meaning
+RESULTS_FORMAT = 1
+
+ORDERINGS = ["name", "name_desc", "name_ar", "name_ar_desc"]
+SEARCHES = [english for english, _ in MALE_NAMES + FAMILY_NAMES]
+
+
+def png():
+    buffer = io.BytesIO()
+    Image.new("RGB", (600, 600), (90, 140, 200)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+# name: (url name, method, request of the i-th iteration). Iterations walk
+# pages, search terms and users so the response cache doesn't answer them all.
+BENCHMARKS = {
+    "list": (
+        "user:user-list",
+        "get",
+        lambda bench, i: {"query": {"page": i % bench.pages + 1, **bench.page}},
+    ),
+    "search": (
+        "user:user-list",
+        "get",
+        lambda bench, i: {
+            "query": {"search": SEARCHES[i % len(SEARCHES)], **bench.page}
+        },
+    ),
+    "ordering": (
+        "user:user-list",
+        "get",
+        lambda bench, i: {
+            "query": {
+                "ordering": ORDERINGS[i % len(ORDERINGS)],
+                "page": i % bench.pages + 1,
+                **bench.page,
+            }
+        },
+    ),
+    "retrieve": (
+        "user:user-retrieve",
+        "get",
+        lambda bench, i: {
+            "query": {"user_id": bench.user_ids[i % len(bench.user_ids)]}
+        },
+    ),
+    "login": (
+        "user:login",
+        "post",
+        lambda bench, i: {
+            "data": {"identifier": bench.user.email, "password": bench.password},
+            "anonymous": True,
+        },
+    ),
+    "upload": (
+        "user:upload-photo",
+        "put",
+        lambda bench, i: {
+            "data": {"photo": SimpleUploadedFile("photo.png", bench.photo)},
+            "format": "multipart",
+        },
+    ),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the key user endpoints in process, one request after another, and "
+        "report p50/p95/p99 latency per endpoint. Meant for a database filled "
+        "by seed_users; --output writes the results as JSON to track them over "
+        "time."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--email",
+            help="User to run as, a seeded manager by default. Needs a "
+            "SUPERUSER, OWNER or MANAGER role.",
+        )
+        parser.add_argument(
+            "--password",
+            default=DEFAULT_PASSWORD,
+            help="Password of that user, for the login benchmark.",
+        )
+        parser.add_argument("--requests", type=int, default=50)
+        parser.add_argument("--warmup", type=int, default=5)
+        parser.add_argument(
+            "--page-size", type=int, default=100, help="Users per list page."
+        )
+        parser.add_argument(
+            "--benchmarks",
+            nargs="+",
+            choices=list(BENCHMARKS),
+            default=list(BENCHMARKS),
+        )
+        parser.add_argument("--output", help="Write the JSON results to this file.")
+        parser.add_argument("--json", action="store_true", help="Print JSON results.")
+
+    def handle(self, *args, **options):
+        users = User.objects.filter(is_active=True, is_deleted=False)
+        if options["email"]:
+            self.user = users.filter(email=options["email"]).first()
+        else:
+            self.user = (
+                users.filter(
+                    role=User.Role.MANAGER, email__endswith=f"@{SEED_DOMAIN}"
+                )
+                .order_by("email")
+                .first()
+            )
+        allowed_roles = ["SUPERUSER", "OWNER", "MANAGER"]
+        if self.user is None or self.user.role not in allowed_roles:
+            raise CommandError(
+                "No SUPERUSER, OWNER or MANAGER user to run as, run seed_users "
+                "or pass --email."
+            )
+        self.password = options["password"]
+        self.page_size = options["page_size"]
+        self.page = {"page_size": self.page_size}
+        total_users = User.objects.filter(is_deleted=False, is_superuser=False).count()
+        self.pages = max(1, total_users // self.page_size)
+        self.user_ids = list(
+            users.order_by("email").values_list("id", flat=True)[: options["requests"]]
+        )
+        self.photo = png()
+        token = str(VersionedRefreshToken.for_user(self.user).access_token)
+
+        rest_framework = dict(settings.REST_FRAMEWORK)
+        # the throttles would turn a login benchmark into a 429 benchmark
+        rest_framework["DEFAULT_THROTTLE_RATES"] = {
+            scope: "1000000/s"
+            for scope in settings.REST_FRAMEWORK.get("DEFAULT_THROTTLE_RATES", {})
+        }
+        results = {}
+        with tempfile.TemporaryDirectory() as media_root, override_settings(
+            ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"],
+            REST_FRAMEWORK=rest_framework,
+            # uploaded photos go away with the benchmark
+            MEDIA_ROOT=media_root,
+        ), translation.override("en"):
+            for name in options["benchmarks"]:
+                results[name] = self.run(name, token, options)
+
+        report = {
+            "format": RESULTS_FORMAT,
+            "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "environment": {
+                "python": platform.python_version(),
+                "django": django.get_version(),
+                "database": connection.vendor,
+                "users": total_users,
+            },
+            "options": {
+                "requests": options["requests"],
+                "warmup": options["warmup"],
+                "page_size": self.page_size,
+            },
+            "results": results,
+        }
+        if options["output"]:
+            with open(options["output"], "w") as file:
+                json.dump(report, file, indent=2)
+                file.write("\n")
+        if options["json"]:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+        self.stdout.write(
+            f"{'benchmark':<12}{'req/s':>10}{'mean ms':>10}{'p50 ms':>10}"
+            f"{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}"
+        )
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name:<12}{result['requests_per_second']:>10.1f}"
+                f"{result['mean_ms']:>10.2f}{result['p50_ms']:>10.2f}"
+                f"{result['p95_ms']:>10.2f}{result['p99_ms']:>10.2f}"
+                f"{result['errors']:>8}"
+            )
+
+    def run(self, name, token, options):
+        url_name, method, build = BENCHMARKS[name]
+        path = reverse(url_name)
+        client = APIClient()
+        latencies = []
+        errors = 0
+        for i in range(options["warmup"] + options["requests"]):
+            request = build(self, i)
+            client.credentials()
+            if not request.get("anonymous"):
+                client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+            url = path
+            if request.get("query"):
+                url += "?" + urlencode(request["query"])
+            # each write is rolled back, an upload would otherwise leave the
+            # user with a photo in the temporary media root
+            with transaction.atomic():
+                started_at = time.perf_counter()
+                response = getattr(client, method)(
+                    url, request.get("data"), format=request.get("format", "json")
+                )
+                elapsed = time.perf_counter() - started_at
+                transaction.set_rollback(method != "get")
+            if i < options["warmup"]:
+                continue
+            latencies.append(elapsed)
+            if response.status_code >= 400:
+                errors += 1
+
+        return {
+            "requests": len(latencies),
+            "errors": errors,
+            "requests_per_second": round(len(latencies) / sum(latencies), 2),
+            "mean_ms": round(statistics.mean(latencies) * 1000, 3),
+            "p50_ms": round(statistics.median(latencies) * 1000, 3),
+            "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+            "max_ms": round(max(latencies) * 1000, 3),
+        }
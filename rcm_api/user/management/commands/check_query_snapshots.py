@@ -0,0 +1,454 @@
+import difflib
+import io
+import json
+import os
+import shutil
+import tempfile
+import uuid
+from urllib.parse import urlencode
+from contextlib import ExitStack
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import (
+    setup_databases,
+    setup_test_environment,
+    teardown_databases,
+    teardown_test_environment,
+)
+from django.urls import reverse
+from django.utils import translation
+
+from PIL import Image
+from rest_framework.test import APIClient
+
+from rcm_api.slow_queries import normalize
+from user.activity import activity_tracker
+from user.effective_permissions import effective_permissions
+from user.hashing import hash_password
+from user.identity import identity_resolver
+from user.models import User
+from user.response_cache import response_cache
+from user.revocation import token_revocations
+from user.seeding import analyze, generate_users, insert_users
+from user.snapshots import user_snapshots
+from user.tokens import VersionedRefreshToken
+from user.urls import urlpatterns
+
+
+PASSWORD = "Snapshot-Passw0rd"
+SEED = 49
+
+# statements the run itself causes: each case is a savepoint rolled back at
+# the end, and the slow query log may explain what it catches
+IGNORED_PREFIXES = (
+    "SAVEPOINT",
+    "RELEASE SAVEPOINT",
+    "ROLLBACK TO SAVEPOINT",
+    "EXPLAIN",
+)
+EXPLAINED_PREFIXES = ("SELECT", "UPDATE", "DELETE")
+
+
+def png(name):
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 64), (200, 120, 40)).save(buffer, format="PNG")
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type="image/png")
+
+
+def new_user_payload():
+    return {
+        "email": "new.hire@example.com",
+        "password": PASSWORD,
+        "name": "New Hire",
+        "name_ar": "موظف جديد",
+        "identification": "299999999999999",
+        "role": User.Role.WAITER,
+        "position": "Waiter",
+        "gender": "female",
+        "mobile_number": "01099999999",
+    }
+
+
+# name: (url name in user.urls, method, request). Requests are built from the
+# seeded users, every route of user.urls needs at least one case.
+CASES = {
+    "login": (
+        "login",
+        "post",
+        lambda seeded: {
+            "data": {"identifier": seeded["admin"].email, "password": PASSWORD},
+            "anonymous": True,
+        },
+    ),
+    "logout": ("logout", "post", lambda seeded: {}),
+    "create-user": (
+        "create-user",
+        "post",
+        lambda seeded: {"data": new_user_payload()},
+    ),
+    "upload-photo": (
+        "upload-photo",
+        "put",
+        lambda seeded: {"data": {"photo": png("photo.png")}, "format": "multipart"},
+    ),
+    "upload-cover": (
+        "upload-cover",
+        "put",
+        lambda seeded: {"data": {"cover": png("cover.png")}, "format": "multipart"},
+    ),
+    "me": ("me", "get", lambda seeded: {}),
+    "me-update": ("me", "patch", lambda seeded: {"data": {"position": "Owner"}}),
+    "user-list": ("user-list", "get", lambda seeded: {}),
+    "user-list-search": (
+        "user-list",
+        "get",
+        lambda seeded: {"query": {"search": "ahmed", "ordering": "name_ar"}},
+    ),
+    "user-deleted-list": ("user-deleted-list", "get", lambda seeded: {}),
+    "user-retrieve": (
+        "user-retrieve",
+        "get",
+        lambda seeded: {"query": {"user_id": seeded["user"].pk}},
+    ),
+    "user-update-by-admin": (
+        "user-update-by-admin",
+        "patch",
+        lambda seeded: {
+            "query": {"user_id": seeded["user"].pk},
+            "data": {"position": "Head waiter"},
+        },
+    ),
+    "user-temp-delete": (
+        "user-temp-delete",
+        "patch",
+        lambda seeded: {
+            "query": {"user_id": seeded["user"].pk},
+            "data": {"is_deleted": True},
+        },
+    ),
+    "user-restore": (
+        "user-restore",
+        "patch",
+        lambda seeded: {
+            "query": {"user_id": seeded["deleted"].pk},
+            "data": {"is_deleted": False},
+        },
+    ),
+    "user-delete": (
+        "user-delete",
+        "delete",
+        lambda seeded: {"data": {"user_id": [str(seeded["user"].pk)]}},
+    ),
+    "user-changes": ("user-changes", "get", lambda seeded: {"query": {"limit": 50}}),
+    "user-roster": ("user-roster", "get", lambda seeded: {}),
+    "user-dialog": ("user-dialog", "get", lambda seeded: {}),
+    "user-gender-dialog": ("user-gender-dialog", "get", lambda seeded: {}),
+    "user-role-dialog": ("user-role-dialog", "get", lambda seeded: {}),
+    "user-enumerations": ("user-enumerations", "get", lambda seeded: {}),
+    "async-login": (
+        "async-login",
+        "post",
+        lambda seeded: {
+            "data": {"identifier": seeded["admin"].email, "password": PASSWORD},
+            "anonymous": True,
+        },
+    ),
+    "async-me": ("async-me", "get", lambda seeded: {}),
+    "async-user-list": ("async-user-list", "get", lambda seeded: {}),
+    "async-user-retrieve": (
+        "async-user-retrieve",
+        "get",
+        lambda seeded: {"query": {"user_id": seeded["user"].pk}},
+    ),
+}
+
+
+def uncovered_routes():
+    """Names of the routes of user.urls without a case in ``CASES``."""
+    route_names = {pattern.name for pattern in urlpatterns}
+    return route_names - {url_name for url_name, _, _ in CASES.values()}
+
+
+def seed_users(count):
+    """
+    ``count`` staff users from ``user.seeding``, the same on every run, and
+    the superuser the cases run as.
+    """
+    password = hash_password(PASSWORD)
+    admin = User(
+        id=uuid.UUID(int=SEED, version=4),
+        email="owner@example.com",
+        name="Owner",
+        name_ar="المالك",
+        identification="100000000000000",
+        role=User.Role.SUPERUSER,
+        position="Owner",
+        gender="male",
+        mobile_number="01000000000",
+        password=password,
+        is_superuser=True,
+    )
+    User.objects.bulk_create([admin])
+    insert_users(generate_users(count, seed=SEED, password=password))
+    # planner statistics, so plans are the ones a real table gets
+    analyze()
+    staff = User.objects.filter(is_superuser=False).order_by("email")
+    return {
+        "admin": admin,
+        "user": staff.filter(is_deleted=False).first(),
+        "deleted": staff.filter(is_deleted=True).first(),
+    }
+
+
+def reset_caches():
+    """
+    Empties the shared cache and every per-process cache in front of the
+    database, so each case makes the queries of a cold request.
+    """
+    cache.clear()
+    response_cache.local.clear()
+    effective_permissions.local.clear()
+    identity_resolver.local_misses.clear()
+    user_snapshots.local.clear()
+    token_revocations.bloom = None
+    token_revocations.next_refresh = 0
+
+
+class QueryRecorder:
+    """An ``execute_wrapper`` keeping every statement with its parameters."""
+
+    def __init__(self, alias):
+        self.alias = alias
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        if not sql.lstrip().upper().startswith(IGNORED_PREFIXES):
+            self.queries.append((self.alias, sql, params, many))
+        return execute(sql, params, many, context)
+
+
+def plan_shape(alias, sql, params):
+    """The plan's nodes, indented, without costs or row estimates."""
+    connection = connections[alias]
+    if connection.vendor == "postgresql":
+        prefix = connection.ops.explain_query_prefix(format="json")
+    elif connection.vendor == "sqlite":
+        prefix = connection.ops.explain_query_prefix()
+    else:
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(f"{prefix} {sql}", params)
+        rows = cursor.fetchall()
+
+    if connection.vendor == "sqlite":
+        # (id, parent, notused, detail)
+        depths = {0: -1}
+        shape = []
+        for node, parent, _, detail in rows:
+            depths[node] = depths.get(parent, -1) + 1
+            shape.append("  " * depths[node] + detail)
+        return shape
+
+    plan = rows[0][0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    shape = []
+
+    def walk(node, depth):
+        line = node["Node Type"]
+        if "Index Name" in node:
+            line += f" using {node['Index Name']}"
+        if "Relation Name" in node:
+            line += f" on {node['Relation Name']}"
+        shape.append("  " * depth + line)
+        for child in node.get("Plans", ()):
+            walk(child, depth + 1)
+
+    walk(plan[0]["Plan"], 0)
+    return shape
+
+
+def run_case(client, token, case, seeded):
+    url_name, method, build = CASES[case]
+    request = build(seeded)
+    client.credentials()
+    if not request.get("anonymous"):
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+    path = reverse(f"user:{url_name}")
+    if request.get("query"):
+        path += "?" + urlencode(request["query"])
+
+    reset_caches()
+    recorders = [QueryRecorder(connection.alias) for connection in connections.all()]
+    with ExitStack() as stack:
+        for recorder in recorders:
+            stack.enter_context(
+                connections[recorder.alias].execute_wrapper(recorder)
+            )
+        for recorder in recorders:
+            # the case runs in a transaction that never commits, the on_commit
+            # callbacks run right after the request so their queries count
+            stack.enter_context(
+                TestCase.captureOnCommitCallbacks(using=recorder.alias, execute=True)
+            )
+        response = getattr(client, method)(
+            path, request.get("data"), format=request.get("format", "json")
+        )
+    queries = [query for recorder in recorders for query in recorder.queries]
+
+    statements = {}
+    plans = {}
+    for alias, sql, params, many in queries:
+        statement = normalize(sql)
+        statements[statement] = statements.get(statement, 0) + 1
+        explain = not many and statement.upper().startswith(EXPLAINED_PREFIXES)
+        if explain and statement not in plans:
+            plans[statement] = plan_shape(alias, sql, params)
+    return {
+        "status": response.status_code,
+        "queries": len(queries),
+        "statements": statements,
+        "plans": {statement: plan for statement, plan in plans.items() if plan},
+    }
+
+
+def snapshot_path(vendor):
+    return os.path.join(
+        apps.get_app_config("user").path, "query_snapshots", f"{vendor}.json"
+    )
+
+
+def run_cases(cases, users, verbosity=1, stdout=None):
+    """
+    Results of ``cases`` against ``users`` seeded users in the test database,
+    rolled back once done.
+    """
+    default_photos = os.path.join(settings.MEDIA_ROOT, "default_photos")
+    results = {}
+    # uploads land in a throwaway media root, next to the default photos new
+    # users get
+    with tempfile.TemporaryDirectory() as media_root, override_settings(
+        MEDIA_ROOT=media_root
+    ), translation.override("en"), transaction.atomic():
+        shutil.copytree(default_photos, os.path.join(media_root, "default_photos"))
+        seeded = seed_users(users)
+        token = str(VersionedRefreshToken.for_user(seeded["admin"]).access_token)
+        client = APIClient(raise_request_exception=False)
+        for case in cases:
+            # every case starts from the seeded rows
+            sid = transaction.savepoint()
+            try:
+                results[case] = run_case(client, token, case, seeded)
+                activity_tracker.flush()
+            finally:
+                transaction.savepoint_rollback(sid)
+            if verbosity > 1 and stdout is not None:
+                stdout.write(f"{case}: {results[case]['queries']} queries")
+        transaction.set_rollback(True)
+    return results
+
+
+class Command(BaseCommand):
+    help = (
+        "Request every route of user.urls against a seeded test database and "
+        "compare the query count, the statements and their plans with the "
+        "snapshot in user/query_snapshots/<vendor>.json. Exits with an error "
+        "and a diff when they differ, --update rewrites the snapshot. The "
+        "test suite runs the same check, see user.tests.test_query_snapshots."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--update", action="store_true", help="Write the results as the snapshot."
+        )
+        parser.add_argument(
+            "--case",
+            action="append",
+            choices=list(CASES),
+            help="Only run this case, may be repeated.",
+        )
+        parser.add_argument(
+            "--users", type=int, default=300, help="Staff users to seed."
+        )
+        parser.add_argument(
+            "--keepdb", action="store_true", help="Reuse the test database."
+        )
+
+    def handle(self, *args, **options):
+        missing = uncovered_routes()
+        if missing:
+            raise CommandError(
+                f"No case for the routes {', '.join(sorted(missing))}, add them "
+                "to CASES."
+            )
+
+        setup_test_environment()
+        old_config = setup_databases(
+            verbosity=0,
+            interactive=False,
+            keepdb=options["keepdb"],
+            aliases={"default"},
+        )
+        try:
+            vendor = connections["default"].vendor
+            results = run_cases(
+                options["case"] or list(CASES),
+                options["users"],
+                options["verbosity"],
+                self.stdout,
+            )
+        finally:
+            teardown_databases(old_config, verbosity=0, keepdb=options["keepdb"])
+            teardown_test_environment()
+
+        path = snapshot_path(vendor)
+        try:
+            with open(path) as file:
+                snapshot = json.load(file)
+        except FileNotFoundError:
+            snapshot = {"users": options["users"], "cases": {}}
+
+        if options["update"]:
+            snapshot["users"] = options["users"]
+            snapshot["cases"].update(results)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w") as file:
+                json.dump(snapshot, file, indent=2, ensure_ascii=False)
+                file.write("\n")
+            self.stdout.write(f"Wrote {len(results)} cases to {path}.")
+            return
+
+        if snapshot["users"] != options["users"]:
+            raise CommandError(
+                f"The snapshot was taken with --users {snapshot['users']}."
+            )
+        changed = 0
+        for case, result in results.items():
+            expected = snapshot["cases"].get(case)
+            if result == expected:
+                self.stdout.write(f"{case}: {result['queries']} queries, ok")
+                continue
+            changed += 1
+            before = result["queries"] if expected is None else expected["queries"]
+            self.stdout.write(
+                f"{case}: {before} -> {result['queries']} queries, changed"
+            )
+            diff = difflib.unified_diff(
+                json.dumps(expected, indent=2, ensure_ascii=False).splitlines(),
+                json.dumps(result, indent=2, ensure_ascii=False).splitlines(),
+                "snapshot",
+                "now",
+                lineterm="",
+            )
+            self.stdout.write("\n".join(diff))
+        if changed:
+            raise CommandError(
+                f"{changed} case(s) differ from {path}. If the change is "
+                "intended, run again with --update and commit the snapshot."
+            )
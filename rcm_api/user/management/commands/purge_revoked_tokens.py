@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from user.revocation import token_revocations
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete revoked tokens past their expiry. They fail validation on their "
+        "own by then, keeping them only grows the revocation filters."
+    )
+
+    def handle(self, *args, **options):
+        deleted, _ = token_revocations.purge_expired()
+        self.stdout.write(f"Deleted {deleted} expired revoked tokens.")
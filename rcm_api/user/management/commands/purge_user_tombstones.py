@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from user.sync import change_feed
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete change feed tombstones older than USER_SYNC TOMBSTONE_RETENTION. "
+        "Clients holding an older sync token are asked for a full sync."
+    )
+
+    def handle(self, *args, **options):
+        deleted, _ = change_feed.purge_tombstones()
+        self.stdout.write(f"Deleted {deleted} tombstones.")
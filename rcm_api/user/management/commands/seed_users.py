@@ -0,0 +1,86 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from user.hashing import hash_password
+from user.response_cache import response_cache
+from user.seeding import (
+    DEFAULT_PASSWORD,
+    SEED_DOMAIN,
+    analyze,
+    generate_photos,
+    generate_users,
+    insert_users,
+    seeded_count,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        f"Add synthetic staff users with Arabic and English names, roles, groups "
+        f"and photos, through COPY on PostgreSQL. Their emails are in "
+        f"@{SEED_DOMAIN}, a second run adds more after the existing ones."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--count", type=int, default=1000)
+        parser.add_argument(
+            "--seed", type=int, default=0, help="Same seed, same users."
+        )
+        parser.add_argument(
+            "--password",
+            default=DEFAULT_PASSWORD,
+            help=f"Password of every seeded user, {DEFAULT_PASSWORD} by default.",
+        )
+        parser.add_argument(
+            "--photos",
+            type=int,
+            default=20,
+            help="Distinct photos the users share, 0 for the default photo.",
+        )
+        parser.add_argument("--batch-size", type=int, default=50000)
+        parser.add_argument(
+            "--allow-production",
+            action="store_true",
+            help="Seed even though DEBUG is off.",
+        )
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG and not options["allow_production"]:
+            # the seeded users can log in with a published password
+            raise CommandError(
+                "Refusing to seed users with DEBUG off, pass --allow-production "
+                "to seed anyway."
+            )
+        if options["count"] < 1:
+            raise CommandError("--count must be at least 1.")
+        start = seeded_count()
+        if start + options["count"] > 10**8:
+            # the index fills 8 digits of the mobile number
+            raise CommandError("At most 100000000 seeded users.")
+
+        started_at = time.perf_counter()
+        photos = generate_photos(options["photos"])
+        rows = generate_users(
+            options["count"],
+            start=start,
+            seed=options["seed"],
+            # hashed once, every user shares it
+            password=hash_password(options["password"]),
+            photos=photos,
+        )
+
+        def progress(inserted):
+            rate = inserted / (time.perf_counter() - started_at)
+            self.stdout.write(f"{inserted} users ({rate:.0f}/s)")
+
+        inserted = insert_users(rows, options["batch_size"], progress)
+        analyze()
+        # the rows skipped the receivers that invalidate cached lists
+        response_cache.bump()
+        elapsed = time.perf_counter() - started_at
+        self.stdout.write(
+            f"Seeded {inserted} users in {elapsed:.1f}s, "
+            f"{start + inserted} seeded users in total."
+        )
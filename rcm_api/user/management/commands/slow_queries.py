@@ -0,0 +1,108 @@
+import json
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from rcm_api.slow_queries import slow_query_log
+
+
+SORT_KEYS = {
+    "total": lambda group: group["total_ms"],
+    "count": lambda group: group["count"],
+    "max": lambda group: group["max_ms"],
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Show the slow query log grouped by query fingerprint, slowest in total "
+        "first. Pass --fingerprint to see one query's views, parameters and plan."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--hours", type=float, help="Only queries logged in the last N hours."
+        )
+        parser.add_argument("--sort", choices=list(SORT_KEYS), default="total")
+        parser.add_argument("--limit", type=int, default=20)
+        parser.add_argument("--fingerprint", help="Show the details of one query.")
+        parser.add_argument("--clear", action="store_true", help="Empty the log.")
+        parser.add_argument("--json", action="store_true", help="Print JSON results.")
+
+    def handle(self, *args, **options):
+        if options["clear"]:
+            slow_query_log.clear()
+            self.stdout.write("Slow query log cleared.")
+            return
+
+        since = time.time() - options["hours"] * 3600 if options["hours"] else None
+        groups = {}
+        for entry in slow_query_log.read(since):
+            group = groups.setdefault(
+                entry["fingerprint"],
+                {
+                    "fingerprint": entry["fingerprint"],
+                    "query": entry["normalized"],
+                    "durations": [],
+                    "views": {},
+                    "database": entry["database"],
+                    "plan": None,
+                },
+            )
+            # the slowest run is the most useful example
+            if entry["duration_ms"] >= max(group["durations"], default=0):
+                group["sql"] = entry["sql"]
+                group["params"] = entry["params"]
+            group["durations"].append(entry["duration_ms"])
+            group["views"][entry["view"]] = group["views"].get(entry["view"], 0) + 1
+            if entry["plan"]:
+                # plans are captured now and then, keep the latest
+                group["plan"] = entry["plan"]
+
+        for group in groups.values():
+            durations = group.pop("durations")
+            group["count"] = len(durations)
+            group["total_ms"] = round(sum(durations), 3)
+            group["median_ms"] = round(statistics.median(durations), 3)
+            group["max_ms"] = max(durations)
+
+        if options["fingerprint"]:
+            group = groups.get(options["fingerprint"])
+            if group is None:
+                raise CommandError("No logged query has that fingerprint.")
+            if options["json"]:
+                self.stdout.write(json.dumps(group, indent=2))
+                return
+            self.write_details(group)
+            return
+
+        ordered = sorted(
+            groups.values(), key=SORT_KEYS[options["sort"]], reverse=True
+        )[: options["limit"]]
+        if options["json"]:
+            self.stdout.write(json.dumps(ordered, indent=2))
+            return
+        self.stdout.write(
+            f"{'fingerprint':<18}{'count':>7}{'total ms':>11}{'median ms':>11}"
+            f"{'max ms':>10}  query"
+        )
+        for group in ordered:
+            self.stdout.write(
+                f"{group['fingerprint']:<18}{group['count']:>7}"
+                f"{group['total_ms']:>11.1f}{group['median_ms']:>11.1f}"
+                f"{group['max_ms']:>10.1f}  {group['query'][:80]}"
+            )
+
+    def write_details(self, group):
+        self.stdout.write(f"Fingerprint: {group['fingerprint']} ({group['database']})")
+        self.stdout.write(
+            f"Runs: {group['count']}, total {group['total_ms']:.1f} ms, "
+            f"median {group['median_ms']:.1f} ms, max {group['max_ms']:.1f} ms"
+        )
+        self.stdout.write("Views:")
+        for view, count in sorted(group["views"].items(), key=lambda item: -item[1]):
+            self.stdout.write(f"  {view}: {count}")
+        self.stdout.write(f"Slowest run:\n  {group['sql']}")
+        self.stdout.write(f"  params: {group['params']}")
+        self.stdout.write(f"Plan:\n{group['plan'] or '  (not captured)'}")
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-19 17:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0005_user_last_seen'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='user',
+            name='role',
+            field=models.CharField(choices=[('SUPERUSER', 'SuperUser'), ('OWNER', 'Owner'), ('MANAGER', 'Manager'), ('WAITER', 'Waiter'), ('CASHIER', 'Cashier'), ('CHEF', 'Chef'), ('DELIVERY', 'Delivery')], max_length=50),
+        ),
+    ]
@@ -1,8 +1,9 @@
-from django.db import models, IntegrityError
+from django.db import models, IntegrityError, transaction
 from django.db.models import Q, UniqueConstraint
+from django.db.models.functions import Lower
 from django.conf import settings
 from django.core.files.base import ContentFile
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete, pre_delete, m2m_changed
 from django.dispatch import receiver
 from django.contrib.auth.models import Group
 
@@ -11,6 +12,16 @@ import os
 from PIL import Image
 from io import BytesIO
 
+from user.snapshots import user_snapshots
+from user.effective_permissions import effective_permissions
+from user.identity import identity_resolver
+from user.hashing import set_password
+from user.response_cache import response_cache
+
+from rcm_api.push import push_hub
+from rcm_api.profiling import profile_phase
+from rcm_api.metrics import metrics
+
 
 from django.contrib.auth.models import (
     AbstractBaseUser,
@@ -18,6 +29,7 @@ from django.contrib.auth.models import (
     PermissionsMixin,
 )
 from django.core.validators import RegexValidator
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 
@@ -48,7 +60,7 @@ class UserManager(BaseUserManager):
             **extra_fields,
         )
 
-        user.set_password(password)
+        set_password(user, password)
         user.save(using=self._db)
         return user
 
@@ -81,7 +93,7 @@ class User(AbstractBaseUser, PermissionsMixin):
         SUPERUSER = "SUPERUSER", _("SuperUser")
         OWNER = "OWNER", _("Owner")
         MANAGER = "MANAGER", _("Manager")
-        WAITER = "WAITER", _("waiter")
+        WAITER = "WAITER", _("Waiter")
         CASHIER = "CASHIER", _("Cashier")
         CHEF = "CHEF", _("Chef")
         DELIVERY = "DELIVERY", _("Delivery")
@@ -151,6 +163,10 @@ class User(AbstractBaseUser, PermissionsMixin):
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=True)
     is_deleted = models.BooleanField(default=False)
+    # written in batches by user.activity, like last_login
+    last_seen = models.DateTimeField(blank=True, null=True)
+    # bumped on every save, used to detect stale cached snapshots
+    auth_version = models.PositiveIntegerField(default=0, editable=False)
 
     objects = UserManager()
 
@@ -158,6 +174,10 @@ class User(AbstractBaseUser, PermissionsMixin):
 
 
     def save(self, *args, **kwargs):
+        self.auth_version = (self.auth_version or 0) + 1
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            kwargs["update_fields"] = {*update_fields, "auth_version"}
         super().save(*args, **kwargs)
         # Check if the photo exists and its size exceeds the maximum allowed size
         if self.photo:
@@ -174,12 +194,44 @@ class User(AbstractBaseUser, PermissionsMixin):
 
 
 
+    # Permission checks read the cached effective permissions instead of
+    # joining groups and permissions on every call. Object permissions still
+    # go through the auth backends.
+    def has_perm(self, perm, obj=None):
+        if obj is not None:
+            return super().has_perm(perm, obj)
+        if not self.is_active:
+            return False
+        if self.is_superuser:
+            return True
+        return perm in effective_permissions.get(self.pk)["permissions"]
+
+    def has_module_perms(self, app_label):
+        if not self.is_active:
+            return False
+        if self.is_superuser:
+            return True
+        prefix = f"{app_label}."
+        return any(
+            perm.startswith(prefix)
+            for perm in effective_permissions.get(self.pk)["permissions"]
+        )
+
+    def get_all_permissions(self, obj=None):
+        if obj is not None:
+            return super().get_all_permissions(obj)
+        if not self.is_active:
+            return set()
+        return set(effective_permissions.get(self.pk)["permissions"])
+
     def resize_photo(self):
         # Set the maximum size in bytes (1 MB = 1024 * 1024 bytes)
         max_size_bytes = 1024 * 1024
 
         # Open the image using Pillow
-        with Image.open(self.photo.path) as img:
+        with profile_phase("image"), metrics.timer(
+            "image_processing_seconds", operation="resize_photo"
+        ), Image.open(self.photo.path) as img:
             # Check the size of the image in bytes
             img_byte_array = BytesIO()
             img.save(img_byte_array, format=img.format)
@@ -212,7 +264,9 @@ class User(AbstractBaseUser, PermissionsMixin):
             # Check if the avatar field is not already set
             # if not self.avatar:
             # Open the image using Pillow
-        with Image.open(photo_path) as img:
+        with profile_phase("image"), metrics.timer(
+            "image_processing_seconds", operation="avatar"
+        ), Image.open(photo_path) as img:
             # Resize the image (adjust the size as needed)
             resized_img = img.resize((300, 300))
 
@@ -222,19 +276,182 @@ class User(AbstractBaseUser, PermissionsMixin):
             self.avatar.save("avatar.png", ContentFile(buffer.getvalue()), save=True)
 
     class Meta:
+        indexes = [
+            # login by email is case-insensitive, see user.identity
+            models.Index(Lower("email"), name="user_email_lower_idx"),
+            # keyset order of the change feed, see user.sync
+            models.Index(fields=["updated_at", "id"], name="user_updated_at_id_idx"),
+        ]
+
         def __str__(self):
             return self.email
 
+class RevokedToken(models.Model):
+    # see user.revocation
+    jti = models.CharField(max_length=255, unique=True)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        blank=True,
+        null=True,
+        related_name="revoked_tokens",
+    )
+    revoked_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return self.jti
+
+
+class UserTombstone(models.Model):
+    # hard deleted users, kept for the change feed (see user.sync)
+    user_id = models.UUIDField()
+    deleted_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self):
+        return str(self.user_id)
+
+
+@receiver(post_save, sender=User)
+def refresh_user_snapshot(sender, instance, using, **kwargs):
+    user_snapshots.update(instance, using)
+    identity_resolver.forget(instance, using)
+
+
+@receiver(post_delete, sender=User)
+def drop_user_snapshot(sender, instance, using, **kwargs):
+    user_snapshots.invalidate(instance.pk, using)
+
+
+@receiver(post_delete, sender=User)
+def record_user_tombstone(sender, instance, using, **kwargs):
+    UserTombstone.objects.using(using).create(user_id=instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def drop_user_effective_permissions(sender, instance, using, **kwargs):
+    effective_permissions.invalidate(instance.pk, using)
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+def user_groups_or_permissions_changed(
+    sender, instance, action, reverse, pk_set, using, **kwargs
+):
+    if not reverse:
+        # user.groups / user.user_permissions changed
+        if action in ("post_add", "post_remove", "post_clear"):
+            effective_permissions.invalidate(instance.pk, using)
+    elif action in ("post_add", "post_remove"):
+        # group.user_set / permission.user_set changed, pk_set holds user ids
+        effective_permissions.invalidate_users(pk_set, using)
+    elif action == "pre_clear":
+        effective_permissions.invalidate_users(
+            instance.user_set.values_list("pk", flat=True), using
+        )
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+def group_permissions_changed(
+    sender, instance, action, reverse, pk_set, using, **kwargs
+):
+    if not reverse:
+        # group.permissions changed
+        if action in ("post_add", "post_remove", "post_clear"):
+            effective_permissions.invalidate_groups([instance.pk], using)
+    elif action in ("post_add", "post_remove"):
+        # permission.group_set changed, pk_set holds group ids
+        effective_permissions.invalidate_groups(pk_set, using)
+    elif action == "pre_clear":
+        effective_permissions.invalidate_groups(
+            instance.group_set.values_list("pk", flat=True), using
+        )
+
+
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def drop_group_members_permissions(sender, instance, using, created=False, **kwargs):
+    # a renamed group changes its members' cached group names
+    if not created:
+        effective_permissions.invalidate_groups([instance.pk], using)
+
+
+def bump_response_generations(user_ids, using):
+    # after commit, so a request can't cache the old rows under the new generation
+    user_ids = list(user_ids)
+    transaction.on_commit(lambda: response_cache.bump(user_ids), using=using)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, using, **kwargs):
+    bump_response_generations([instance.pk], using)
+
+
+def serialized_relations_changed(user_ids, using):
+    # serialized users carry their group names and permission codenames, move
+    # updated_at so their ETags change too
+    user_ids = list(user_ids)
+    User.objects.using(using).filter(pk__in=user_ids).update(updated_at=timezone.now())
+    bump_response_generations(user_ids, using)
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+def user_relations_changed(sender, instance, action, reverse, pk_set, using, **kwargs):
+    if getattr(instance, "_adding_default_group", False):
+        # part of the user's creation, its row and generation are already new
+        return
+    if not reverse:
+        if action in ("post_add", "post_remove", "post_clear"):
+            serialized_relations_changed([instance.pk], using)
+    elif action in ("post_add", "post_remove"):
+        serialized_relations_changed(pk_set, using)
+    elif action == "pre_clear":
+        serialized_relations_changed(
+            instance.user_set.values_list("pk", flat=True), using
+        )
+
+
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def group_changed(sender, instance, using, created=False, **kwargs):
+    if not created:
+        serialized_relations_changed(
+            instance.user_set.values_list("pk", flat=True), using
+        )
+
+
+# Fields pushed to subscribers, enough to update a terminal's roster
+PUSHED_FIELDS = ("name", "name_ar", "role", "is_active", "is_deleted")
+
+
+@receiver(post_save, sender=User)
+def push_user_saved(sender, instance, created, using, **kwargs):
+    event = {"event": "created" if created else "updated", "id": str(instance.pk)}
+    event.update((field, getattr(instance, field)) for field in PUSHED_FIELDS)
+    transaction.on_commit(lambda: push_hub.publish(event), using=using)
+
+
+@receiver(post_delete, sender=User)
+def push_user_deleted(sender, instance, using, **kwargs):
+    event = {"event": "deleted", "id": str(instance.pk)}
+    transaction.on_commit(lambda: push_hub.publish(event), using=using)
+
+
 @receiver(post_save, sender=User)
 def create_user_groups(sender, instance, created, **kwargs):
     if created:
         # Check if the user is an owner or manager
         if instance.role in [User.Role.OWNER, User.Role.MANAGER]:
             # Add the user to the 'admins' group
-            admin_group, created = Group.objects.get_or_create(name='admins')
-            instance.groups.add(admin_group)
+            group, created = Group.objects.get_or_create(name='admins')
         else:
             # Create or get the 'normal' group and add the user to it
-            normal_group, created = Group.objects.get_or_create(name='normal')
-            instance.groups.add(normal_group)
+            group, created = Group.objects.get_or_create(name='normal')
+        instance._adding_default_group = True
+        try:
+            instance.groups.add(group)
+        finally:
+            del instance._adding_default_group
 
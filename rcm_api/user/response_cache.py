@@ -0,0 +1,138 @@
+import hashlib
+import pickle
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.translation import get_language
+
+from rest_framework.response import Response
+
+from rcm_api.db_router import use_primary
+from rcm_api.util import LocalLRUCache
+
+
+# Generation scope shared by every view listing users
+ALL_USERS = "all"
+
+
+def response_cache_settings():
+    defaults = {
+        "LOCAL_MAX_SIZE": 1000,
+        "TTL": 5 * 60,
+        "KEY_PREFIX": "user:response",
+        "GENERATION_PREFIX": "user:generation",
+    }
+    defaults.update(getattr(settings, "USER_RESPONSE_CACHE", {}))
+    return defaults
+
+
+class ResponseCache:
+    """
+    Cache of serialized GET responses, keyed on the view, the query string,
+    the language, the caller's role and a generation counter.
+
+    List views use the ``all`` generation, single-user views the generation
+    of the user they show. The receivers in ``user.models`` bump both when a
+    user changes, so a cached response is simply never looked up again once
+    it's out of date and nothing has to be deleted. Because the generation is
+    part of the key, bodies can also be kept in a per-process LRU.
+    """
+
+    def __init__(self):
+        conf = response_cache_settings()
+        self.ttl = conf["TTL"]
+        self.key_prefix = conf["KEY_PREFIX"]
+        self.generation_prefix = conf["GENERATION_PREFIX"]
+        self.local = LocalLRUCache(max_size=conf["LOCAL_MAX_SIZE"], ttl=self.ttl)
+
+    def generation_key(self, scope):
+        return f"{self.generation_prefix}:{scope}"
+
+    def generation(self, scope):
+        key = self.generation_key(scope)
+        generation = cache.get(key)
+        if generation is None:
+            # A counter that was evicted restarts from the clock, never from
+            # a value responses may already be cached under.
+            cache.add(key, time.time_ns(), None)
+            generation = cache.get(key)
+        return generation
+
+    def bump(self, user_ids=()):
+        """Invalidate every list, and the single-user views of ``user_ids``."""
+        for scope in [ALL_USERS, *(str(user_id) for user_id in user_ids)]:
+            try:
+                cache.incr(self.generation_key(scope))
+            except ValueError:
+                # no counter yet, the next reader starts a fresh one
+                pass
+
+    def cache_key(self, view, request, scope):
+        parts = [
+            type(view).__name__,
+            scope,
+            str(self.generation(scope)),
+            getattr(request.user, "role", ""),
+            get_language() or "",
+            # serializers build absolute media urls
+            request.get_host(),
+            "&".join(sorted(request.META.get("QUERY_STRING", "").split("&"))),
+        ]
+        digest = hashlib.blake2b("|".join(parts).encode(), digest_size=16)
+        return f"{self.key_prefix}:{digest.hexdigest()}"
+
+    def get(self, key):
+        data = self.local.get(key)
+        if data is None:
+            data = cache.get(key)
+            if data is not None:
+                self.local.set(key, data)
+        return data
+
+    def set(self, key, data):
+        cache.set(key, data, self.ttl)
+        # a pickled copy drops the serializer (and queryset) DRF links to the data
+        self.local.set(key, pickle.loads(pickle.dumps(data, pickle.HIGHEST_PROTOCOL)))
+
+
+response_cache = ResponseCache()
+
+
+class CachedResponseMixin:
+    """
+    Serves successful GET responses from ``response_cache``.
+
+    Views listing users keep the default ``ALL_USERS`` scope. Views showing
+    one user return that user's id from ``get_response_cache_scope``.
+    Permission classes still run on every request; checks done inside the
+    view are covered by the caller's role being part of the key.
+    """
+
+    def get_response_cache_scope(self):
+        return ALL_USERS
+
+    def get(self, request, *args, **kwargs):
+        # read the generation before the data, a write in between only
+        # leaves the response under the old generation
+        key = response_cache.cache_key(self, request, self.get_response_cache_scope())
+        data = response_cache.get(key)
+        if data is not None:
+            return Response(data)
+
+        # A lagging replica could return rows older than the generation the
+        # response is stored under, and other workers would keep serving them
+        # after the bump. Fills read from the primary.
+        with use_primary():
+            response = super().get(request, *args, **kwargs)
+        if response.status_code == 200:
+            response_cache.set(key, response.data)
+        return response
+
+
+def user_scope(value):
+    try:
+        return str(uuid.UUID(str(value)))
+    except ValueError:
+        return str(value)
@@ -0,0 +1,177 @@
+import hashlib
+import math
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from rest_framework_simplejwt.settings import api_settings
+
+from user.models import RevokedToken
+
+
+def revocation_settings():
+    defaults = {
+        "REFRESH_INTERVAL": 5,
+        "REFRESH_OVERLAP": 60,
+        "BLOOM_CAPACITY": 100000,
+        "BLOOM_ERROR_RATE": 0.001,
+        "KEY_PREFIX": "token:revoked",
+    }
+    defaults.update(getattr(settings, "TOKEN_REVOCATION", {}))
+    return defaults
+
+
+class BloomFilter:
+    """Fixed size bloom filter over strings, sized for capacity and error rate."""
+
+    def __init__(self, capacity, error_rate):
+        self.capacity = capacity
+        self.size = max(
+            8, math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2))
+        )
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        # double hashing: k positions from the two halves of one digest
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hash_count)]
+
+    def add(self, item):
+        # only a bit that flips makes a new item, re-adding one doesn't count
+        added = False
+        for position in self._positions(item):
+            bit = 1 << (position & 7)
+            if not self.bits[position >> 3] & bit:
+                self.bits[position >> 3] |= bit
+                added = True
+        if added:
+            self.count += 1
+
+    def __contains__(self, item):
+        return all(
+            self.bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(item)
+        )
+
+
+class TokenRevocationList:
+    """
+    Revoked token ids (``jti``) live in ``RevokedToken`` rows. Each process
+    keeps a bloom filter of them, refreshed incrementally every
+    ``REFRESH_INTERVAL`` seconds and only when the shared generation counter
+    moved. A token that is not in the filter is not revoked; only filter
+    hits pay for an exact lookup (shared cache, then database).
+    """
+
+    def __init__(self):
+        conf = revocation_settings()
+        self.refresh_interval = conf["REFRESH_INTERVAL"]
+        self.refresh_overlap = timedelta(seconds=conf["REFRESH_OVERLAP"])
+        self.bloom_capacity = conf["BLOOM_CAPACITY"]
+        self.bloom_error_rate = conf["BLOOM_ERROR_RATE"]
+        self.key_prefix = conf["KEY_PREFIX"]
+        self.generation_key = f"{self.key_prefix}:generation"
+        self._lock = threading.Lock()
+        self.bloom = None
+        self.generation = None
+        self.synced_at = None
+        self.next_refresh = 0
+
+    def jti_key(self, jti):
+        return f"{self.key_prefix}:{jti}"
+
+    def is_revoked(self, jti):
+        self.refresh()
+        if jti not in self.bloom:
+            return False
+        return self.exact_check(jti)
+
+    async def ais_revoked(self, jti):
+        if time.monotonic() >= self.next_refresh:
+            # at most once per REFRESH_INTERVAL, run the sync refresh in a thread
+            await sync_to_async(self.refresh)()
+        if jti not in self.bloom:
+            return False
+        if await cache.aget(self.jti_key(jti)):
+            return True
+        return await RevokedToken.objects.filter(jti=jti).aexists()
+
+    def exact_check(self, jti):
+        if cache.get(self.jti_key(jti)):
+            return True
+        return RevokedToken.objects.filter(jti=jti).exists()
+
+    def refresh(self, force=False):
+        if not force and time.monotonic() < self.next_refresh:
+            return
+        with self._lock:
+            if not force and time.monotonic() < self.next_refresh:
+                return
+            generation = cache.get(self.generation_key)
+            if self.bloom is None or force:
+                self.rebuild(generation)
+            elif generation is None or generation != self.generation:
+                self.load_since(self.synced_at - self.refresh_overlap, generation)
+            # only once loaded, other threads skip refresh() until then
+            self.next_refresh = time.monotonic() + self.refresh_interval
+
+    def rebuild(self, generation):
+        revoked = RevokedToken.objects.filter(expires_at__gt=timezone.now())
+        capacity = max(self.bloom_capacity, revoked.count() * 2)
+        # filled before it replaces the current one, readers never see it half-built
+        bloom = BloomFilter(capacity, self.bloom_error_rate)
+        self.load(bloom, revoked, generation)
+        self.bloom = bloom
+
+    def load_since(self, since, generation):
+        if self.bloom.count >= self.bloom.capacity:
+            # filter is full and its error rate climbing, start over bigger
+            self.rebuild(generation)
+            return
+        # re-read an overlap window so rows committed late are not missed
+        revoked = RevokedToken.objects.filter(revoked_at__gte=since)
+        self.load(self.bloom, revoked, generation)
+
+    def load(self, bloom, revoked, generation):
+        synced_at = timezone.now()
+        for jti in revoked.values_list("jti", flat=True).iterator():
+            bloom.add(jti)
+        self.synced_at = synced_at
+        self.generation = generation
+
+    def revoke(self, jti, expires_at, user_id=None):
+        RevokedToken.objects.get_or_create(
+            jti=jti, defaults={"expires_at": expires_at, "user_id": user_id}
+        )
+        ttl = max(1, int((expires_at - timezone.now()).total_seconds()))
+        cache.set(self.jti_key(jti), True, ttl)
+        transaction.on_commit(self.bump_generation)
+        with self._lock:
+            if self.bloom is not None:
+                self.bloom.add(jti)
+
+    def revoke_token(self, token):
+        expires_at = datetime.fromtimestamp(token["exp"], tz=dt_timezone.utc)
+        self.revoke(token["jti"], expires_at, token.get(api_settings.USER_ID_CLAIM))
+
+    def bump_generation(self):
+        try:
+            cache.incr(self.generation_key)
+        except ValueError:
+            cache.add(self.generation_key, 1, None)
+
+    def purge_expired(self):
+        return RevokedToken.objects.filter(expires_at__lte=timezone.now()).delete()
+
+
+token_revocations = TokenRevocationList()
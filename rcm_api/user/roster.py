@@ -0,0 +1,274 @@
+import hashlib
+import struct
+import threading
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import patch_cache_control
+
+from rest_framework import status
+from rest_framework.views import APIView
+
+from rcm_api.compression import uncoded_etag
+
+from user.models import User
+from user.etags import matching_etag
+from user.response_cache import ALL_USERS, response_cache
+
+
+CONTENT_TYPE = "application/vnd.rcm.roster"
+MAGIC = b"RSTR"
+FORMAT_VERSION = 1
+FULL, DIFF = 0, 1
+# magic, format version, kind, version, base version, users, deleted users
+HEADER = struct.Struct("<4sBB12s12sII")
+NO_BASE = bytes(12)
+
+
+def roster_settings():
+    defaults = {
+        # previous snapshots kept to diff a client's version against
+        "HISTORY": 8,
+    }
+    defaults.update(getattr(settings, "USER_ROSTER", {}))
+    return defaults
+
+
+def encode_varint(value, out):
+    while value > 0x7F:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def decode_varint(data, offset):
+    value = shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+
+def encode_strings(strings, out):
+    for string in strings:
+        encoded = string.encode()
+        encode_varint(len(encoded), out)
+        out += encoded
+
+
+def decode_strings(data, offset, count):
+    strings = []
+    for _ in range(count):
+        length, offset = decode_varint(data, offset)
+        strings.append(data[offset : offset + length].decode())
+        offset += length
+    return strings, offset
+
+
+def decode_ids(data, offset, count):
+    end = offset + 16 * count
+    return [uuid.UUID(bytes=data[i : i + 16]) for i in range(offset, end, 16)], end
+
+
+def encode_roster(rows, kind=FULL, version=NO_BASE, base=NO_BASE, deleted=()):
+    """
+    Encode roster rows, ``(id, name, name_ar, role, avatar, groups)`` tuples.
+
+    After the header come a table of the role and group names, then one
+    column per field: the ids as 16 bytes each, names, arabic names and
+    avatar urls as length prefixed utf-8 (empty for no avatar), roles as an
+    index in the table, groups as a count followed by table indices. Last
+    come the ids of the users a diff removes. Integers are LEB128 varints.
+    """
+    table = sorted(
+        {row[3] for row in rows} | {group for row in rows for group in row[5]}
+    )
+    index = {name: position for position, name in enumerate(table)}
+
+    out = bytearray(
+        HEADER.pack(
+            MAGIC, FORMAT_VERSION, kind, version, base, len(rows), len(deleted)
+        )
+    )
+    encode_varint(len(table), out)
+    encode_strings(table, out)
+    for row in rows:
+        out += row[0].bytes
+    for column in (1, 2):
+        encode_strings([row[column] for row in rows], out)
+    for row in rows:
+        encode_varint(index[row[3]], out)
+    encode_strings([row[4] for row in rows], out)
+    for row in rows:
+        encode_varint(len(row[5]), out)
+        for group in row[5]:
+            encode_varint(index[group], out)
+    for user_id in deleted:
+        out += user_id.bytes
+    return bytes(out)
+
+
+def decode_roster(data):
+    """Inverse of ``encode_roster``, for clients and checks written in python."""
+    header = HEADER.unpack_from(data)
+    magic, format_version, kind, version, base, count, deleted_count = header
+    if magic != MAGIC or format_version != FORMAT_VERSION:
+        raise ValueError("Not a roster snapshot of a supported format.")
+    offset = HEADER.size
+    table_size, offset = decode_varint(data, offset)
+    table, offset = decode_strings(data, offset, table_size)
+    ids, offset = decode_ids(data, offset, count)
+    names, offset = decode_strings(data, offset, count)
+    names_ar, offset = decode_strings(data, offset, count)
+    roles = []
+    for _ in range(count):
+        position, offset = decode_varint(data, offset)
+        roles.append(table[position])
+    avatars, offset = decode_strings(data, offset, count)
+    groups = []
+    for _ in range(count):
+        size, offset = decode_varint(data, offset)
+        user_groups = []
+        for _ in range(size):
+            position, offset = decode_varint(data, offset)
+            user_groups.append(table[position])
+        groups.append(tuple(user_groups))
+    deleted, offset = decode_ids(data, offset, deleted_count)
+    return {
+        "kind": kind,
+        "version": version.hex(),
+        "base": base.hex() if base != NO_BASE else None,
+        "users": list(zip(ids, names, names_ar, roles, avatars, groups)),
+        "deleted": deleted,
+    }
+
+
+class Snapshot:
+    __slots__ = ("generation", "version", "rows", "content", "etag")
+
+    def __init__(self, generation, rows):
+        self.generation = generation
+        self.rows = rows
+        body = encode_roster(list(rows.values()))
+        # the version is a digest of the rows, the same in every process
+        self.version = hashlib.blake2b(body, digest_size=12).digest()
+        self.content = body[:6] + self.version + body[18:]
+        self.etag = f'"{self.version.hex()}"'
+
+
+class RosterSnapshots:
+    """
+    The staff roster as offline clients need it, encoded by ``encode_roster``.
+
+    A snapshot is rebuilt on the first request after the ``all`` response
+    generation moved, so changes cost nothing until someone asks. The last
+    ``HISTORY`` snapshots are kept to send a client only the rows that
+    changed since the version it holds.
+    """
+
+    def __init__(self):
+        self.history_size = roster_settings()["HISTORY"]
+        self._history = OrderedDict()
+        self._diffs = {}
+        self._current = None
+        self._lock = threading.Lock()
+
+    def queryset(self):
+        return User.objects.filter(is_deleted=False, is_superuser=False)
+
+    def load(self):
+        groups = {}
+        for user_id, group in User.groups.through.objects.filter(
+            user__in=self.queryset()
+        ).values_list("user_id", "group__name"):
+            groups.setdefault(user_id, []).append(group)
+        avatars = User._meta.get_field("avatar").storage
+        rows = OrderedDict()
+        for user_id, name, name_ar, role, avatar in self.queryset().order_by(
+            "id"
+        ).values_list("id", "name", "name_ar", "role", "avatar"):
+            rows[user_id] = (
+                user_id,
+                name,
+                name_ar,
+                role,
+                # relative to the host, like the client's other media urls
+                avatars.url(avatar) if avatar else "",
+                tuple(sorted(groups.get(user_id, ()))),
+            )
+        return rows
+
+    def current(self):
+        generation = response_cache.generation(ALL_USERS)
+        snapshot = self._current
+        if snapshot is not None and snapshot.generation == generation:
+            return snapshot
+        with self._lock:
+            snapshot = self._current
+            if snapshot is None or snapshot.generation != generation:
+                snapshot = Snapshot(generation, self.load())
+                if snapshot.version not in self._history:
+                    self._history[snapshot.version] = snapshot
+                    while len(self._history) > self.history_size:
+                        self._history.popitem(last=False)
+                    self._diffs = {}
+                self._current = snapshot
+        return snapshot
+
+    def diff(self, base_version, snapshot):
+        """The diff from ``base_version`` to ``snapshot``, None if it's gone."""
+        key = (base_version, snapshot.version)
+        content = self._diffs.get(key)
+        if content is not None:
+            return content
+        base = self._history.get(base_version)
+        if base is None:
+            return None
+        changed = [
+            row
+            for user_id, row in snapshot.rows.items()
+            if base.rows.get(user_id) != row
+        ]
+        deleted = [user_id for user_id in base.rows if user_id not in snapshot.rows]
+        content = encode_roster(changed, DIFF, snapshot.version, base_version, deleted)
+        self._diffs[key] = content
+        return content
+
+
+roster_snapshots = RosterSnapshots()
+
+
+class RosterSnapshotView(APIView):
+    """
+    Serves the roster snapshot. ``?since=<etag>`` asks for a diff from the
+    version the client holds; when that version is no longer known the full
+    snapshot is sent, and the body's kind tells the two apart.
+    """
+
+    def get(self, request, *args, **kwargs):
+        snapshot = roster_snapshots.current()
+        matched = matching_etag(request.headers.get("If-None-Match", ""), snapshot.etag)
+        if matched:
+            response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+            response["ETag"] = matched
+        else:
+            content = None
+            since = request.query_params.get("since", "").strip('"')
+            # the tag of a compressed snapshot names the same version
+            since = uncoded_etag(f'"{since}"')[1:-1]
+            if since:
+                try:
+                    content = roster_snapshots.diff(bytes.fromhex(since), snapshot)
+                except ValueError:
+                    content = None
+            response = HttpResponse(
+                content or snapshot.content, content_type=CONTENT_TYPE
+            )
+            response["ETag"] = snapshot.etag
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
@@ -0,0 +1,299 @@
+import csv
+import io
+import random
+import uuid
+from datetime import date, timedelta
+
+from django.contrib.auth.models import Group
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, router, transaction
+from django.utils import timezone
+
+from PIL import Image, ImageDraw
+
+from user.hashing import hash_password
+from user.models import User
+
+
+# seeded users are the ones with emails in this domain
+SEED_DOMAIN = "seed.example.com"
+DEFAULT_PASSWORD = "Seed-Passw0rd"
+
+# (english, arabic) pairs, name and name_ar of the same person
+MALE_NAMES = [
+    ("Ahmed", "أحمد"),
+    ("Mohamed", "محمد"),
+    ("Mahmoud", "محمود"),
+    ("Omar", "عمر"),
+    ("Youssef", "يوسف"),
+    ("Karim", "كريم"),
+    ("Mostafa", "مصطفى"),
+    ("Ali", "علي"),
+    ("Hassan", "حسن"),
+    ("Khaled", "خالد"),
+    ("Tarek", "طارق"),
+    ("Amr", "عمرو"),
+    ("Ibrahim", "إبراهيم"),
+    ("Hamza", "حمزة"),
+    ("Ziad", "زياد"),
+    ("Adam", "آدم"),
+    ("John", "جون"),
+    ("David", "ديفيد"),
+    ("Michael", "مايكل"),
+    ("George", "جورج"),
+]
+FEMALE_NAMES = [
+    ("Mona", "منى"),
+    ("Sara", "سارة"),
+    ("Laila", "ليلى"),
+    ("Nour", "نور"),
+    ("Fatma", "فاطمة"),
+    ("Mariam", "مريم"),
+    ("Aya", "آية"),
+    ("Salma", "سلمى"),
+    ("Heba", "هبة"),
+    ("Yasmin", "ياسمين"),
+    ("Dina", "دينا"),
+    ("Rana", "رنا"),
+    ("Hana", "هنا"),
+    ("Malak", "ملك"),
+    ("Farida", "فريدة"),
+    ("Jana", "جنى"),
+    ("Emily", "إيميلي"),
+    ("Sophia", "صوفيا"),
+    ("Maria", "ماريا"),
+    ("Grace", "جريس"),
+]
+FAMILY_NAMES = [
+    ("Hassan", "حسن"),
+    ("Khalil", "خليل"),
+    ("Mansour", "منصور"),
+    ("Saleh", "صالح"),
+    ("Farouk", "فاروق"),
+    ("Nasser", "ناصر"),
+    ("Abdelrahman", "عبد الرحمن"),
+    ("El-Sayed", "السيد"),
+    ("Mostafa", "مصطفى"),
+    ("Ibrahim", "إبراهيم"),
+    ("Fahmy", "فهمي"),
+    ("Soliman", "سليمان"),
+    ("Haddad", "حداد"),
+    ("Naguib", "نجيب"),
+    ("Shaker", "شاكر"),
+    ("Zaki", "زكي"),
+    ("Smith", "سميث"),
+    ("Brown", "براون"),
+]
+# (role, share of the staff, positions)
+ROLES = [
+    (User.Role.OWNER, 1, ["Owner", "Partner"]),
+    (User.Role.MANAGER, 5, ["Branch Manager", "Shift Manager"]),
+    (User.Role.WAITER, 40, ["Waiter", "Head Waiter", "Host"]),
+    (User.Role.CASHIER, 15, ["Cashier", "Senior Cashier"]),
+    (User.Role.CHEF, 25, ["Chef", "Sous Chef", "Line Cook", "Pastry Chef"]),
+    (User.Role.DELIVERY, 14, ["Delivery Driver", "Dispatcher"]),
+]
+NATIONALITIES = ["Egyptian"] * 17 + ["Saudi", "Jordanian", "Sudanese"]
+EDUCATION = ["High school", "Diploma", "Bachelor's degree", "Master's degree", None]
+CITIES = ["Cairo", "Giza", "Alexandria", "Mansoura", "Tanta", "Aswan"]
+STREETS = ["Tahrir St", "Nile Corniche", "Abbas El Akkad St", "Port Said St"]
+BANKS = ["National Bank of Egypt", "Banque Misr", "CIB", None, None]
+
+# every column of user_user, the order rows are generated in
+COLUMNS = [field.attname for field in User._meta.concrete_fields]
+
+
+def role_table():
+    table = []
+    for role, share, positions in ROLES:
+        table.extend([(role, positions)] * share)
+    return table
+
+
+def generate_photos(count):
+    """
+    ``count`` photos and their avatars saved once to the media storage, the
+    seeded users share them. Returns ``(photo, avatar)`` names.
+    """
+    photos = []
+    rng = random.Random(count)
+    for index in range(count):
+        photo_name = f"uploads/employee/seed-{index}.png"
+        avatar_name = f"uploads/employee/seed-{index}-avatar.png"
+        if not default_storage.exists(photo_name):
+            color = tuple(rng.randrange(60, 220) for _ in range(3))
+            image = Image.new("RGB", (600, 600), color)
+            draw = ImageDraw.Draw(image)
+            # a head and shoulders, enough to look like a profile photo
+            draw.ellipse((200, 100, 400, 300), fill=(240, 220, 200))
+            draw.ellipse((120, 330, 480, 700), fill=(40, 40, 60))
+            for name, size in ((photo_name, 600), (avatar_name, 300)):
+                buffer = io.BytesIO()
+                image.resize((size, size)).save(buffer, format="PNG")
+                default_storage.save(name, ContentFile(buffer.getvalue()))
+        photos.append((photo_name, avatar_name))
+    return photos
+
+
+def generate_users(count, start=0, seed=0, password=None, photos=()):
+    """
+    Rows of ``count`` staff users in ``COLUMNS`` order, the same for the same
+    ``start`` and ``seed``. Row ``n`` is unique through its index: email
+    ``first.last.n@seed.example.com``, mobile number ``019`` and ``n`` on 8
+    digits, identification ``9`` and ``n`` on 14 digits.
+    """
+    rng = random.Random(f"{seed}:{start}")
+    password = password or hash_password(DEFAULT_PASSWORD)
+    roles = role_table()
+    now = timezone.now()
+    three_years = 3 * 365 * 24 * 60 * 60
+    default_photo = ("default_photos/default.jpg", None)
+    for index in range(start, start + count):
+        gender = "female" if rng.random() < 0.45 else "male"
+        names = FEMALE_NAMES if gender == "female" else MALE_NAMES
+        first, first_ar = rng.choice(names)
+        family, family_ar = rng.choice(FAMILY_NAMES)
+        role, positions = rng.choice(roles)
+        created_at = now - timedelta(seconds=rng.randrange(three_years))
+        updated_at = created_at + timedelta(
+            seconds=rng.randrange(int((now - created_at).total_seconds()) + 1)
+        )
+        photo, avatar = rng.choice(photos) if photos else default_photo
+        bank = rng.choice(BANKS)
+        values = {
+            "id": uuid.UUID(int=rng.getrandbits(128), version=4),
+            "password": password,
+            "last_login": None,
+            "is_superuser": False,
+            "email": f"{first}.{family}.{index}@{SEED_DOMAIN}".lower(),
+            "name": f"{first} {family}",
+            "name_ar": f"{first_ar} {family_ar}",
+            "created_at": created_at,
+            "updated_at": updated_at,
+            "nationality": rng.choice(NATIONALITIES),
+            "passport": (
+                f"A{rng.randrange(10**7, 10**8)}" if rng.random() < 0.3 else None
+            ),
+            "identification": f"9{index:014d}",
+            "birthdate": date(1960, 1, 1) + timedelta(days=rng.randrange(16000)),
+            "role": role,
+            "position": rng.choice(positions),
+            "gender": gender,
+            "education": rng.choice(EDUCATION),
+            "home_address": (
+                f"{rng.randrange(1, 200)} {rng.choice(STREETS)}, {rng.choice(CITIES)}"
+            ),
+            "mobile_number": f"019{index:08d}",
+            "photo": photo,
+            "avatar": avatar,
+            "cover": None,
+            "bank_name": bank,
+            "bank_branch": rng.choice(CITIES) if bank else None,
+            "bank_account_name": f"{first} {family}" if bank else None,
+            "bank_account_number": (
+                f"{rng.randrange(10**11, 10**12)}" if bank else None
+            ),
+            "is_active": rng.random() >= 0.01,
+            "is_staff": True,
+            "is_deleted": rng.random() < 0.02,
+            "last_seen": None,
+            "auth_version": 1,
+        }
+        yield tuple(values[column] for column in COLUMNS)
+
+
+def group_ids():
+    """Group of each role, the ones ``create_user_groups`` would add."""
+    admins = Group.objects.get_or_create(name="admins")[0].pk
+    normal = Group.objects.get_or_create(name="normal")[0].pk
+    return {
+        role: admins if role in (User.Role.OWNER, User.Role.MANAGER) else normal
+        for role in User.Role.values
+    }
+
+
+def copy_rows(cursor, table, columns, rows):
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    buffer.seek(0)
+    # unquoted empty fields are NULL in CSV format
+    cursor.copy_expert(
+        f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer
+    )
+
+
+def insert_users(rows, batch_size=50000, progress=None):
+    """
+    Inserts generated rows and their group memberships, one transaction per
+    batch. PostgreSQL gets them through ``COPY``, other backends through
+    ``bulk_create``. Returns the number of users inserted.
+    """
+    using = router.db_for_write(User)
+    connection = connections[using]
+    groups = group_ids()
+    through = User.groups.through
+    id_index = COLUMNS.index("id")
+    role_index = COLUMNS.index("role")
+    inserted = 0
+    batch = []
+
+    def flush():
+        nonlocal inserted
+        memberships = [(row[id_index], groups[row[role_index]]) for row in batch]
+        with transaction.atomic(using=using), connection.cursor() as cursor:
+            raw_cursor = getattr(cursor, "cursor", None)
+            # psycopg2; psycopg 3 and the other backends take the ORM path
+            copy = hasattr(raw_cursor, "copy_expert")
+            if connection.vendor == "postgresql" and copy:
+                quote = connection.ops.quote_name
+                copy_rows(
+                    raw_cursor,
+                    quote(User._meta.db_table),
+                    [quote(User._meta.get_field(name).column) for name in COLUMNS],
+                    batch,
+                )
+                copy_rows(
+                    raw_cursor,
+                    quote(through._meta.db_table),
+                    [quote("user_id"), quote("group_id")],
+                    memberships,
+                )
+            else:
+                # bulk_create skips the post_save receivers, groups are added
+                # explicitly in both cases. It also stamps created_at and
+                # updated_at with the current time.
+                User.objects.using(using).bulk_create(
+                    (User(**dict(zip(COLUMNS, row))) for row in batch),
+                    batch_size=1000,
+                )
+                through.objects.using(using).bulk_create(
+                    (
+                        through(user_id=user_id, group_id=group_id)
+                        for user_id, group_id in memberships
+                    ),
+                    batch_size=1000,
+                )
+        inserted += len(batch)
+        batch.clear()
+        if progress is not None:
+            progress(inserted)
+
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    return inserted
+
+
+def seeded_count():
+    return User.objects.filter(email__endswith=f"@{SEED_DOMAIN}").count()
+
+
+def analyze():
+    """Refresh the planner statistics after a bulk load."""
+    using = router.db_for_write(User)
+    with connections[using].cursor() as cursor:
+        cursor.execute("ANALYZE")
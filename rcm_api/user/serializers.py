@@ -7,6 +7,7 @@ from django.utils.translation import gettext_lazy as _
 from rest_framework import serializers
 
 from user.models import User
+from user.hashing import set_password
 
 
 class GroupSerializer(serializers.ModelSerializer):
@@ -116,7 +117,7 @@ class UserSerializer(serializers.ModelSerializer):
         user = super().update(instance, validated_data)
 
         if password:
-            user.set_password(password)
+            set_password(user, password)
             user.save()
 
         return user
@@ -161,21 +162,12 @@ class AuthTokenSerializer(serializers.Serializer):
         identifier = attrs.get("identifier")
         password = attrs.get("password")
 
-        # Check whether the provided identifier is an email or a mobile number
-        is_email = "@" in identifier
-        if is_email:
-            user = authenticate(
-                request=self.context.get("request"),
-                username=identifier,
-                password=password,
-            )
-        else:
-            # Assuming your user model has a field named 'mobile_number'
-            user = authenticate(
-                request=self.context.get("request"),
-                mobile_number=identifier,
-                password=password,
-            )
+        # user.backends.IdentifierBackend tells emails and mobile numbers apart
+        user = authenticate(
+            request=self.context.get("request"),
+            identifier=identifier,
+            password=password,
+        )
 
         if not user:
             msg = _("Unable to authenticate with provided credentials")
@@ -189,13 +181,3 @@ class UserDialogSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ["id", "name", "name_ar"]
-
-
-class UserGenderChoiceSerializer(serializers.Serializer):
-    value = serializers.CharField()
-    display = serializers.CharField()
-
-
-class UserRoleDialogSerializer(serializers.Serializer):
-    value = serializers.CharField()
-    display = serializers.CharField()
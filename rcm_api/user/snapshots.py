@@ -0,0 +1,132 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+
+from rcm_api.util import LocalLRUCache
+
+
+# Fields kept in a user snapshot, enough to authenticate and authorize a request
+SNAPSHOT_FIELDS = (
+    "id",
+    "email",
+    "name",
+    "role",
+    "is_active",
+    "is_staff",
+    "is_superuser",
+    "is_deleted",
+    "auth_version",
+)
+
+
+def snapshot_settings():
+    defaults = {
+        "LOCAL_MAX_SIZE": 10000,
+        "LOCAL_TTL": 5,
+        "SHARED_TTL": 60 * 60,
+        "KEY_PREFIX": "user:snapshot",
+    }
+    defaults.update(getattr(settings, "USER_SNAPSHOT_CACHE", {}))
+    return defaults
+
+
+class UserSnapshotStore:
+    """
+    Two level cache of user snapshots: a per-process LRU in front of the
+    shared django cache, with the database as the last resort.
+
+    Every snapshot carries the user's ``auth_version``. A snapshot older than
+    the version requested by the caller (the ``ver`` claim of the token) is
+    treated as stale and reloaded.
+    """
+
+    def __init__(self):
+        conf = snapshot_settings()
+        self.key_prefix = conf["KEY_PREFIX"]
+        self.shared_ttl = conf["SHARED_TTL"]
+        self.local = LocalLRUCache(
+            max_size=conf["LOCAL_MAX_SIZE"], ttl=conf["LOCAL_TTL"]
+        )
+
+    def cache_key(self, user_id):
+        return f"{self.key_prefix}:{user_id}"
+
+    def get(self, user_id, min_version=0):
+        user_id = str(user_id)
+        snapshot = self.local.get(user_id)
+        if snapshot is not None and snapshot["auth_version"] >= min_version:
+            return snapshot
+
+        snapshot = cache.get(self.cache_key(user_id))
+        if snapshot is None or snapshot["auth_version"] < min_version:
+            snapshot = self.load(user_id)
+            if snapshot is None:
+                return None
+
+        self.local.set(user_id, snapshot)
+        return snapshot
+
+    def load(self, user_id):
+        snapshot = (
+            get_user_model()
+            .objects.filter(pk=user_id)
+            .values(*SNAPSHOT_FIELDS)
+            .first()
+        )
+        if snapshot is not None:
+            cache.set(self.cache_key(user_id), snapshot, self.shared_ttl)
+        return snapshot
+
+    async def aget(self, user_id, min_version=0):
+        user_id = str(user_id)
+        snapshot = self.local.get(user_id)
+        if snapshot is not None and snapshot["auth_version"] >= min_version:
+            return snapshot
+
+        snapshot = await cache.aget(self.cache_key(user_id))
+        if snapshot is None or snapshot["auth_version"] < min_version:
+            snapshot = await self.aload(user_id)
+            if snapshot is None:
+                return None
+
+        self.local.set(user_id, snapshot)
+        return snapshot
+
+    async def aload(self, user_id):
+        snapshot = (
+            await get_user_model()
+            .objects.filter(pk=user_id)
+            .values(*SNAPSHOT_FIELDS)
+            .afirst()
+        )
+        if snapshot is not None:
+            await cache.aset(self.cache_key(user_id), snapshot, self.shared_ttl)
+        return snapshot
+
+    def update(self, user, using=None):
+        # Called after a user is saved, so the cache never lags behind the row.
+        # The values are taken now and stored once the save commits, a rolled
+        # back save never reaches the cache.
+        user_id = str(user.pk)
+        snapshot = {field: getattr(user, field) for field in SNAPSHOT_FIELDS}
+
+        def store():
+            cache.set(self.cache_key(user_id), snapshot, self.shared_ttl)
+            self.local.set(user_id, snapshot)
+
+        transaction.on_commit(store, using=using)
+
+    def invalidate(self, user_id, using=None):
+        # after commit too, or a request could cache the row again before the
+        # delete is visible
+        user_id = str(user_id)
+
+        def drop():
+            cache.delete(self.cache_key(user_id))
+            self.local.delete(user_id)
+
+        transaction.on_commit(drop, using=using)
+
+
+user_snapshots = UserSnapshotStore()
@@ -0,0 +1,137 @@
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core import signing
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+
+from user.models import UserTombstone
+
+
+SYNC_TOKEN_SALT = "user.sync"
+
+
+def sync_settings():
+    defaults = {
+        "PAGE_SIZE": 500,
+        "MAX_PAGE_SIZE": 1000,
+        # seconds re-read at the start of every pass, so rows committed after
+        # a pass read past them are not missed
+        "OVERLAP": 60,
+        # tombstones older than this are purged, older tokens need a full sync
+        "TOMBSTONE_RETENTION": 30 * 24 * 60 * 60,
+    }
+    defaults.update(getattr(settings, "USER_SYNC", {}))
+    return defaults
+
+
+class SyncTokenExpired(APIException):
+    status_code = status.HTTP_410_GONE
+    default_detail = _("Sync token expired, start again without a token.")
+    default_code = "sync_token_expired"
+
+
+def encode_token(state):
+    return signing.dumps(state, salt=SYNC_TOKEN_SALT, compress=True)
+
+
+def decode_token(token):
+    try:
+        state = signing.loads(token, salt=SYNC_TOKEN_SALT)
+        return {
+            "since": parse_time(state["s"]),
+            "pass_started": parse_time(state["p"]),
+            "after": (parse_time(state["a"][0]), state["a"][1]) if state["a"] else None,
+        }
+    except (signing.BadSignature, KeyError, TypeError, ValueError, IndexError):
+        raise ValidationError({"sync_token": [_("Invalid sync token.")]})
+
+
+def parse_time(value):
+    return datetime.fromisoformat(value) if value else None
+
+
+def format_time(value):
+    return value.isoformat() if value else None
+
+
+class ChangeFeed:
+    """
+    Pages of users changed since a sync token, in (updated_at, id) order.
+
+    A client starts without a token and gets every user that isn't deleted,
+    then keeps passing the returned ``sync_token``. Each pass returns the
+    rows whose updated_at moved since the previous pass started (minus
+    ``OVERLAP``), soft deleted users and tombstones of hard deleted ones as
+    ``deleted`` ids. Applying a page is idempotent, so the overlap only costs
+    re-sending a few rows.
+    """
+
+    def __init__(self):
+        conf = sync_settings()
+        self.page_size = conf["PAGE_SIZE"]
+        self.max_page_size = conf["MAX_PAGE_SIZE"]
+        self.overlap = timedelta(seconds=conf["OVERLAP"])
+        self.retention = timedelta(seconds=conf["TOMBSTONE_RETENTION"])
+
+    def page(self, queryset, token=None, limit=None):
+        now = timezone.now()
+        if token:
+            state = decode_token(token)
+            if state["since"] is not None and state["since"] < now - self.retention:
+                raise SyncTokenExpired()
+        else:
+            state = {"since": None, "pass_started": None, "after": None}
+        since, after = state["since"], state["after"]
+        # a pass starts with a token that has no position in it
+        pass_started = state["pass_started"] if after else now
+        limit = min(limit or self.page_size, self.max_page_size)
+
+        if since is None:
+            # full sync, the client has nothing to delete yet
+            queryset = queryset.filter(is_deleted=False)
+        else:
+            queryset = queryset.filter(updated_at__gte=since)
+        if after is not None:
+            updated_at, user_id = after
+            queryset = queryset.filter(
+                Q(updated_at__gt=updated_at) | Q(updated_at=updated_at, id__gt=user_id)
+            )
+        rows = list(queryset.order_by("updated_at", "id")[: limit + 1])
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        deleted = [user.pk for user in rows if user.is_deleted]
+        if since is not None and after is None:
+            deleted += UserTombstone.objects.filter(deleted_at__gte=since).values_list(
+                "user_id", flat=True
+            )
+
+        if has_more:
+            last = rows[-1]
+            next_state = {
+                "s": format_time(since),
+                "p": format_time(pass_started),
+                "a": [format_time(last.updated_at), str(last.pk)],
+            }
+        else:
+            next_state = {"s": format_time(pass_started - self.overlap), "p": None, "a": None}
+
+        return {
+            "changed": [user for user in rows if not user.is_deleted],
+            "deleted": list(dict.fromkeys(deleted)),
+            "has_more": has_more,
+            "sync_token": encode_token(next_state),
+        }
+
+    def purge_tombstones(self):
+        return UserTombstone.objects.filter(
+            deleted_at__lt=timezone.now() - self.retention
+        ).delete()
+
+
+change_feed = ChangeFeed()
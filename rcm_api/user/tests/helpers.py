@@ -0,0 +1,19 @@
+from user.models import User
+
+
+PASSWORD = "Test-Passw0rd"
+
+
+def create_user(email, number, **fields):
+    """A waiter unless ``fields`` say otherwise, unique through ``number``."""
+    fields.setdefault("mobile_number", f"010{number:08d}")
+    fields.setdefault("role", User.Role.WAITER)
+    return User.objects.create_user(
+        email=email,
+        password=PASSWORD,
+        name="Test User",
+        name_ar="مستخدم",
+        identification=f"1{number:014d}",
+        position="Staff",
+        **fields,
+    )
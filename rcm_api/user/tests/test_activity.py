@@ -0,0 +1,54 @@
+import asyncio
+import os
+import uuid
+from datetime import timedelta
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.db import DatabaseError
+from django.test import SimpleTestCase
+from django.utils import timezone
+
+from user.activity import ActivityTracker
+
+
+class ActivityTrackerTests(SimpleTestCase):
+    def setUp(self):
+        self.tracker = ActivityTracker()
+        self.tracker.max_buffer = 1
+        # no flusher thread unless a test starts one
+        self.tracker._pid = os.getpid()
+        self.user_id = str(uuid.uuid4())
+
+    async def test_full_buffer_wakes_the_flusher(self):
+        with mock.patch("user.activity.write_activity") as write_activity:
+            # in the event loop, a write here would raise
+            self.tracker.record_seen(self.user_id)
+        write_activity.assert_not_called()
+        self.assertTrue(self.tracker._full.is_set())
+
+    async def test_flusher_writes_once_woken(self):
+        self.tracker._pid = None
+        self.tracker.flush_interval = 60
+        with mock.patch("user.activity.write_activity") as write_activity:
+            await sync_to_async(self.tracker.record_seen)(self.user_id)
+            for _ in range(100):
+                if write_activity.called:
+                    break
+                await asyncio.sleep(0.01)
+        write_activity.assert_called_once()
+
+    def test_failed_flush_keeps_the_rows(self):
+        now = timezone.now()
+        self.tracker.record_login(self.user_id, now)
+        with mock.patch("user.activity.write_activity", side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                self.tracker.flush()
+        self.tracker.record_seen(self.user_id, now + timedelta(seconds=1))
+        self.tracker.record_seen(self.user_id, now - timedelta(seconds=1))
+
+        with mock.patch("user.activity.write_activity") as write_activity:
+            self.assertEqual(self.tracker.flush(), 1)
+        write_activity.assert_called_once_with(
+            [(self.user_id, now, now + timedelta(seconds=1))], self.tracker.batch_size
+        )
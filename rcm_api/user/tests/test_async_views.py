@@ -0,0 +1,66 @@
+from django.test import TestCase, override_settings
+
+from rest_framework.test import APIClient
+
+from user.activity import activity_tracker
+from user.models import User
+from user.tests.helpers import create_user
+from user.tokens import VersionedRefreshToken
+
+
+@override_settings(ROOT_URLCONF="user.tests.urls")
+class AsyncManagerUserViewTests(TestCase):
+    path = "/api/users/async/me/"
+
+    def setUp(self):
+        self.user = create_user("manager@example.com", 1, role=User.Role.MANAGER)
+        self.client = APIClient()
+        token = VersionedRefreshToken.for_user(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        self.addCleanup(activity_tracker.flush)
+
+    def test_matching_if_none_match_is_not_modified(self):
+        etag = self.client.get(self.path)["ETag"]
+        response = self.client.get(self.path, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+
+        self.client.patch(self.path, {"position": "Lead"}, format="json")
+        response = self.client.get(self.path, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_stale_if_match_is_refused(self):
+        etag = self.client.get(self.path)["ETag"]
+        response = self.client.patch(
+            self.path, {"position": "Lead"}, format="json", HTTP_IF_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 200)
+
+        # the same tag again, the first write moved it on
+        response = self.client.patch(
+            self.path, {"position": "Head"}, format="json", HTTP_IF_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 412)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.position, "Lead")
+
+
+@override_settings(ROOT_URLCONF="user.tests.urls")
+class AsyncUserListViewTests(TestCase):
+    path = "/api/users/async/user_list/"
+
+    def setUp(self):
+        manager = create_user("manager@example.com", 1, role=User.Role.MANAGER)
+        self.client = APIClient()
+        token = VersionedRefreshToken.for_user(manager).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        self.addCleanup(activity_tracker.flush)
+
+    def test_invalid_filters_are_refused(self):
+        response = self.client.get(self.path, {"ordering": "password"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("ordering", response.json())
+        # as the sync view answers
+        response = self.client.get("/api/users/user_list/", {"ordering": "password"})
+        self.assertEqual(response.status_code, 400)
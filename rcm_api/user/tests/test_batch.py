@@ -0,0 +1,85 @@
+import json
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
+
+from rcm_api.db_router import pin_key
+from rcm_api.metrics import metrics
+from user.activity import activity_tracker
+from user.models import User
+from user.tests.helpers import create_user
+from user.tokens import VersionedRefreshToken
+from user.views import UserBatchView
+
+
+@override_settings(ROOT_URLCONF="user.tests.urls")
+class BatchTests(TestCase):
+    def setUp(self):
+        self.user = create_user("manager@example.com", 1, role=User.Role.MANAGER)
+        cache.delete(self.pin())
+
+    def pin(self):
+        return pin_key(mock.Mock(user=self.user))
+
+    def batch(self, *requests):
+        # straight to the view, the batch's own middleware doesn't run
+        request = APIRequestFactory().post(
+            "/api/batch/", {"requests": list(requests)}, format="json"
+        )
+        force_authenticate(request, user=self.user)
+        response = UserBatchView.as_view()(request)
+        self.assertEqual(response.status_code, 200, response.content)
+        return json.loads(response.content)["responses"]
+
+    def test_max_requests_is_read_per_batch(self):
+        with override_settings(USER_BATCH={"MAX_REQUESTS": 1}):
+            request = APIRequestFactory().post(
+                "/api/batch/",
+                {"requests": [{"path": "/api/users/me/"}] * 2},
+                format="json",
+            )
+            force_authenticate(request, user=self.user)
+            response = UserBatchView.as_view()(request)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(len(self.batch(*[{"path": "/api/users/me/"}] * 2)), 2)
+
+    def test_only_successful_writes_pin_to_the_primary(self):
+        # through the whole middleware stack, as a client sends it
+        client = APIClient()
+        token = VersionedRefreshToken.for_user(self.user).access_token
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        self.addCleanup(activity_tracker.flush)
+
+        def batch(*requests):
+            response = client.post(
+                "/api/batch/", {"requests": list(requests)}, format="json"
+            )
+            self.assertEqual(response.status_code, 200)
+            return json.loads(response.content)["responses"]
+
+        batch({"path": "/api/users/me/"})
+        self.assertIsNone(cache.get(self.pin()))
+
+        responses = batch(
+            {"method": "PATCH", "path": "/api/users/me/", "body": {"role": "nope"}}
+        )
+        self.assertEqual(responses[0]["status"], 400)
+        self.assertIsNone(cache.get(self.pin()))
+
+        responses = batch(
+            {"method": "PATCH", "path": "/api/users/me/", "body": {"position": "Lead"}}
+        )
+        self.assertEqual(responses[0]["status"], 200)
+        self.assertTrue(cache.get(self.pin()))
+
+    def test_sub_requests_are_counted_under_their_view(self):
+        with mock.patch.object(metrics, "enabled", True), mock.patch.object(
+            metrics, "inc"
+        ) as inc:
+            self.batch({"path": "/api/users/me/"})
+        inc.assert_called_once_with(
+            "http_requests_total", view="user:me", method="GET", status=200
+        )
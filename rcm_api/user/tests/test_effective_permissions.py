@@ -0,0 +1,54 @@
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.db import transaction
+from django.test import TransactionTestCase
+
+from user.effective_permissions import effective_permissions
+from user.tests.helpers import create_user
+
+
+class EffectivePermissionTests(TransactionTestCase):
+    # outside a test transaction, the sets are cached as in a request
+    def setUp(self):
+        self.user = create_user("perms@example.com", 1)
+        self.group = Group.objects.create(name="cashiers")
+        self.addCleanup(self.clear)
+
+    def groups(self):
+        return effective_permissions.get(self.user.pk)["groups"]
+
+    def cached(self):
+        return cache.get(effective_permissions.cache_key(self.user.pk))
+
+    def clear(self):
+        cache.delete(effective_permissions.cache_key(self.user.pk))
+        effective_permissions.local.clear()
+
+    def test_committed_group_change_is_seen(self):
+        self.assertNotIn("cashiers", self.groups())
+        self.assertIsNotNone(self.cached())
+        self.user.groups.add(self.group)
+        self.assertIn("cashiers", self.groups())
+
+        self.group.delete()
+        self.assertNotIn("cashiers", self.groups())
+
+    def test_invalidation_waits_for_the_commit(self):
+        self.assertNotIn("cashiers", self.groups())
+        with transaction.atomic():
+            self.user.groups.add(self.group)
+            # a read before the commit sees the change, but doesn't cache it
+            self.clear()
+            self.assertIn("cashiers", self.groups())
+            self.assertIsNone(self.cached())
+            transaction.set_rollback(True)
+        self.assertNotIn("cashiers", self.groups())
+
+    def test_renamed_group_is_seen(self):
+        self.user.groups.add(self.group)
+        self.assertIn("cashiers", self.groups())
+        self.assertIsNotNone(self.cached())
+
+        self.group.name = "tellers"
+        self.group.save()
+        self.assertEqual(self.groups(), {"tellers", "normal"})
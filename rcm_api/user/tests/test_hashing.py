@@ -0,0 +1,52 @@
+import threading
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase
+
+from rest_framework.test import APIRequestFactory
+
+from rcm_api.metrics import metrics
+from rcm_api.views import PasswordHashStatsView
+from user.activity import activity_tracker
+from user.hashing import HashingBusy, PasswordHashExecutor
+from user.tests.helpers import create_user
+from user.tokens import VersionedRefreshToken
+
+
+class PasswordHashExecutorTests(SimpleTestCase):
+    def setUp(self):
+        # one hash at a time, none waiting
+        self.executor = PasswordHashExecutor(1, 0, 0.01)
+        self.release = threading.Event()
+        self.addCleanup(self.release.set)
+        self.running = self.executor.submit(self.release.wait, 5)
+
+    def test_full_executor_fails_fast(self):
+        with mock.patch.object(metrics, "inc") as inc:
+            with self.assertRaises(HashingBusy):
+                self.executor.submit(str, "password")
+        inc.assert_called_once_with("password_hash_rejected_total")
+        self.assertEqual(self.executor.stats()["rejected"], 1)
+
+        self.release.set()
+        self.running.result()
+        self.assertEqual(self.executor.run(str, "password"), "password")
+
+    async def test_full_executor_fails_fast_on_the_event_loop(self):
+        with self.assertRaises(HashingBusy):
+            await self.executor.asubmit(str, "password")
+        self.assertEqual(self.executor.stats()["rejected"], 1)
+
+
+class PasswordHashStatsViewTests(TestCase):
+    def test_superusers_see_the_stats(self):
+        self.addCleanup(activity_tracker.flush)
+        superuser = create_user("root@example.com", 1, is_superuser=True)
+        token = VersionedRefreshToken.for_user(superuser).access_token
+        request = APIRequestFactory().get(
+            "/api/password_hashing/", HTTP_AUTHORIZATION=f"Bearer {token}"
+        )
+        response = PasswordHashStatsView.as_view()(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("queue_depth", response.data)
+        self.assertIn("rejected", response.data)
@@ -0,0 +1,42 @@
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+
+from user.identity import identity_resolver, resolve_identity
+from user.models import User
+from user.tests.helpers import create_user
+
+
+class ResolveIdentityTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        identity_resolver.local_misses.clear()
+
+    def test_email_is_case_insensitive(self):
+        user = create_user("Sam.Hassan@example.com", 1)
+        self.assertEqual(resolve_identity(" sam.HASSAN@example.com "), user)
+
+    def test_emails_differing_only_in_case_resolve_to_the_oldest(self):
+        older = create_user("Sam@example.com", 1)
+        newer = create_user("sam@example.com", 2)
+        User.objects.filter(pk=older.pk).update(
+            created_at=timezone.now() - timedelta(days=1)
+        )
+
+        self.assertEqual(resolve_identity("sam@example.com"), older)
+        self.assertEqual(resolve_identity("SAM@example.com"), older)
+        self.assertNotEqual(older, newer)
+
+    def test_mobile_number_separators_are_ignored(self):
+        user = create_user("mobile@example.com", 1, mobile_number="01112223334")
+        self.assertEqual(resolve_identity("011-1222 (3334)"), user)
+
+    def test_unknown_identity_is_remembered_until_the_user_exists(self):
+        self.assertIsNone(resolve_identity("late@example.com"))
+        with self.captureOnCommitCallbacks(execute=True):
+            user = create_user("late@example.com", 1)
+            # dropped once the user is committed, not before
+            self.assertIsNone(resolve_identity("late@example.com"))
+        self.assertEqual(resolve_identity("late@example.com"), user)
@@ -0,0 +1,24 @@
+from django.contrib.auth.models import Group
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from user.tests.helpers import create_user
+
+
+class RelationSignalTests(TestCase):
+    def test_default_group_doesnt_update_the_new_user(self):
+        with CaptureQueriesContext(connection) as queries:
+            user = create_user("waiter@example.com", 1)
+        updates = [
+            query["sql"] for query in queries if query["sql"].startswith("UPDATE")
+        ]
+        self.assertEqual(updates, [])
+        self.assertEqual(list(user.groups.values_list("name", flat=True)), ["normal"])
+
+    def test_group_changes_move_updated_at(self):
+        user = create_user("waiter@example.com", 1)
+        updated_at = user.updated_at
+        user.groups.add(Group.objects.create(name="tellers"))
+        user.refresh_from_db()
+        self.assertGreater(user.updated_at, updated_at)
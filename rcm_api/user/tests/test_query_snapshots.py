@@ -0,0 +1,38 @@
+import json
+import os
+
+from django.db import connection
+from django.test import TestCase
+
+from user.management.commands.check_query_snapshots import (
+    CASES,
+    run_cases,
+    snapshot_path,
+    uncovered_routes,
+)
+
+
+class QuerySnapshotTests(TestCase):
+    """
+    Every route of user.urls makes the queries, with the plans, recorded in
+    user/query_snapshots/<vendor>.json. After an intended change run
+    ``manage.py check_query_snapshots --update`` on that database and commit
+    the snapshot.
+    """
+
+    maxDiff = None
+
+    def test_every_route_has_a_case(self):
+        self.assertEqual(uncovered_routes(), set())
+
+    def test_queries_match_the_snapshot(self):
+        path = snapshot_path(connection.vendor)
+        if not os.path.exists(path):
+            self.skipTest(f"No query snapshot for {connection.vendor}.")
+        with open(path) as file:
+            snapshot = json.load(file)
+
+        results = run_cases(list(CASES), snapshot["users"])
+        for case, result in results.items():
+            with self.subTest(case=case):
+                self.assertEqual(result, snapshot["cases"].get(case))
@@ -0,0 +1,64 @@
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from user.models import RevokedToken
+from user.revocation import BloomFilter, TokenRevocationList
+
+
+class BloomFilterTests(SimpleTestCase):
+    def test_items_are_counted_once(self):
+        bloom = BloomFilter(100, 0.001)
+        bloom.add("a")
+        bloom.add("a")
+        bloom.add("b")
+        self.assertEqual(bloom.count, 2)
+        self.assertIn("a", bloom)
+        self.assertNotIn("c", bloom)
+
+
+class TokenRevocationListTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.revocations = TokenRevocationList()
+        self.expires_at = timezone.now() + timedelta(hours=1)
+
+    def revoke_elsewhere(self, jti):
+        # another process: the row and the generation, not this filter
+        RevokedToken.objects.create(jti=jti, expires_at=self.expires_at)
+        self.revocations.bump_generation()
+        self.revocations.next_refresh = 0
+
+    def test_revoke(self):
+        self.revocations.refresh()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.revocations.revoke("a", self.expires_at)
+        self.assertTrue(self.revocations.is_revoked("a"))
+        self.assertFalse(self.revocations.is_revoked("b"))
+
+    def test_refresh_loads_revocations_of_other_processes(self):
+        self.assertFalse(self.revocations.is_revoked("a"))
+        self.revoke_elsewhere("a")
+        self.assertTrue(self.revocations.is_revoked("a"))
+
+    def test_overlap_window_is_not_counted_again(self):
+        self.revocations.refresh()
+        for jti in ("a", "b", "c"):
+            self.revoke_elsewhere(jti)
+            self.revocations.refresh()
+        # every refresh re-read the earlier rows of the overlap window
+        self.assertEqual(self.revocations.bloom.count, 3)
+
+    def test_full_filter_is_rebuilt_bigger(self):
+        self.revocations.bloom_capacity = 2
+        self.revocations.refresh()
+        for jti in ("a", "b", "c"):
+            self.revoke_elsewhere(jti)
+        self.revocations.refresh()
+        self.revoke_elsewhere("d")
+        self.revocations.refresh()
+        self.assertEqual(self.revocations.bloom.capacity, 8)
+        for jti in ("a", "b", "c", "d"):
+            self.assertTrue(self.revocations.is_revoked(jti))
@@ -0,0 +1,102 @@
+import uuid
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from rest_framework.test import APIClient
+
+from user.activity import activity_tracker
+from user.models import User
+from user.roster import (
+    CONTENT_TYPE,
+    DIFF,
+    FULL,
+    RosterSnapshots,
+    decode_roster,
+    encode_roster,
+)
+from user.tests.helpers import create_user
+from user.tokens import VersionedRefreshToken
+
+
+class EncodingTests(SimpleTestCase):
+    def test_round_trip(self):
+        rows = [
+            (uuid.uuid4(), "Sam", "سام", "MANAGER", "/media/sam.png", ("cashiers",)),
+            # a name past one varint byte, no avatar, no groups
+            (uuid.uuid4(), "x" * 300, "", "WAITER", "", ()),
+            (uuid.uuid4(), "Dana", "دانا", "WAITER", "", ("cashiers", "kitchen")),
+        ]
+        deleted = [uuid.uuid4()]
+        version, base = bytes(range(12)), bytes(range(12, 24))
+        decoded = decode_roster(encode_roster(rows, DIFF, version, base, deleted))
+        self.assertEqual(
+            decoded,
+            {
+                "kind": DIFF,
+                "version": version.hex(),
+                "base": base.hex(),
+                "users": rows,
+                "deleted": deleted,
+            },
+        )
+
+    def test_full_snapshot_has_no_base(self):
+        decoded = decode_roster(encode_roster([]))
+        self.assertEqual((decoded["kind"], decoded["base"]), (FULL, None))
+
+    def test_other_formats_are_refused(self):
+        with self.assertRaises(ValueError):
+            decode_roster(b"JUNK" + encode_roster([])[4:])
+
+
+@override_settings(ROOT_URLCONF="user.tests.urls")
+class RosterViewTests(TestCase):
+    path = "/api/users/user_roster/"
+
+    def setUp(self):
+        patcher = mock.patch("user.roster.roster_snapshots", RosterSnapshots())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(activity_tracker.flush)
+        self.manager = create_user("manager@example.com", 1, role=User.Role.MANAGER)
+        self.waiter = create_user("waiter@example.com", 2)
+        self.leaving = create_user("leaving@example.com", 3)
+
+    def get(self, user=None, **params):
+        client = APIClient()
+        token = VersionedRefreshToken.for_user(user or self.manager).access_token
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        return client.get(self.path, params)
+
+    def test_other_roles_are_refused(self):
+        self.assertEqual(self.get(self.waiter).status_code, 403)
+
+    def test_diff_since_a_known_version(self):
+        response = self.get()
+        self.assertEqual(response["Content-Type"], CONTENT_TYPE)
+        full = decode_roster(response.content)
+        self.assertEqual(full["kind"], FULL)
+        self.assertEqual(len(full["users"]), 3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.waiter.name = "Renamed"
+            self.waiter.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.leaving.is_deleted = True
+            self.leaving.save()
+
+        diff = decode_roster(self.get(since=response["ETag"]).content)
+        self.assertEqual(diff["kind"], DIFF)
+        self.assertEqual(diff["base"], full["version"])
+        self.assertEqual(
+            [(row[0], row[1]) for row in diff["users"]], [(self.waiter.pk, "Renamed")]
+        )
+        self.assertEqual(diff["deleted"], [self.leaving.pk])
+
+    def test_unknown_since_sends_the_full_snapshot(self):
+        for since in ('"%s"' % ("0" * 24), "not-hex"):
+            with self.subTest(since=since):
+                roster = decode_roster(self.get(since=since).content)
+                self.assertEqual(roster["kind"], FULL)
+                self.assertEqual(len(roster["users"]), 3)
@@ -0,0 +1,29 @@
+from django.db import transaction
+from django.test import TestCase
+
+from user.models import User
+from user.snapshots import user_snapshots
+from user.tests.helpers import create_user
+
+
+class UserSnapshotTests(TestCase):
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user = create_user("snapshot@example.com", 1)
+
+    def test_snapshot_follows_committed_saves(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.role = User.Role.MANAGER
+            self.user.save()
+        snapshot = user_snapshots.get(self.user.pk, self.user.auth_version)
+        self.assertEqual(snapshot["role"], User.Role.MANAGER)
+
+    def test_rolled_back_save_keeps_the_snapshot(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                self.user.is_active = False
+                self.user.save()
+                transaction.set_rollback(True)
+        self.user.refresh_from_db()
+        snapshot = user_snapshots.get(self.user.pk, self.user.auth_version)
+        self.assertTrue(snapshot["is_active"])
@@ -0,0 +1,85 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from rest_framework.exceptions import ValidationError
+
+from user.models import User
+from user.sync import ChangeFeed, SyncTokenExpired, decode_token, encode_token
+from user.tests.helpers import create_user
+
+
+class SyncTokenTests(SimpleTestCase):
+    def test_round_trip(self):
+        since = timezone.now()
+        state = {
+            "s": since.isoformat(),
+            "p": None,
+            "a": [since.isoformat(), "4b7e0f42-0000-4000-8000-000000000000"],
+        }
+        self.assertEqual(
+            decode_token(encode_token(state)),
+            {
+                "since": since,
+                "pass_started": None,
+                "after": (since, "4b7e0f42-0000-4000-8000-000000000000"),
+            },
+        )
+
+    def test_tampered_token_is_refused(self):
+        token = encode_token({"s": None, "p": None, "a": None})
+        with self.assertRaises(ValidationError):
+            decode_token(token[:-1] + ("A" if token[-1] != "A" else "B"))
+
+
+class ChangeFeedTests(TestCase):
+    def setUp(self):
+        self.feed = ChangeFeed()
+        # only what changed after a pass comes back in the next one
+        self.feed.overlap = timedelta(0)
+        self.users = [
+            create_user(f"waiter{number}@example.com", number) for number in range(3)
+        ]
+
+    def page(self, token=None, limit=None):
+        return self.feed.page(User.objects.all(), token, limit)
+
+    def test_limit_pages_through_a_pass(self):
+        first = self.page(limit=2)
+        self.assertEqual(len(first["changed"]), 2)
+        self.assertTrue(first["has_more"])
+        second = self.page(first["sync_token"], limit=2)
+        self.assertEqual(len(second["changed"]), 1)
+        self.assertFalse(second["has_more"])
+        self.assertCountEqual(
+            [user.pk for user in first["changed"] + second["changed"]],
+            [user.pk for user in self.users],
+        )
+
+    def test_next_pass_has_changes_and_deletions(self):
+        token = self.page()["sync_token"]
+        renamed, soft_deleted, hard_deleted = self.users
+        renamed.name = "Renamed"
+        renamed.save()
+        soft_deleted.is_deleted = True
+        soft_deleted.save()
+        hard_deleted_id = hard_deleted.pk
+        hard_deleted.delete()
+
+        page = self.page(token)
+        self.assertEqual([user.pk for user in page["changed"]], [renamed.pk])
+        self.assertCountEqual(page["deleted"], [soft_deleted.pk, hard_deleted_id])
+        self.assertFalse(page["has_more"])
+
+        # nothing since
+        page = self.page(page["sync_token"])
+        self.assertEqual((page["changed"], page["deleted"]), ([], []))
+
+    def test_token_older_than_the_tombstones_expires(self):
+        token = self.page()["sync_token"]
+        later = timezone.now() + self.feed.retention + timedelta(seconds=1)
+        with mock.patch("user.sync.timezone.now", return_value=later):
+            with self.assertRaises(SyncTokenExpired):
+                self.page(token)
@@ -0,0 +1,80 @@
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from rest_framework.test import APIClient
+
+from user.tests.helpers import create_user
+from user.throttling import SlidingWindowStore
+
+
+class SlidingWindowTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.store = SlidingWindowStore()
+
+    def consume(self, at):
+        # 4 at once, then one every 2 seconds: windows of 8 seconds
+        with mock.patch("time.time", return_value=at):
+            return self.store.consume("ip:1", 4, 0.5)
+
+    def test_burst_then_refill_rate(self):
+        for _ in range(4):
+            self.assertEqual(self.consume(80), (True, 0))
+        # full on its own until the next window, where its share falls under
+        # 3 a quarter of the way in
+        self.assertEqual(self.consume(84), (False, 6))
+        self.assertEqual(self.consume(90), (True, 0))
+        # 4 * 0.75 + 2 is over, 4 * 0.5 + 2 is not
+        self.assertEqual(self.consume(90), (False, 2))
+        self.assertEqual(self.consume(92), (True, 0))
+
+    def test_rejected_requests_dont_count(self):
+        for _ in range(4):
+            self.consume(80)
+        for _ in range(10):
+            self.assertFalse(self.consume(84)[0])
+        with mock.patch("time.time", return_value=84):
+            self.assertEqual(cache.get("throttle:window:ip:1:10"), 4)
+        self.assertTrue(self.consume(90)[0])
+
+
+@override_settings(
+    ROOT_URLCONF="user.tests.urls",
+    REST_FRAMEWORK={
+        **settings.REST_FRAMEWORK,
+        "DEFAULT_THROTTLE_RATES": {
+            **settings.REST_FRAMEWORK["DEFAULT_THROTTLE_RATES"],
+            "login_identifier": "2/min",
+        },
+    },
+)
+class LoginThrottleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        create_user("waiter@example.com", 1)
+
+    def assert_rejected_before_hashing(self, path, verify_password):
+        client = APIClient()
+        body = {"identifier": "waiter@example.com", "password": "guess"}
+        for _ in range(2):
+            self.assertEqual(client.post(path, body, format="json").status_code, 401)
+        response = client.post(path, body, format="json")
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(verify_password.call_count, 2)
+
+    def test_login(self):
+        with mock.patch(
+            "user.views.verify_password", return_value=False
+        ) as verify_password:
+            self.assert_rejected_before_hashing("/api/users/login/", verify_password)
+
+    def test_async_login(self):
+        with mock.patch(
+            "user.async_views.averify_password", return_value=False
+        ) as verify_password:
+            self.assert_rejected_before_hashing(
+                "/api/users/async/login/", verify_password
+            )
@@ -0,0 +1,10 @@
+from django.urls import include, path
+
+from user.views import UserBatchView
+
+
+# the API routes without the project's other apps
+urlpatterns = [
+    path("api/users/", include("user.urls")),
+    path("api/batch/", UserBatchView.as_view(), name="batch"),
+]
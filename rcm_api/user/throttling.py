@@ -0,0 +1,135 @@
+import math
+import time
+
+from django.core.cache import cache
+
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+from user.identity import classify_identifier
+
+
+class SlidingWindowStore:
+    """
+    Request counters kept in the shared django cache, one per window of
+    ``capacity / refill_rate`` seconds.
+
+    A request is counted with ``cache.add`` and ``cache.incr``, both atomic on
+    every backend that supports them (locmem, memcached, redis, database), so
+    workers never lose each other's counts and nobody waits on a lock. The
+    previous window's count weighs in by the part of it still inside the
+    sliding window, which, like a token bucket, lets ``capacity`` requests
+    through at once and ``refill_rate`` per second after that.
+    """
+
+    key_prefix = "throttle:window"
+
+    def consume(self, key, capacity, refill_rate):
+        """
+        Count one request. Returns ``(allowed, wait)`` where ``wait`` is the
+        number of seconds until a request would be allowed.
+        """
+        window = capacity / refill_rate
+        index, elapsed = divmod(time.time(), window)
+        key = f"{self.key_prefix}:{key}"
+        current = f"{key}:{int(index)}"
+        # read for the whole of the next window too
+        timeout = math.ceil(window * 2) + 1
+        cache.add(current, 0, timeout)
+        try:
+            count = cache.incr(current)
+        except ValueError:
+            # evicted since the add
+            cache.add(current, 1, timeout)
+            count = 1
+        previous = cache.get(f"{key}:{int(index) - 1}", 0)
+        if previous * (1 - elapsed / window) + count <= capacity:
+            return True, 0
+        # a turned away request doesn't count
+        cache.decr(current)
+        return False, self.wait(capacity, window, elapsed, previous, count - 1)
+
+    @staticmethod
+    def wait(capacity, window, elapsed, previous, current):
+        """
+        Seconds until ``previous * (1 - elapsed / window) + current`` has room
+        for one more request, once that window has slid by far enough.
+        """
+        room = capacity - current - 1
+        if room >= 0:
+            # room once the previous window's share drops below it
+            return max(0, (1 - room / previous) * window - elapsed)
+        # the current window is full on its own, it becomes the previous one
+        return window - elapsed + max(0, (1 - (capacity - 1) / current) * window)
+
+
+window_store = SlidingWindowStore()
+
+
+class SlidingWindowThrottle(BaseThrottle):
+    """
+    Throttle with one sliding window per scope. Rates come from
+    ``DEFAULT_THROTTLE_RATES`` in the usual ``"<requests>/<period>"`` form,
+    where requests is the burst size, let through again at requests/period
+    per second.
+
+    Subclasses implement ``get_buckets`` returning ``(scope, ident)`` pairs;
+    a request must fit in every one of them.
+    """
+
+    def __init__(self):
+        self.wait_time = None
+
+    def parse_rate(self, rate):
+        num, period = rate.split("/")
+        duration = {"s": 1, "m": 60, "h": 3600, "d": 86400}[period[0]]
+        return int(num), int(num) / duration
+
+    def get_buckets(self, request, view):
+        raise NotImplementedError(".get_buckets() must be overridden")
+
+    def allow_request(self, request, view):
+        for scope, ident in self.get_buckets(request, view):
+            if not ident:
+                continue
+            rate = api_settings.DEFAULT_THROTTLE_RATES.get(scope)
+            if rate is None:
+                continue
+            capacity, refill_rate = self.parse_rate(rate)
+            allowed, wait = window_store.consume(
+                f"{scope}:{ident}", capacity, refill_rate
+            )
+            if not allowed:
+                self.wait_time = wait
+                return False
+        return True
+
+    def wait(self):
+        return self.wait_time
+
+
+class LoginRateThrottle(SlidingWindowThrottle):
+    """Per identifier and per client IP buckets for the login endpoint."""
+
+    def get_buckets(self, request, view):
+        identity = classify_identifier(request.data.get("identifier"))
+        return [
+            ("login_ip", self.get_ident(request)),
+            ("login_identifier", identity.value if identity else None),
+        ]
+
+
+class WriteRateThrottle(SlidingWindowThrottle):
+    """Per user and per client IP buckets for create and upload endpoints."""
+
+    def allow_request(self, request, view):
+        if request.method in ("GET", "HEAD", "OPTIONS"):
+            return True
+        return super().allow_request(request, view)
+
+    def get_buckets(self, request, view):
+        user_id = request.user.id if request.user.is_authenticated else None
+        return [
+            ("write_ip", self.get_ident(request)),
+            ("write_user", user_id),
+        ]
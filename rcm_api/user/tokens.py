@@ -0,0 +1,12 @@
+from rest_framework_simplejwt.tokens import RefreshToken
+
+
+class VersionedRefreshToken(RefreshToken):
+    """Refresh token that carries the user's auth version in the ``ver`` claim."""
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        # copied into the access token as well
+        token["ver"] = user.auth_version
+        return token
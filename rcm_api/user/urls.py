@@ -12,15 +12,26 @@ from user.views import (
     UserUpdateView,
     UserDeleteView,
     LoginView,
+    LogoutView,
     UserDialogView,
     UserGenderDialogView,
     UserRoleDialogView,
+    UserEnumerationsView,
+    UserChangesView,
+    UserRosterView,
+)
+from user.async_views import (
+    AsyncUserListView,
+    AsyncUserRetrieveView,
+    AsyncManagerUserView,
+    AsyncLoginView,
 )
 
 app_name = "user"
 urlpatterns = [
     path("create_user/", CreateUserView.as_view(), name="create-user"),
     path("login/", LoginView.as_view(), name="login"),
+    path("logout/", LogoutView.as_view(), name="logout"),
     path("upload_photo/", UploadUserPhotoView.as_view(), name="upload-photo"),
     path("upload_cover/", UploadUserCoverView.as_view(), name="upload-cover"),
     path("me/", ManagerUserView.as_view(), name="me"),
@@ -33,9 +44,23 @@ urlpatterns = [
     ),
     path("user_restore/", UserRestoreView.as_view(), name="user-restore"),
     path("user_delete/", UserDeleteView.as_view(), name="user-delete"),
+    path("user_changes/", UserChangesView.as_view(), name="user-changes"),
+    path("user_roster/", UserRosterView.as_view(), name="user-roster"),
     path("user_dialog/", UserDialogView.as_view(), name="user-dialog"),
     path(
         "user_gender_dialog/", UserGenderDialogView.as_view(), name="user-gender-dialog"
     ),
     path("user_role_dialog/", UserRoleDialogView.as_view(), name="user-role-dialog"),
+    path(
+        "user_enumerations/", UserEnumerationsView.as_view(), name="user-enumerations"
+    ),
+    # async variants for the ASGI deployment
+    path("async/login/", AsyncLoginView.as_view(), name="async-login"),
+    path("async/me/", AsyncManagerUserView.as_view(), name="async-me"),
+    path("async/user_list/", AsyncUserListView.as_view(), name="async-user-list"),
+    path(
+        "async/user_retrieve/",
+        AsyncUserRetrieveView.as_view(),
+        name="async-user-retrieve",
+    ),
 ]
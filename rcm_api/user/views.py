@@ -19,8 +19,6 @@ from rest_framework.decorators import action
 from rest_framework.filters import SearchFilter, OrderingFilter
 from rest_framework.parsers import JSONParser
 
-from rest_framework_simplejwt.authentication import JWTAuthentication
-from rest_framework_simplejwt.tokens import RefreshToken
 import uuid
 from user.models import (
     User,
@@ -31,20 +29,35 @@ from user.serializers import (
     UserCoverSerializer,
     UserDeleteSerializer,
     UserDialogSerializer,
-    UserGenderChoiceSerializer,
-    UserRoleDialogSerializer,
 )
 
 from user.filters import UserFilter
+from user.authentication import CachedJWTAuthentication
+from user.tokens import VersionedRefreshToken
+from user.effective_permissions import effective_permissions
+from user.identity import EMAIL, classify_identifier, identity_resolver
+from user.hashing import verify_password
+from user.revocation import token_revocations
+from user.throttling import LoginRateThrottle, WriteRateThrottle
+from user.activity import activity_tracker
+from user.response_cache import CachedResponseMixin, user_scope
+from user.etags import ETagMixin, ListETagMixin, save_if_match, single_user_etag
+from user.enumerations import EnumerationView
+from user.roster import RosterSnapshotView
+from user.batch import BatchView
+from user.sync import change_feed
 
 from rcm_api.pagination import StandardResultsSetPagination
+from rcm_api.db_router import ReplicaReadMixin
+from rcm_api.singleflight import SingleFlightMixin
 
 
 # separating creating user and upload his photo Approach
 class CreateUserView(generics.CreateAPIView):
     serializer_class = UserSerializer
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated]
+    throttle_classes = [WriteRateThrottle]
 
     def perform_create(self, serializer):
         # Capitalize the user's name before saving
@@ -103,8 +116,9 @@ class CreateUserView(generics.CreateAPIView):
 
 class UploadUserPhotoView(generics.UpdateAPIView):
     serializer_class = UserImageSerializer
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated]
+    throttle_classes = [WriteRateThrottle]
 
     def initial(self, request, *args, **kwargs):
         super().initial(request, *args, **kwargs)
@@ -112,7 +126,7 @@ class UploadUserPhotoView(generics.UpdateAPIView):
 
     @action(methods=["POST"], detail=True, url_path="upload-image")
     def upload_image(self, request, pk=None):
-        user = self.request.user
+        user = get_object_or_404(User, id=self.request.user.id)
         serializer = self.get_serializer(user, data=request.data)
         if serializer.is_valid():
             serializer.save()
@@ -125,7 +139,8 @@ class UploadUserPhotoView(generics.UpdateAPIView):
         return self.serializer_class
 
     def update(self, request, *args, **kwargs):
-        user = self.request.user  # Get the user from the JWT token
+        # request.user is a cached snapshot, load the row to update it
+        user = get_object_or_404(User, id=self.request.user.id)
         serializer = self.get_serializer(user, data=request.data)
         if serializer.is_valid():
             serializer.save()
@@ -139,8 +154,9 @@ class UploadUserPhotoView(generics.UpdateAPIView):
 
 class UploadUserCoverView(generics.UpdateAPIView):
     serializer_class = UserCoverSerializer
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated]
+    throttle_classes = [WriteRateThrottle]
 
     def initial(self, request, *args, **kwargs):
         super().initial(request, *args, **kwargs)
@@ -148,7 +164,7 @@ class UploadUserCoverView(generics.UpdateAPIView):
 
     @action(methods=["POST"], detail=True, url_path="upload-image")
     def upload_image(self, request, pk=None):
-        user = self.request.user
+        user = get_object_or_404(User, id=self.request.user.id)
         serializer = self.get_serializer(user, data=request.data)
         if serializer.is_valid():
             serializer.save()
@@ -161,7 +177,8 @@ class UploadUserCoverView(generics.UpdateAPIView):
         return self.serializer_class
 
     def update(self, request, *args, **kwargs):
-        user = self.request.user  # Get the user from the JWT token
+        # request.user is a cached snapshot, load the row to update it
+        user = get_object_or_404(User, id=self.request.user.id)
         serializer = self.get_serializer(user, data=request.data)
         if serializer.is_valid():
             serializer.save()
@@ -172,13 +189,22 @@ class UploadUserCoverView(generics.UpdateAPIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class ManagerUserView(generics.RetrieveUpdateAPIView):
+class ManagerUserView(
+    ETagMixin, CachedResponseMixin, generics.RetrieveUpdateAPIView
+):
     serializer_class = UserSerializer
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated]
 
+    def get_response_cache_scope(self):
+        return str(self.request.user.pk)
+
+    def compute_etag(self):
+        return single_user_etag(User.objects.all(), self.request.user.pk)
+
     def get_object(self):
-        return self.request.user
+        # request.user is a cached snapshot, load the full row
+        return get_object_or_404(User, id=self.request.user.id)
 
     def update(self, request, *args, **kwargs):
         allowed_roles = ["OWNER", "SUPERUSER", "MANAGER"]
@@ -192,17 +218,24 @@ class ManagerUserView(generics.RetrieveUpdateAPIView):
             )
         serializer = self.get_serializer(instance, data=request.data, partial=partial)
         serializer.is_valid(raise_exception=True)
-        self.perform_update(serializer)
+        # 412 when If-Match doesn't match the current row
+        save_if_match(request, serializer)
 
         return Response(
             {"detail": _("Your data Updated successfully")}, status=status.HTTP_200_OK
         )
 
 
-class UserListView(generics.ListAPIView):
+class UserListView(
+    ListETagMixin,
+    SingleFlightMixin,
+    CachedResponseMixin,
+    ReplicaReadMixin,
+    generics.ListAPIView,
+):
     # queryset = User.objects.filter(is_deleted=False)
     serializer_class = UserSerializer
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated]
     pagination_class = StandardResultsSetPagination
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
@@ -220,10 +253,10 @@ class UserListView(generics.ListAPIView):
         return queryset
 
 
-class DeletedUserView(generics.ListAPIView):
+class DeletedUserView(ListETagMixin, ReplicaReadMixin, generics.ListAPIView):
     # queryset = User.objects.filter(is_deleted=True)
     serializer_class = UserSerializer
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated]
     pagination_class = StandardResultsSetPagination
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
@@ -243,12 +276,22 @@ class DeletedUserView(generics.ListAPIView):
         return queryset
 
 
-class UserRetrieveView(generics.RetrieveAPIView):
+class UserRetrieveView(
+    ETagMixin, CachedResponseMixin, ReplicaReadMixin, generics.RetrieveAPIView
+):
     serializer_class = UserSerializer
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated]
     lookup_field = "id"
 
+    def get_response_cache_scope(self):
+        return user_scope(self.request.query_params.get("user_id"))
+
+    def compute_etag(self):
+        return single_user_etag(
+            self.get_queryset(), self.request.query_params.get("user_id")
+        )
+
     def get_queryset(self):
         return User.objects.filter(is_deleted=False)
 
@@ -260,7 +303,7 @@ class UserRetrieveView(generics.RetrieveAPIView):
 
 class UserDeleteTemporaryView(generics.RetrieveUpdateAPIView):
     serializer_class = UserDeleteSerializer
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated]
     lookup_field = "id"
 
@@ -295,7 +338,7 @@ class UserDeleteTemporaryView(generics.RetrieveUpdateAPIView):
 
 class UserRestoreView(generics.RetrieveUpdateAPIView):
     serializer_class = UserDeleteSerializer
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated]
     lookup_field = "id"
 
@@ -330,7 +373,7 @@ class UserRestoreView(generics.RetrieveUpdateAPIView):
 
 class UserUpdateView(generics.RetrieveUpdateAPIView):
     serializer_class = UserSerializer
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated]
     lookup_field = "id"
 
@@ -350,7 +393,8 @@ class UserUpdateView(generics.RetrieveUpdateAPIView):
         instance = self.get_object()
         serializer = self.get_serializer(instance, data=request.data, partial=partial)
         serializer.is_valid(raise_exception=True)
-        self.perform_update(serializer)
+        # 412 when If-Match doesn't match the current row
+        save_if_match(request, serializer)
 
         return Response(
             {"detail": _("User Updated successfully")}, status=status.HTTP_200_OK
@@ -418,7 +462,7 @@ from rest_framework.parsers import JSONParser
 
 
 class UserDeleteView(APIView):
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated]
 
     def delete(self, request, format=None):
@@ -459,95 +503,160 @@ class UserDeleteView(APIView):
 
 
 # User login view
+def check_can_login(user):
+    # Checks that don't need the password, shared with the async login view
+    if user is None:
+        raise AuthenticationFailed(
+            _("Email or phone number or password is invalid")
+        )
+    if user.is_staff == False:
+        raise AuthenticationFailed(
+            _("Email or phone number or password is invalid!!!")
+        )
+    if not user.is_active:
+        raise AuthenticationFailed(_("User account is inactive"))
+    if user.is_deleted == True:
+        raise AuthenticationFailed(_("This user is deleted"))
+
+
+def login_response_data(user, identity, permissions):
+    refresh = VersionedRefreshToken.for_user(user)
+    # Group names and permission codenames come from the permission cache
+    group_names = sorted(permissions["groups"])
+    user_permissions_names = sorted(permissions["user_permissions"])
+
+    return {
+        "identifier": (
+            user.email if identity.kind == EMAIL else user.mobile_number
+        ),
+        "role": user.role,
+        "groups": group_names,
+        "user_permissions":user_permissions_names,
+        "name": user.name,
+        "is_staff": user.is_staff,
+        "access_token": str(refresh.access_token),
+        # "refresh_token": str(refresh),
+    }
+
+
 class LoginView(APIView):
     # Primary login view
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
+    # rejects bursts before any database lookup or password hashing
+    throttle_classes = [LoginRateThrottle]
 
     def post(self, request):
         identifier = request.data.get("identifier")  # Field for email or phone number
         password = request.data.get("password")
 
-        # Filter using Q objects to match either email or phone_number
-        user = User.objects.filter(
-            Q(email=identifier) | Q(mobile_number=identifier)
-        ).first()
+        # Classify the identifier once and look it up through a single index
+        identity = classify_identifier(identifier)
+        user = identity_resolver.resolve(identity) if identity else None
 
-        if user is None:
-            raise AuthenticationFailed(
-                _("Email or phone number or password is invalid")
-            )
-        if user.is_staff == False:
-            raise AuthenticationFailed(
-                _("Email or phone number or password is invalid!!!")
-            )
-        if not user.is_active:
-            raise AuthenticationFailed(_("User account is inactive"))
-        if user.is_deleted == True:
-            raise AuthenticationFailed(_("This user is deleted"))
-        if not user.check_password(password):
+        check_can_login(user)
+        if not verify_password(user, password):
             raise AuthenticationFailed(
                 _("Email or phone number or password is invalid")
             )
 
-        refresh = RefreshToken.for_user(user)
+        # last_login is written in batches instead of on every login
+        activity_tracker.record_login(user.pk)
         response = Response()
-        # Extract group names and convert them to a list of strings
-        group_names = list(user.groups.values_list("name", flat=True))
-        user_permissions_names = list(user.user_permissions.values_list("codename", flat=True))
-
-        response.data = {
-            "identifier": (
-                user.email if user.email == identifier else user.mobile_number
-            ),
-            "role": user.role,
-            "groups": group_names,
-            "user_permissions":user_permissions_names,
-            "name": user.name,
-            "is_staff": user.is_staff,
-            "access_token": str(refresh.access_token),
-            # "refresh_token": str(refresh),
-        }
+        response.data = login_response_data(
+            user, identity, effective_permissions.get(user.pk)
+        )
         return response
 
 
+class LogoutView(APIView):
+    authentication_classes = [CachedJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        # Revoke the access token used for this request
+        token_revocations.revoke_token(request.auth)
+        return Response(
+            {"detail": _("Logged out successfully")}, status=status.HTTP_200_OK
+        )
+
+
+class UserChangesView(APIView):
+    # delta sync of the staff roster, see user.sync
+    authentication_classes = [CachedJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        allowed_roles = ["SUPERUSER", "OWNER", "MANAGER"]
+        if request.user.role in allowed_roles:
+            # same rows and fields as UserListView
+            queryset = User.objects.filter(is_superuser=False).prefetch_related(
+                "groups", "user_permissions"
+            )
+            serializer_class = UserSerializer
+        else:
+            # same rows and fields as UserDialogView
+            queryset = User.objects.all()
+            serializer_class = UserDialogSerializer
+
+        try:
+            limit = int(request.query_params.get("limit", 0))
+        except ValueError:
+            limit = 0
+        page = change_feed.page(
+            queryset, request.query_params.get("sync_token"), max(limit, 0)
+        )
+        page["changed"] = serializer_class(
+            page["changed"], many=True, context={"request": request}
+        ).data
+        return Response(page, status=status.HTTP_200_OK)
+
+
 # User Dialogs
-class UserDialogView(generics.ListAPIView):
+class UserDialogView(
+    ListETagMixin,
+    SingleFlightMixin,
+    CachedResponseMixin,
+    ReplicaReadMixin,
+    generics.ListAPIView,
+):
     serializer_class = UserDialogSerializer
     queryset = User.objects.filter(is_deleted=False)
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated]
 
 
-class UserGenderDialogView(APIView):
-    authentication_classes = [JWTAuthentication]
+class UserGenderDialogView(EnumerationView):
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated]
+    enumeration = "genders"
+
+
+class UserRoleDialogView(EnumerationView):
+    authentication_classes = [CachedJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+    enumeration = "roles"
 
-    def get(self, request, *args, **kwargs):
-        # Define the gender choices here
-        gender_choices = [
-            {"value": "male", "display": _("Male")},
-            {"value": "female", "display": _("Female")},
-        ]
 
-        serializer = UserGenderChoiceSerializer(gender_choices, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+class UserEnumerationsView(EnumerationView):
+    # every enumeration in one response
+    authentication_classes = [CachedJWTAuthentication]
+    permission_classes = [IsAuthenticated]
 
 
-class UserRoleDialogView(generics.ListAPIView):
-    authentication_classes = [JWTAuthentication]
+class UserRosterView(RosterSnapshotView):
+    # compact roster for offline terminals, see user.roster
+    authentication_classes = [CachedJWTAuthentication]
     permission_classes = [IsAuthenticated]
 
     def get(self, request, *args, **kwargs):
-        # Define the role choices here
-
-        role_choices = [
-            {"value": "OWNER", "display": _("Owner")},
-            {"value": "MANAGER", "display": _("Manager")},
-            {"value": "WAITER", "display": _("Waiter")},
-            {"value": "CASHIER", "display": _("Cashier")},
-            {"value": "CHEF", "display": _("Chef")},
-            {"value": "DELIVERY", "display": _("Delivery")},
-        ]
-
-        serializer = UserRoleDialogSerializer(role_choices, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        # the same users as UserListView, and the same roles see them
+        allowed_roles = ["SUPERUSER", "OWNER", "MANAGER"]
+        if request.user.role not in allowed_roles:
+            raise PermissionDenied(_("You don't have permission to view users."))
+        return super().get(request, *args, **kwargs)
+
+
+class UserBatchView(BatchView):
+    # several user API calls in one round trip, see user.batch
+    authentication_classes = [CachedJWTAuthentication]
+    permission_classes = [IsAuthenticated]